@@ -6,10 +6,15 @@ import os
 import time
 import psycopg2
 from flask import Flask, jsonify, request
+from debug_memory import register_gc_metrics, register_memory_debug
 from datetime import datetime
 import redis
 
 app = Flask(__name__)
+# Отладочные endpoint'ы памяти: только при MEMORY_DEBUG=1
+register_memory_debug(app)
+# Метрики сборщика мусора: /debug/gc и python_gc_* в /metrics
+gc_stats = register_gc_metrics(app)
 
 # ========================================
 # УТЕЧКА #1: Глобальный кеш без очистки
@@ -223,7 +228,8 @@ file_descriptors_open {len(OPEN_FILES)}
 # HELP request_history_size Size of request history
 # TYPE request_history_size gauge
 request_history_size {len(REQUEST_HISTORY)}
-"""
+
+{gc_stats.prometheus_text()}"""
 
 
 if __name__ == '__main__':
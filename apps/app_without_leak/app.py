@@ -6,6 +6,7 @@ import os
 import psycopg2
 from psycopg2 import pool
 from flask import Flask, jsonify, request
+from debug_memory import register_gc_metrics, register_memory_debug
 from datetime import datetime
 import redis
 from functools import lru_cache
@@ -13,6 +14,10 @@ from cachetools import TTLCache
 import atexit
 
 app = Flask(__name__)
+# Отладочные endpoint'ы памяти: только при MEMORY_DEBUG=1
+register_memory_debug(app)
+# Метрики сборщика мусора: /debug/gc и python_gc_* в /metrics
+gc_stats = register_gc_metrics(app)
 
 # ========================================
 # ✅ ПРАВИЛЬНО: Cache с лимитом и TTL
@@ -219,7 +224,8 @@ memory_cache_size {len(CACHE)}
 # HELP memory_cache_max Maximum cache size
 # TYPE memory_cache_max gauge
 memory_cache_max {CACHE.maxsize}
-"""
+
+{gc_stats.prometheus_text()}"""
 
 
 if __name__ == '__main__':
@@ -0,0 +1,428 @@
+"""
+Отладочные endpoint'ы памяти (включаются только через переменные окружения)
+Общий модуль обоих приложений: Dockerfile копирует его из apps/common
+
+MEMORY_DEBUG=1              - включить /debug/* endpoint'ы
+TRACEMALLOC_FRAMES=N        - глубина стека tracemalloc (по умолчанию 10)
+TRACEMALLOC_MODE=window     - трассировка только во время окна захвата (по умолчанию)
+TRACEMALLOC_MODE=continuous - трассировка с запуска, разница между снимками
+
+Метрики сборщика мусора (GCStats) работают всегда: /metrics и /debug/gc
+"""
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from flask import g, jsonify, request, Response
+
+
+TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', '10'))
+TRACEMALLOC_MODE = os.getenv('TRACEMALLOC_MODE', 'window')
+
+# Максимальная длительность окна захвата (секунды)
+MAX_WINDOW = 60.0
+
+# Служебные аллокации, которые не относятся к приложению
+IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<unknown>', __file__)
+
+# Границы гистограммы пауз GC (секунды)
+GC_PAUSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class AllocationTracker:
+    """
+    Места аллокаций, выросшие за интервал
+    
+    window: tracemalloc включается только на время окна. Результат - то,
+        что было выделено за окно и осталось живым к его концу (кандидаты
+        в утечку). Вне окон приложение работает без накладных расходов.
+        Блокировка берется только на включение/выключение трассировки:
+        ожидание окна и снимки идут без нее, параллельные окна делят одну
+        трассировку (счетчик окон), а позднее окно сравнивается со снимком
+        на своем старте.
+    continuous: tracemalloc работает всегда, каждый запрос сравнивает
+        новый снимок с предыдущим. Точнее, но замедляет каждую аллокацию.
+    
+    Накладные расходы измеряются напрямую: средняя длительность запросов
+    с включенной и выключенной трассировкой.
+    """
+    
+    def __init__(self, frames: int, mode: str):
+        if mode not in ('window', 'continuous'):
+            raise ValueError(f"TRACEMALLOC_MODE должен быть window или continuous, получено: {mode}")
+        self.frames = frames
+        self.mode = mode
+        self.previous = None
+        # Включение/выключение трассировки и смена базы (dev-сервер Flask многопоточный)
+        self._lock = threading.Lock()
+        self._windows = 0
+        self._tracing_started = 0.0
+        self.snapshots_taken = 0
+        self.last_snapshot_seconds = 0.0
+        self.last_compare_seconds = 0.0
+        self.tracing_seconds = 0.0
+        self.started_at = time.time()
+        # [число запросов, суммарное время] без трассировки и с ней
+        self.requests = {False: [0, 0.0], True: [0, 0.0]}
+        
+        if mode == 'continuous':
+            tracemalloc.start(frames)
+            self.previous = self._take_snapshot()
+    
+    def _take_snapshot(self):
+        started = time.perf_counter()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+        )
+        self.last_snapshot_seconds = time.perf_counter() - started
+        self.snapshots_taken += 1
+        return snapshot
+    
+    def _compare(self, snapshot, previous, group_by: str, limit: int):
+        started = time.perf_counter()
+        stats = snapshot.compare_to(previous, group_by)
+        self.last_compare_seconds = time.perf_counter() - started
+        
+        stats = [stat for stat in stats if stat.size_diff > 0]
+        return stats[:limit] if limit else stats
+    
+    def capture(self, window: float, group_by: str = 'traceback', limit: int = 20):
+        """
+        Места аллокаций, выросшие сильнее всего
+        
+        Args:
+            window: Длительность окна (режим window)
+            group_by: traceback, lineno или filename
+        
+        Returns:
+            list: StatisticDiff, отсортированные по росту
+        """
+        if self.mode == 'continuous':
+            with self._lock:
+                snapshot = self._take_snapshot()
+                previous, self.previous = self.previous, snapshot
+            return self._compare(snapshot, previous, group_by, limit)
+        
+        with self._lock:
+            joined = self._windows > 0
+            if not joined:
+                tracemalloc.start(self.frames)
+                self._tracing_started = time.perf_counter()
+            self._windows += 1
+        try:
+            # Пока счетчик окон > 0, трассировку никто не выключит
+            baseline = self._take_snapshot() if joined else None
+            time.sleep(min(window, MAX_WINDOW))
+            snapshot = self._take_snapshot()
+        finally:
+            with self._lock:
+                self._windows -= 1
+                if self._windows == 0:
+                    # stop() освобождает все трассы - память tracemalloc не копится
+                    tracemalloc.stop()
+                    self.tracing_seconds += time.perf_counter() - self._tracing_started
+        
+        if baseline is None:
+            baseline = tracemalloc.Snapshot([], snapshot.traceback_limit)
+        return self._compare(snapshot, baseline, group_by, limit)
+    
+    def reset(self):
+        """Новая база для сравнения (режим continuous)"""
+        with self._lock:
+            if self.mode == 'continuous':
+                self.previous = self._take_snapshot()
+    
+    def record_request(self, duration: float, traced: bool):
+        bucket = self.requests[traced]
+        bucket[0] += 1
+        bucket[1] += duration
+    
+    def overhead(self) -> dict:
+        """Цена инструментирования: память и время tracemalloc, замедление запросов"""
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        plain_count, plain_time = self.requests[False]
+        traced_count, traced_time = self.requests[True]
+        plain_ms = plain_time / plain_count * 1000 if plain_count else 0.0
+        traced_ms = traced_time / traced_count * 1000 if traced_count else 0.0
+        uptime = time.time() - self.started_at
+        tracing_seconds = uptime if self.mode == 'continuous' else self.tracing_seconds
+        
+        return {
+            'mode': self.mode,
+            'frames': self.frames,
+            'is_tracing': tracemalloc.is_tracing(),
+            'tracemalloc_memory_bytes': tracemalloc.get_tracemalloc_memory(),
+            'traced_current_bytes': traced_current,
+            'traced_peak_bytes': traced_peak,
+            'snapshots_taken': self.snapshots_taken,
+            'last_snapshot_ms': self.last_snapshot_seconds * 1000,
+            'last_compare_ms': self.last_compare_seconds * 1000,
+            # Доля времени с включенной трассировкой
+            'duty_cycle': tracing_seconds / uptime if uptime > 0 else 0.0,
+            'requests_untraced': plain_count,
+            'requests_traced': traced_count,
+            'request_ms_untraced': plain_ms,
+            'request_ms_traced': traced_ms,
+            'request_slowdown': traced_ms / plain_ms if plain_ms and traced_ms else None,
+            'uptime_seconds': uptime
+        }
+
+
+class GCStats:
+    """
+    Статистика сборщика мусора через gc.callbacks
+    
+    По каждому поколению: число сборок, гистограмма пауз, собранные и
+    неуничтожимые (uncollectable) объекты. Рост памяти при растущем
+    collected - это циклы ссылок, которые GC успевает разбирать; рост при
+    нулевом collected - обычное удержание объектов (кеши, списки).
+    
+    Колбэк вызывается на каждую сборку и стоит пару обращений к словарю,
+    поэтому работает всегда, в отличие от tracemalloc.
+    """
+    
+    def __init__(self):
+        generations = range(len(gc.get_count()))
+        self.collections = [0 for _ in generations]
+        self.collected = [0 for _ in generations]
+        self.uncollectable = [0 for _ in generations]
+        self.pause_sum = [0.0 for _ in generations]
+        self.pause_max = [0.0 for _ in generations]
+        # Число пауз в каждом интервале гистограммы (последний - +Inf)
+        self.pause_buckets = [[0] * (len(GC_PAUSE_BUCKETS) + 1) for _ in generations]
+        self.last_collection = [None for _ in generations]
+        self._started = None
+        self.installed = False
+    
+    def install(self):
+        if not self.installed:
+            gc.callbacks.append(self._callback)
+            self.installed = True
+    
+    def uninstall(self):
+        if self.installed:
+            gc.callbacks.remove(self._callback)
+            self.installed = False
+    
+    def _callback(self, phase: str, info: dict):
+        # Сборка не реентерабельна и выполняется под GIL - блокировка не нужна
+        if phase == 'start':
+            self._started = time.perf_counter()
+            return
+        if self._started is None:
+            return
+        pause = time.perf_counter() - self._started
+        self._started = None
+        
+        generation = info['generation']
+        self.collections[generation] += 1
+        self.collected[generation] += info['collected']
+        self.uncollectable[generation] += info['uncollectable']
+        self.pause_sum[generation] += pause
+        self.pause_max[generation] = max(self.pause_max[generation], pause)
+        self.last_collection[generation] = time.time()
+        
+        bucket = 0
+        while bucket < len(GC_PAUSE_BUCKETS) and pause > GC_PAUSE_BUCKETS[bucket]:
+            bucket += 1
+        self.pause_buckets[generation][bucket] += 1
+    
+    def to_dict(self, objects: bool = False) -> dict:
+        """
+        Состояние для /debug/gc
+        
+        Args:
+            objects: Посчитать объекты в каждом поколении (размер поколения).
+                     gc.get_objects() обходит все отслеживаемые объекты и
+                     держит GIL - только для отладки, не для частого опроса
+        """
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+        generations = []
+        for generation in range(len(self.collections)):
+            collections = self.collections[generation]
+            entry = {
+                'generation': generation,
+                'collections': collections,
+                'collected': self.collected[generation],
+                'uncollectable': self.uncollectable[generation],
+                'pause_total_ms': self.pause_sum[generation] * 1000,
+                'pause_mean_ms': self.pause_sum[generation] / collections * 1000 if collections else 0.0,
+                'pause_max_ms': self.pause_max[generation] * 1000,
+                'pause_histogram': {
+                    str(bound): count for bound, count in
+                    zip(GC_PAUSE_BUCKETS + ('+Inf',), self.pause_buckets[generation])
+                },
+                'last_collection': self.last_collection[generation],
+                # Счетчик gc.get_count(), который сравнивается с порогом - не размер
+                # поколения: для поколения 0 - аллокации минус освобождения с прошлой
+                # сборки, для старших - число сборок младшего поколения
+                'threshold_counter': counts[generation],
+                'threshold': thresholds[generation] if generation < len(thresholds) else None
+            }
+            if objects:
+                entry['objects'] = len(gc.get_objects(generation=generation))
+            generations.append(entry)
+        
+        return {
+            'timestamp': time.time(),
+            'enabled': gc.isenabled(),
+            'instrumented': self.installed,
+            'garbage': len(gc.garbage),
+            'generations': generations
+        }
+    
+    def prometheus_text(self) -> str:
+        """Метрики в текстовом формате Prometheus (дописываются к /metrics)"""
+        lines = [
+            '# HELP python_gc_collections_total Garbage collections per generation',
+            '# TYPE python_gc_collections_total counter'
+        ]
+        lines += [f'python_gc_collections_total{{generation="{generation}"}} {count}'
+                  for generation, count in enumerate(self.collections)]
+        
+        lines += [
+            '# HELP python_gc_objects_collected_total Objects collected by the garbage collector',
+            '# TYPE python_gc_objects_collected_total counter'
+        ]
+        lines += [f'python_gc_objects_collected_total{{generation="{generation}"}} {count}'
+                  for generation, count in enumerate(self.collected)]
+        
+        lines += [
+            '# HELP python_gc_objects_uncollectable_total Uncollectable objects found by the garbage collector',
+            '# TYPE python_gc_objects_uncollectable_total counter'
+        ]
+        lines += [f'python_gc_objects_uncollectable_total{{generation="{generation}"}} {count}'
+                  for generation, count in enumerate(self.uncollectable)]
+        
+        lines += [
+            '# HELP python_gc_threshold_counter Counters compared with gc thresholds (gc.get_count): '
+            'allocations minus deallocations for generation 0, younger generation collections for older ones',
+            '# TYPE python_gc_threshold_counter gauge'
+        ]
+        lines += [f'python_gc_threshold_counter{{generation="{generation}"}} {count}'
+                  for generation, count in enumerate(gc.get_count())]
+        
+        lines += [
+            '# HELP python_gc_garbage_objects Objects in gc.garbage',
+            '# TYPE python_gc_garbage_objects gauge',
+            f'python_gc_garbage_objects {len(gc.garbage)}',
+            '# HELP python_gc_pause_seconds Garbage collection pause duration',
+            '# TYPE python_gc_pause_seconds histogram'
+        ]
+        for generation, buckets in enumerate(self.pause_buckets):
+            cumulative = 0
+            for bound, count in zip(GC_PAUSE_BUCKETS, buckets):
+                cumulative += count
+                lines.append(f'python_gc_pause_seconds_bucket{{generation="{generation}",le="{bound}"}} {cumulative}')
+            lines.append(f'python_gc_pause_seconds_bucket{{generation="{generation}",le="+Inf"}} {self.collections[generation]}')
+            lines.append(f'python_gc_pause_seconds_sum{{generation="{generation}"}} {self.pause_sum[generation]}')
+            lines.append(f'python_gc_pause_seconds_count{{generation="{generation}"}} {self.collections[generation]}')
+        
+        return '\n'.join(lines) + '\n'
+
+
+def _frame_name(frame) -> str:
+    return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+
+
+def _stat_to_dict(stat) -> dict:
+    return {
+        'size_diff_bytes': stat.size_diff,
+        'size_bytes': stat.size,
+        'count_diff': stat.count_diff,
+        'count': stat.count,
+        # Кадры от корня к месту аллокации
+        'traceback': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    }
+
+
+def collapsed_stacks(stats) -> str:
+    """
+    Формат "кадр;кадр;кадр вес" для flamegraph.pl / speedscope
+    (вес - прирост памяти в байтах)
+    """
+    return ''.join(
+        f"{';'.join(_frame_name(frame) for frame in stat.traceback)} {stat.size_diff}\n"
+        for stat in stats
+    )
+
+
+def register_memory_debug(app):
+    """
+    Регистрирует /debug/tracemalloc/* endpoint'ы, если MEMORY_DEBUG=1
+    
+    GET  /debug/tracemalloc?window=10&limit=20&group_by=traceback|lineno|filename&format=json|collapsed
+    POST /debug/tracemalloc/reset
+    GET  /debug/tracemalloc/overhead
+    """
+    if os.getenv('MEMORY_DEBUG', '0') != '1':
+        return None
+    
+    tracker = AllocationTracker(TRACEMALLOC_FRAMES, TRACEMALLOC_MODE)
+    
+    @app.before_request
+    def _start_timer():
+        g.memory_debug_started = time.perf_counter()
+        g.memory_debug_traced = tracemalloc.is_tracing()
+    
+    @app.after_request
+    def _stop_timer(response):
+        started = g.get('memory_debug_started')
+        # Сами /debug/ запросы не учитываем - окно захвата длится секунды
+        if started is not None and not request.path.startswith('/debug/'):
+            traced = g.memory_debug_traced and tracemalloc.is_tracing()
+            tracker.record_request(time.perf_counter() - started, traced)
+        return response
+    
+    @app.route('/debug/tracemalloc')
+    def tracemalloc_diff():
+        group_by = request.args.get('group_by', 'traceback')
+        if group_by not in ('traceback', 'lineno', 'filename'):
+            return jsonify({"error": f"unsupported group_by: {group_by}"}), 400
+        window = request.args.get('window', 10.0, type=float)
+        limit = request.args.get('limit', 20, type=int)
+        stats = tracker.capture(window, group_by, limit)
+        
+        if request.args.get('format') == 'collapsed':
+            return Response(collapsed_stacks(stats), mimetype='text/plain')
+        
+        return jsonify({
+            'timestamp': time.time(),
+            'mode': tracker.mode,
+            'group_by': group_by,
+            'top': [_stat_to_dict(stat) for stat in stats],
+            'overhead': tracker.overhead()
+        })
+    
+    @app.route('/debug/tracemalloc/reset', methods=['POST'])
+    def tracemalloc_reset():
+        tracker.reset()
+        return jsonify({"reset": True, "overhead": tracker.overhead()})
+    
+    @app.route('/debug/tracemalloc/overhead')
+    def tracemalloc_overhead():
+        return jsonify(tracker.overhead())
+    
+    print(f"🔬 tracemalloc: режим {TRACEMALLOC_MODE}, {TRACEMALLOC_FRAMES} кадров")
+    return tracker
+
+
+def register_gc_metrics(app) -> GCStats:
+    """
+    Подключает GCStats и регистрирует GET /debug/gc (всегда, без MEMORY_DEBUG)
+    
+    GET /debug/gc?objects=1 - дополнительно размеры поколений (дорого)
+    
+    Returns:
+        GCStats: prometheus_text() дописывается к ответу /metrics
+    """
+    stats = GCStats()
+    stats.install()
+    
+    @app.route('/debug/gc')
+    def gc_debug():
+        return jsonify(stats.to_dict(objects=request.args.get('objects') == '1'))
+    
+    return stats
@@ -8,6 +8,9 @@ import os
 import requests
 from typing import Generator
 
+from .utils.enhanced_monitor import close_stats_streams
+from .utils.report_builder import render_deferred_charts
+
 # Инициализация Docker клиента
 docker_client = docker.from_env()
 
@@ -185,3 +188,15 @@ def pytest_configure(config):
     # Добавляем кастомные маркеры
     config.addinivalue_line("markers", "slow: marks tests as slow (deselect with '-m \"not slow\"')")
     config.addinivalue_line("markers", "leak: marks tests that check for memory leaks")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """
+    Отрисовка отложенных графиков (CHART_RENDER=deferred) в пуле процессов
+    и закрытие оставшихся потоков статистики Docker
+    
+    Графики рисуются одним проходом после всех тестов и дописываются во
+    вложения результатов Allure своих тестов
+    """
+    close_stats_streams()
+    render_deferred_charts(results_dir=session.config.getoption('allure_report_dir', None))
@@ -0,0 +1,83 @@
+"""
+Юнит-тесты поиска максимальной пропускной способности
+Ступени нагрузки подменяются моделью приложения, реальная ступень
+прогоняется на локальном HTTP сервере - контейнеры не нужны
+"""
+import allure
+from .test_load_generator import base_url, http_server
+from .utils.capacity_search import CapacitySearch, CapacityStep, SLO
+
+
+class ModelCapacitySearch(CapacitySearch):
+    """Приложение, которое держит до capacity RPS, а дальше захлебывается"""
+    
+    def __init__(self, capacity: float):
+        super().__init__('http://model', ['/api/cache'], slo=SLO(p99_ms=200), cooldown=0)
+        self.capacity = capacity
+    
+    def _run_step(self, rps: float) -> CapacityStep:
+        load = rps / self.capacity
+        p99_ms = 20 + 30 * load if load <= 1 else 50 + 500 * (load - 1)
+        memory_before = 100.0 + len(self.steps)
+        return CapacityStep(
+            rps=rps,
+            achieved_rps=min(rps, self.capacity),
+            p50_ms=p99_ms / 2,
+            p99_ms=p99_ms,
+            error_rate=0.0,
+            memory_before_mb=memory_before,
+            memory_after_mb=memory_before + (2.0 if rps >= 40 else 0.2),
+            passed=p99_ms <= self.slo.p99_ms and rps <= self.capacity
+        )
+
+
+@allure.feature('Load Generator')
+@allure.story('Capacity Search')
+class TestCapacitySearch:
+    
+    @allure.title('Ступенчатый поиск останавливается на первом нарушении SLO')
+    def test_step_search(self):
+        search = ModelCapacitySearch(capacity=55)
+        report = search.step_search(start_rps=10, step_rps=10, max_rps=200)
+        
+        assert report['max_sustainable_rps'] == 50
+        assert [step['rps'] for step in report['steps']] == [10, 20, 30, 40, 50, 60]
+        assert report['memory_growth_from_rps'] == 40
+    
+    @allure.title('Бинарный поиск сходится к границе с заданной точностью')
+    def test_binary_search(self):
+        search = ModelCapacitySearch(capacity=137)
+        report = search.binary_search(low_rps=10, high_rps=1000, tolerance=0.02)
+        
+        assert 137 * 0.98 <= report['max_sustainable_rps'] <= 137
+        assert len(report['steps']) < 15
+        assert all(isinstance(step['rps'], int) for step in report['steps'])
+    
+    @allure.title('Бинарный поиск с дробной серединой перебирает целые RPS')
+    def test_binary_search_integer_steps(self):
+        search = ModelCapacitySearch(capacity=12)
+        # Середина 10..15 - 12.5: LoadGenerator не запустит дробное число потоков
+        report = search.binary_search(low_rps=10, high_rps=15)
+        
+        assert [step['rps'] for step in report['steps']] == [10, 12, 13, 15]
+        assert report['max_sustainable_rps'] == 12
+    
+    @allure.title('Перегиб кривой задержки находится у предела приложения')
+    def test_knee(self):
+        search = ModelCapacitySearch(capacity=100)
+        search.step_search(start_rps=20, step_rps=20, max_rps=100)
+        for rps in (120, 140, 160):
+            search.steps.append(search._run_step(rps))
+        
+        assert search.find_knee() == 100
+    
+    @allure.title('Реальная ступень с дробным RPS проходит через LoadGenerator')
+    def test_real_step(self, http_server):
+        search = CapacitySearch(base_url(http_server), ['/health'], step_duration=1, cooldown=0,
+                                processes=1, slo=SLO(min_throughput_ratio=0.5))
+        step = search._measure(12.5)
+        
+        assert step.rps == 12
+        assert step.passed
+        assert step.error_rate == 0.0
+        assert 6 <= len(http_server.requests) <= 12
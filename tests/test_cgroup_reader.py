@@ -0,0 +1,84 @@
+"""
+Юнит-тесты чтения метрик из cgroup v2
+Работают с фейковым деревом cgroup во временном каталоге
+"""
+import allure
+import pytest
+from .utils.cgroup_reader import CgroupV2Reader, find_cgroup_path
+
+
+CONTAINER_ID = 'abc123'
+
+MEMORY_STAT = (
+    "anon 41943040\n"
+    "file 104857600\n"
+    "kernel 5242880\n"
+    "sock 8192\n"
+    "inactive_file 83886080\n"
+    "active_file 20971520\n"
+)
+
+
+class FakeContainer:
+    name = 'app-with-leak'
+    id = CONTAINER_ID
+    attrs = {'Id': CONTAINER_ID, 'State': {'Pid': 0}}
+
+
+def write_cgroup(path, current: int, usage_usec: int, pids: int = 3):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / 'memory.current').write_text(f"{current}\n")
+    (path / 'memory.stat').write_text(MEMORY_STAT)
+    (path / 'cpu.stat').write_text(f"usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\n")
+    (path / 'pids.current').write_text(f"{pids}\n")
+
+
+@pytest.fixture
+def cgroup_root(tmp_path):
+    (tmp_path / 'cgroup.controllers').write_text("cpu memory pids\n")
+    write_cgroup(tmp_path / 'system.slice' / f'docker-{CONTAINER_ID}.scope', 150 * 1024 * 1024, 1000)
+    return tmp_path
+
+
+@allure.feature('Memory Monitor')
+@allure.story('cgroup v2')
+class TestCgroupV2Reader:
+    
+    @allure.title('Working set и anon считаются отдельно от page cache')
+    def test_read_memory(self, cgroup_root):
+        reader = CgroupV2Reader.for_container(FakeContainer(), root=str(cgroup_root))
+        assert reader is not None
+        
+        metrics = reader.read()
+        assert metrics['usage_bytes'] == 150 * 1024 * 1024
+        assert metrics['working_set_bytes'] == 70 * 1024 * 1024
+        assert metrics['anon_bytes'] == 40 * 1024 * 1024
+        assert metrics['file_bytes'] == 100 * 1024 * 1024
+        assert metrics['pids'] == 3
+        reader.close()
+    
+    @allure.title('Файлы перечитываются без повторного открытия')
+    def test_reread_updates_values(self, cgroup_root):
+        path = cgroup_root / 'system.slice' / f'docker-{CONTAINER_ID}.scope'
+        reader = CgroupV2Reader(str(path))
+        first = reader.read()
+        
+        write_cgroup(path, 200 * 1024 * 1024, 1000 + 10 ** 9, pids=5)
+        second = reader.read()
+        
+        assert first['cpu_percent'] == 0.0
+        assert second['usage_bytes'] == 200 * 1024 * 1024
+        assert second['pids'] == 5
+        assert second['cpu_usage_usec'] == 1000 + 10 ** 9
+        # Огромная дельта CPU за короткий интервал обрезается до 100%
+        assert second['cpu_percent'] == 100.0
+        reader.close()
+    
+    @allure.title('Без cgroup v2 возвращается None (fallback на Docker API)')
+    def test_missing_cgroup(self, tmp_path, cgroup_root):
+        assert find_cgroup_path(FakeContainer(), root=str(tmp_path / 'missing')) is None
+        
+        other = FakeContainer()
+        other.id = 'other'
+        other.attrs = {'Id': 'other', 'State': {}}
+        assert CgroupV2Reader.for_container(other, root=str(cgroup_root)) is None
@@ -50,11 +50,8 @@ class TestDemoMemoryLeak:
                 duration=duration
             )
             
-            # Собираем данные каждые 5 секунд (6 точек за 30 сек)
-            while time.time() - start_time < duration:
-                elapsed = time.time() - start_time
-                mem = monitor.get_detailed_metrics()
-                
+            def collect(mem):
+                elapsed = mem.timestamp - start_time
                 memory_data.append({
                     'time': elapsed,
                     'rss_mb': mem.rss_mb,
@@ -67,8 +64,12 @@ class TestDemoMemoryLeak:
                 print(f"🎯 DEMO [{progress:5.1f}%] "
                       f"⏱️ {int(elapsed)}с/{duration}с "
                       f"📈 RSS: {mem.rss_mb:6.1f} MB")
-                
-                time.sleep(5)  # Интервал сбора данных
+            
+            # Собираем данные каждые 5 секунд (6 точек за 30 сек) в фоне
+            monitor.subscribe(collect)
+            monitor.start(interval=5)
+            time.sleep(duration)
+            monitor.stop()
             
             load_gen.stop()
     
@@ -84,7 +85,7 @@ class TestDemoMemoryLeak:
             )
             
             if chart_path:
-                allure.attach.file(chart_path, name="📈 Demo График", attachment_type=allure.attachment_type.PNG)
+                report.attach_chart(chart_path, name="📈 Demo График")
             
             # Результаты анализа
             allure.attach(
@@ -125,7 +126,7 @@ class TestDemoMemoryLeak:
             print(f"📊 Memory Growth: +{memory_growth:.1f} MB")
             print(f"🏁 Verdict: {verdict}")
             print("="*60)
-
+    
     @allure.story("App WITHOUT Memory Leak - 30sec Demo")  
     @allure.severity(allure.severity_level.NORMAL)
     def test_demo_app_without_leak_30sec(self, app_without_leak_container):
@@ -159,10 +160,8 @@ class TestDemoMemoryLeak:
                 duration=duration
             )
             
-            while time.time() - start_time < duration:
-                elapsed = time.time() - start_time
-                mem = monitor.get_detailed_metrics()
-                
+            def collect(mem):
+                elapsed = mem.timestamp - start_time
                 memory_data.append({
                     'time': elapsed,
                     'rss_mb': mem.rss_mb,
@@ -174,8 +173,11 @@ class TestDemoMemoryLeak:
                 print(f"✅ HEALTHY [{progress:5.1f}%] "
                       f"⏱️ {int(elapsed)}с/{duration}с "
                       f"📈 RSS: {mem.rss_mb:6.1f} MB")
-                
-                time.sleep(5)
+            
+            monitor.subscribe(collect)
+            monitor.start(interval=5)
+            time.sleep(duration)
+            monitor.stop()
             
             load_gen.stop()
     
@@ -190,7 +192,7 @@ class TestDemoMemoryLeak:
             )
             
             if chart_path:
-                allure.attach.file(chart_path, name="📈 Healthy График", attachment_type=allure.attachment_type.PNG)
+                report.attach_chart(chart_path, name="📈 Healthy График")
             
             # 🎯 УЛУЧШЕННЫЙ вердикт для здорового приложения
             # Нормальный рост Python приложения: 1-3 MB за 30 сек = ОК
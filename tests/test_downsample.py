@@ -0,0 +1,42 @@
+"""
+Юнит-тесты прореживания рядов для графиков
+"""
+import allure
+import numpy as np
+from .utils.downsample import downsample
+
+
+def sawtooth_series(count: int = 100_000, seed: int = 0):
+    """Утечка 1 MB/1000 с, пила GC и один всплеск"""
+    rng = np.random.default_rng(seed)
+    times = np.arange(count, dtype=np.float64)
+    memory = 60 + times / 1000 + (times % 600) / 100 + rng.normal(0, 0.2, count)
+    memory[count // 2 + 7] += 40
+    return times, memory
+
+
+@allure.feature('Reports')
+@allure.story('Downsampling')
+class TestDownsample:
+    
+    @allure.title('LTTB и огибающая сохраняют наклон, концы ряда и всплеск')
+    def test_shape_preserved(self):
+        times, memory = sawtooth_series()
+        slope = np.polyfit(times, memory, 1)[0]
+        
+        for method in ('lttb', 'minmax'):
+            x, y = downsample(times, memory, 1000, method)
+            
+            assert len(x) <= 1000
+            assert np.all(np.diff(x) > 0)
+            assert (x[0], x[-1]) == (times[0], times[-1])
+            assert y.max() == memory.max()
+            assert abs(np.polyfit(x, y, 1)[0] - slope) < 0.05 * slope
+    
+    @allure.title('Короткий ряд не прореживается')
+    def test_short_series_unchanged(self):
+        times, memory = sawtooth_series(count=500)
+        x, y = downsample(times, memory, 1000)
+        
+        assert np.array_equal(x, times)
+        assert np.array_equal(y, memory)
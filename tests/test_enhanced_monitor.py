@@ -0,0 +1,79 @@
+"""
+Юнит-тесты фонового сэмплера EnhancedMemoryMonitor
+Замеры контейнера подменены заглушкой, Docker не нужен
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import allure
+import pytest
+from .utils import enhanced_monitor
+from .utils.enhanced_monitor import EnhancedMemoryMonitor
+
+
+class FakeMonitor(EnhancedMemoryMonitor):
+    """Запоминает моменты замеров; durations - длительность каждого замера"""
+    
+    def __init__(self, durations, calls_needed: int):
+        super().__init__(SimpleNamespace(name='fake'))
+        self.durations = durations
+        self.calls_needed = calls_needed
+        self.calls = []
+        self.done = threading.Event()
+    
+    def get_detailed_metrics(self, timestamp=None):
+        self.calls.append(time.monotonic())
+        time.sleep(self.durations.get(len(self.calls) - 1, 0.0))
+        if len(self.calls) >= self.calls_needed:
+            self.done.set()
+        return len(self.calls)
+
+
+@pytest.fixture(autouse=True)
+def no_docker(monkeypatch):
+    monkeypatch.setattr(enhanced_monitor.docker, 'from_env', lambda: None)
+
+
+def run_sampler(monitor: FakeMonitor, interval: float):
+    monitor.start(interval=interval)
+    assert monitor.done.wait(timeout=10)
+    monitor.stop()
+    return monitor.get_sampler_statistics()
+
+
+@allure.feature('Memory Monitor')
+@allure.story('Sampler')
+class TestSampler:
+    
+    @allure.title('Такты идут по сетке, долгий замер пропускает такты, а не сдвигает сетку')
+    def test_grid_and_missed_ticks(self):
+        interval = 0.2
+        # Шестой замер (начало 1.0 с) идет 0.5 с: такты 1.2 и 1.4 пропадают
+        monitor = FakeMonitor({5: 0.5}, calls_needed=9)
+        stats = run_sampler(monitor, interval)
+        
+        offsets = [(call - monitor.calls[0]) / interval for call in monitor.calls[:9]]
+        grid = [round(offset) for offset in offsets]
+        assert grid == [0, 1, 2, 3, 4, 5, 8, 9, 10]
+        assert all(abs(offset - tick) < 0.25 for offset, tick in zip(offsets, grid))
+        
+        assert stats['missed_ticks'] == 2
+        assert stats['ticks'] == len(monitor.calls)
+        assert stats['jitter']['count'] == stats['ticks']
+        assert stats['jitter']['p99'] < 0.05
+    
+    @allure.title('Повторный запуск начинает статистику сэмплера заново')
+    def test_restart_resets_statistics(self):
+        monitor = FakeMonitor({1: 0.5}, calls_needed=4)
+        first = run_sampler(monitor, 0.2)
+        assert first['missed_ticks'] >= 2
+        
+        monitor.calls, monitor.durations = [], {}
+        monitor.done.clear()
+        second = run_sampler(monitor, 0.1)
+        
+        assert second['missed_ticks'] == 0
+        assert second['ticks'] == len(monitor.calls)
+        assert second['jitter']['count'] == second['ticks']
+        assert second['interval'] == 0.1
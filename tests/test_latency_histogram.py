@@ -0,0 +1,61 @@
+"""
+Юнит-тесты гистограммы задержек генератора нагрузки
+Не требуют запущенных контейнеров
+"""
+import random
+import allure
+import pytest
+from .utils.latency_histogram import LatencyHistogram
+
+
+@allure.feature('Load Generator')
+@allure.story('Latency Histogram')
+class TestLatencyHistogram:
+    
+    @allure.title('Перцентили совпадают с точными в пределах точности корзин')
+    def test_percentiles_match_exact_values(self):
+        rng = random.Random(42)
+        values = [rng.lognormvariate(-4, 1) for _ in range(20000)]
+        
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        
+        values.sort()
+        for percentile in (50.0, 90.0, 99.0, 99.9):
+            exact = values[int(percentile / 100 * len(values)) - 1]
+            assert histogram.percentile(percentile) == pytest.approx(exact, rel=0.02)
+        
+        assert histogram.total_count == len(values)
+        assert histogram.min_value == values[0]
+        assert histogram.max_value == values[-1]
+        assert histogram.mean == pytest.approx(sum(values) / len(values))
+    
+    @allure.title('Память ограничена числом корзин, а не числом записей')
+    def test_bucket_count_is_bounded(self):
+        histogram = LatencyHistogram(max_value_seconds=60.0)
+        for i in range(100000):
+            histogram.record(i * 0.001)
+        
+        assert len(histogram.counts) <= histogram.max_buckets
+        assert histogram.percentile(100.0) == pytest.approx(60.0, rel=0.02)
+    
+    @allure.title('Слияние гистограмм разных потоков')
+    def test_merge(self):
+        first = LatencyHistogram()
+        second = LatencyHistogram()
+        for i in range(1, 1001):
+            (first if i % 2 else second).record(i / 1000)
+        
+        merged = first.copy()
+        merged.merge(second)
+        
+        assert merged.total_count == 1000
+        assert merged.min_value == 0.001
+        assert merged.max_value == 1.0
+        assert merged.percentile(50.0) == pytest.approx(0.5, rel=0.02)
+        # Исходная гистограмма не изменилась
+        assert first.total_count == 500
+        
+        with pytest.raises(ValueError):
+            merged.merge(LatencyHistogram(sub_bucket_bits=5))
@@ -0,0 +1,74 @@
+"""
+Юнит-тесты онлайн-детектора утечек
+Ряды замеров синтетические, контейнеры не нужны
+"""
+import allure
+import numpy as np
+from .utils.leak_detector import LeakThreshold, OnlineLeakDetector, SeriesTest
+from .utils.trend_engine import TrendEngine
+
+
+def run_detector(rss_rate: float = 0.0, files_rate: float = 0.0, seed: int = 0,
+                 duration: int = 600, interval: int = 5) -> OnlineLeakDetector:
+    """Прогоняет детектор по ряду с шумом AR(1) и пилой GC до вердикта"""
+    rng = np.random.default_rng(seed)
+    detector = OnlineLeakDetector()
+    noise = 0.0
+    for step in range(duration // interval):
+        elapsed = step * interval
+        noise = 0.5 * noise + rng.normal(0, 1.0)
+        detector.update({
+            'timestamp': 1000.0 + elapsed,
+            'rss_mb': 60 + rss_rate * elapsed / 60 + noise + (elapsed % 40) / 10,
+            'open_files': 10 + int(files_rate * elapsed / 60),
+            'tcp_connections': 3 + int(rng.integers(0, 2)),
+            'threads_count': 4
+        })
+        if detector.decided:
+            break
+    return detector
+
+
+@allure.feature('Memory Leak Detection')
+@allure.story('Online Detector')
+class TestOnlineLeakDetector:
+    
+    @allure.title('Рост RSS обнаруживается за пару минут')
+    def test_memory_leak_detected_early(self):
+        detector = run_detector(rss_rate=6.0)
+        
+        assert detector.verdict == 'leak'
+        assert detector.leaking_metrics == ['rss_mb']
+        assert detector.decided_at <= 180
+        report = detector.get_report()['metrics']['rss_mb']
+        assert 4.0 < report['slope_per_min'] < 8.0
+    
+    @allure.title('Стабильное приложение получает вердикт без утечки')
+    def test_stable_series(self):
+        verdicts = [run_detector(seed=seed) for seed in range(20)]
+        
+        assert all(detector.verdict == 'no_leak' for detector in verdicts)
+        assert max(detector.decided_at for detector in verdicts) <= 300
+    
+    @allure.title('Утечка файловых дескрипторов при стабильной памяти')
+    def test_file_descriptor_leak(self):
+        detector = run_detector(files_rate=30.0)
+        
+        assert detector.verdict == 'leak'
+        assert detector.leaking_metrics == ['open_files']
+    
+    @allure.title('Тест метрики считает статистику через TrendEngine с полом шума')
+    def test_series_uses_trend_engine(self):
+        series = SeriesTest(LeakThreshold('open_files', min_rate=1.0, noise_floor=0.5), alpha=0.01, beta=0.05)
+        engine = TrendEngine()
+        # Ступенчатый счетчик без шума: остатки нулевые, дисперсия - из noise_floor
+        for step in range(40):
+            series.update(1000.0 + step * 5, 10 + step // 12)
+            engine.add(1000.0 + step * 5, 10 + step // 12)
+        
+        fit = series.fit()
+        expected = engine.fit(min_variance=0.25)
+        assert fit['slope_per_min'] == expected['slope']
+        assert fit['stderr_per_min'] == expected['stderr']
+        assert fit['residual_std'] >= 0.5
+        assert series.duration_minutes == 39 * 5 / 60
@@ -0,0 +1,287 @@
+"""
+Поведенческие тесты генератора нагрузки на локальном HTTP сервере
+Не требуют запущенных контейнеров
+"""
+import json
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import allure
+import pytest
+from .utils.load_generator import LoadGenerator
+from .utils.payload_pool import KEY_RANGE, PayloadPool
+from .utils.request_log import RequestLogSink, read_request_log
+from .utils.traffic_profile import LoadStage, TrafficProfile
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Отвечает 200 на любой запрос; /slow - через 0.5 с"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append((self.command, self.path, body))
+        self.server.arrivals.append(time.perf_counter())
+        if self.path == '/slow':
+            time.sleep(0.5)
+        payload = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    do_GET = _reply
+    do_POST = _reply
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Локальный сервер; server.requests - принятые запросы (метод, путь, тело)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.requests = []
+    server.arrivals = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def base_url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run(generator: LoadGenerator, seconds: float, **kwargs):
+    generator.verbose = False
+    generator.start(**kwargs)
+    time.sleep(seconds)
+    generator.stop()
+    return generator.get_statistics()
+
+
+@allure.feature('Load Generator')
+@allure.story('Open Loop')
+class TestOpenLoop:
+    
+    @allure.title('Open режим отправляет ровно запланированное число запросов')
+    def test_constant_schedule_totals(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=1)
+        stats = run(generator, 1.5, endpoints=['/health', '/api/cache'], rps=40, duration=1,
+                    mode='open', arrival='constant', concurrency=4)
+        
+        assert stats['scheduled_requests'] == 40
+        assert stats['missed_requests'] == 0
+        assert stats['total_requests'] == stats['successful'] == 40
+        assert len(http_server.requests) == 40
+        # Посекундная шкала собирается из шардов рабочих потоков без потерь
+        assert sum(b['requests'] for b in generator.get_timeline()) == 40
+        series = generator.get_timeseries()
+        assert sum(p['requests'] for points in series.values() for p in points) == 40
+        assert set(series) <= {'/health', '/api/cache'}
+    
+    @allure.title('Open режим с нулевым RPS отклоняется')
+    def test_zero_rps_rejected(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=1)
+        with pytest.raises(ValueError):
+            generator.start(['/health'], rps=0, duration=1, mode='open')
+        assert list(LoadGenerator._arrival_offsets(0, 10, 'poisson')) == []
+    
+    @allure.title('Очередь отправки ограничена - при зависшем сервере запросы пропускаются')
+    def test_bounded_send_queue(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=1)
+        generator.SEND_QUEUE_PER_WORKER = 5
+        stats = run(generator, 1.2, endpoints=['/slow'], rps=100, duration=1,
+                    mode='open', concurrency=1)
+        
+        assert stats['scheduled_requests'] == 100
+        assert stats['missed_requests'] > 50
+        assert stats['total_requests'] <= 100 - stats['missed_requests']
+    
+    @allure.title('Closed режим: каждый поток отправляет запрос раз в секунду')
+    def test_closed_loop_totals(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=1)
+        stats = run(generator, 2.5, endpoints=['/health'], rps=3, duration=2.5)
+        
+        assert stats['total_requests'] == stats['successful'] == 9
+        assert stats['connections_opened'] == 3
+        assert stats['latency_histogram']['count'] == 9
+
+
+@allure.feature('Load Generator')
+@allure.story('Multiprocess')
+class TestMultiprocess:
+    
+    @allure.title('Итоги двух процессов-генераторов складываются без потерь')
+    def test_two_processes_totals(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=2)
+        stats = run(generator, 4.0, endpoints=['/health'], rps=40, duration=1,
+                    mode='open', concurrency=4)
+        
+        assert stats['scheduled_requests'] == 40
+        assert stats['total_requests'] == stats['successful'] == 40
+        assert len(http_server.requests) == 40
+        assert sum(b['requests'] for b in generator.get_timeline()) == 40
+        assert stats['latency_histogram']['count'] == 40
+    
+    @allure.title('Расписания процессов сдвинуты друг относительно друга, а не идут пачками')
+    def test_processes_interleaved(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=2)
+        stats = run(generator, 4.0, endpoints=['/health'], rps=20, duration=1,
+                    mode='open', concurrency=4)
+        
+        assert stats['total_requests'] == 20
+        # Общий поток 20 RPS: запросы через ~50 мс. Без сдвига процессы
+        # отправляли бы пары запросов одновременно
+        gaps = [b - a for a, b in zip(sorted(http_server.arrivals), sorted(http_server.arrivals)[1:])]
+        assert sum(gap < 0.015 for gap in gaps) <= 2
+    
+    @allure.title('Зависшие процессы ждутся одним общим дедлайном')
+    def test_collect_shared_deadline(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=3)
+        generator.PROCESS_COLLECT_TIMEOUT = 1.0
+        generator.verbose = False
+        generator.start(['/health'], rps=3, duration=1, mode='open')
+        # Подменяем событие: процессы не получат сигнал остановки и не ответят
+        generator._process_stop = multiprocessing.get_context('spawn').Event()
+        workers = [process for process, counters, receiver in generator._workers]
+        
+        started = time.monotonic()
+        generator._collect_processes()
+        
+        assert time.monotonic() - started < 2.5
+        # Не ответившие до дедлайна процессы завершаются принудительно
+        for process in workers:
+            process.join(timeout=2)
+            assert not process.is_alive()
+
+
+@allure.feature('Load Generator')
+@allure.story('Traffic Profile')
+class TestTrafficProfile:
+    
+    @allure.title('Запросы профиля размечаются по стадиям, пустая стадия пропускается')
+    def test_stage_accounting(self, http_server):
+        profile = TrafficProfile(
+            endpoints={'/health': 1, '/api/cache': 1},
+            stages=[
+                LoadStage('warm-up', 0.5, 20),
+                LoadStage('pause', 0.5, 0),
+                LoadStage('steady', 0.5, 40),
+            ]
+        )
+        generator = LoadGenerator(base_url(http_server), processes=1)
+        generator.verbose = False
+        generator.start_profile(profile, concurrency=4)
+        time.sleep(2.0)
+        generator.stop()
+        stats = generator.get_statistics()
+        
+        assert stats['total_requests'] == stats['scheduled_requests'] == 30
+        stages = stats['stages']
+        assert [stages[name]['requests'] for name in ('warm-up', 'pause', 'steady')] == [10, 0, 20]
+        assert stages['steady']['actual_rps'] == pytest.approx(40)
+        assert generator.stage_at(stages['pause']['start'] + 0.1) == 'pause'
+
+
+@allure.feature('Load Generator')
+@allure.story('Payload Pool')
+class TestPayloadPool:
+    
+    @allure.title('Пул любого размера покрывает все ключи кеша и Redis')
+    def test_key_coverage(self):
+        for size in (16, 1024):
+            pool = PayloadPool(['/api/cache', '/api/redis', '/api/file', '/health'], size=size, seed=1)
+            cache, redis = [], []
+            for _ in range(KEY_RANGE):
+                cache.append(json.loads(pool.body('/api/cache')))
+                redis.append(json.loads(pool.body('/api/redis')))
+            
+            assert {p['key'] for p in cache} == {f'key_{i}' for i in range(1, KEY_RANGE + 1)}
+            assert {p['key'] for p in redis} == {f'redis_key_{i}' for i in range(1, KEY_RANGE + 1)}
+            assert all(100 <= len(p['value']) <= 1000 for p in cache)
+            assert 'content' in json.loads(pool.body('/api/file'))
+            assert pool.body('/health') is None
+
+
+@allure.feature('Load Generator')
+@allure.story('Request Log')
+class TestRequestLog:
+    
+    @allure.title('Журнал содержит запись о каждом запросе генератора')
+    def test_log_matches_requests(self, http_server, tmp_path):
+        path = str(tmp_path / 'requests.tsv')
+        generator = LoadGenerator(base_url(http_server), processes=1, request_log=path)
+        stats = run(generator, 1.5, endpoints=['/health', '/api/cache'], rps=20, duration=1,
+                    mode='open', concurrency=2)
+        
+        records = list(read_request_log(path))
+        assert stats['request_log_written'] == len(records) == stats['total_requests'] == 20
+        assert stats['request_log_dropped'] == 0
+        assert all(r['status'] == 200 and r['bytes'] == 16 for r in records)
+        assert {r['endpoint'] for r in records} <= {'/health', '/api/cache'}
+    
+    @allure.title('Переполненная очередь журнала отбрасывает записи, не блокируя генератор')
+    def test_full_queue_drops(self, tmp_path):
+        sink = RequestLogSink(str(tmp_path / 'requests.tsv'), maxsize=5)
+        results = [sink.put(time.time(), '/health', 200, 0.01, 16) for _ in range(8)]
+        sink.start()
+        sink.close()
+        
+        assert results == [True] * 5 + [False] * 3
+        assert sink.get_statistics()['written'] == 5
+        assert sink.get_statistics()['dropped'] == 3
+        assert len(list(read_request_log(sink.path))) == 5
+
+
+@allure.feature('Load Generator')
+@allure.story('Timeline')
+class TestTimeline:
+    
+    @allure.title('Посекундные ряды по endpoint\'ам совпадают с запросами сервера')
+    def test_per_endpoint_series(self, http_server):
+        generator = LoadGenerator(base_url(http_server), processes=1)
+        # Ячейки финализируются сразу - квантили и счетчики не должны теряться
+        generator.SERIES_FINALIZE_DELAY = 0
+        generator.OUTBOX_FOLD_THRESHOLD = 0
+        stats = run(generator, 2.5, endpoints=['/health', '/api/cache', '/api/file'], rps=30, duration=2,
+                    mode='open', arrival='poisson', concurrency=6)
+        
+        series = generator.get_timeseries()
+        for endpoint, points in series.items():
+            sent = sum(1 for method, path, body in http_server.requests if path == endpoint)
+            assert sum(p['requests'] for p in points) == sent
+            assert [p['timestamp'] for p in points] == sorted({p['timestamp'] for p in points})
+            assert all(0 < p['p50'] <= p['p99'] <= p['max'] for p in points)
+        assert sum(len(points) for points in series.values()) >= 3
+        assert stats['peak_second_rps'] == max(b['requests'] for b in generator.get_timeline())
+    
+    @allure.title('Живой снимок шкалы не видит наполовину обновленных корзин')
+    def test_snapshot_consistent_with_writer(self):
+        generator = LoadGenerator('http://127.0.0.1:9', processes=1)
+        shard = generator._create_shard()
+        stop = threading.Event()
+        
+        def writer():
+            while not stop.is_set():
+                shard.record(True, 0.01, endpoint='/health')
+        
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        try:
+            for _ in range(2000):
+                for cells in generator._timeline_snapshot().values():
+                    for cell in cells.values():
+                        # Счетчик и гистограмма ячейки обновляются вместе
+                        assert cell.histogram is None or cell.requests == cell.histogram.total_count
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,52 @@
+"""
+Юнит-тесты анализа пола памяти после сборок мусора
+"""
+import allure
+import numpy as np
+from .utils.memory_floor import analyze_floor
+from .utils.report_builder import ReportBuilder
+
+
+def sawtooth(minutes: float, leak: float, period: float = 60.0, churn: float = 15.0, seed: int = 0):
+    """Пила GC с периодом period секунд, зубцом churn MB и утечкой leak MB/мин"""
+    rng = np.random.default_rng(seed)
+    times = np.arange(0, minutes * 60, 5.0)
+    memory = 80 + leak * times / 60 + churn * (times % period) / period + rng.normal(0, 0.3, len(times))
+    return times, memory
+
+
+@allure.feature('Memory Leak Detection')
+@allure.story('Post-GC Floor')
+class TestMemoryFloor:
+    
+    @allure.title('Пол пилы отделяет удержание памяти от оборота между сборками')
+    def test_floor_separates_churn(self):
+        # Прогон обрывается на вершине зубца: рост от начала до конца ~14 MB без утечки
+        times, memory = sawtooth(minutes=5, leak=0.0)
+        stable = analyze_floor(times, memory, threshold=4.0)
+        
+        assert stable['method'] == 'gc_cycles'
+        assert stable['cycles'] == 4
+        assert abs(stable['churn_mb'] - 15.0) < 2.0
+        assert abs(stable['floor_slope']) < 0.5
+        assert stable['trend'] == 'stable'
+        
+        times, memory = sawtooth(minutes=5, leak=8.0)
+        leak = analyze_floor(times, memory, threshold=4.0)
+        
+        assert abs(leak['floor_slope'] - 8.0) < 0.5
+        assert leak['trend'] == 'increasing'
+    
+    @allure.title('analyze_trend в режиме floor не считает пилу утечкой')
+    def test_analyze_trend_floor_mode(self, tmp_path):
+        times, memory = sawtooth(minutes=3, leak=0.0, period=45.0, churn=25.0, seed=3)
+        data = [{'time': t, 'rss_mb': m} for t, m in zip(times[:-1], memory[:-1])]
+        report = ReportBuilder(output_dir=str(tmp_path), render_mode='none')
+        
+        ci = report.analyze_trend(data, mode='ci')
+        floor = report.analyze_trend(data, mode='floor')
+        
+        assert ci['growth_rate'] > 4.0
+        assert floor['trend'] == 'stable'
+        assert abs(floor['growth_rate']) < 1.0
+        assert floor['gc_cycles'] == 3
@@ -4,8 +4,11 @@
 """
 import pytest
 import allure
+import json
 import time
 from .utils.enhanced_monitor import EnhancedMemoryMonitor
+from .utils.leak_detector import OnlineLeakDetector
+from .utils.monitor_group import MonitorGroup
 from .utils.load_generator import LoadGenerator
 from .utils.report_builder import ReportBuilder
 
@@ -52,6 +55,7 @@ class TestMemoryLeakDetection:
         
         with allure.step(f"Р“РµРЅРµСЂР°С†РёСЏ РЅР°РіСЂСѓР·РєРё РІ С‚РµС‡РµРЅРёРµ {duration} СЃРµРєСѓРЅРґ"):
             memory_data = []
+            detector = OnlineLeakDetector()
             start_time = time.time()
             
             # Р—Р°РїСѓСЃРєР°РµРј РіРµРЅРµСЂР°С‚РѕСЂ РЅР°РіСЂСѓР·РєРё РІ РѕС‚РґРµР»СЊРЅРѕРј РїРѕС‚РѕРєРµ
@@ -78,6 +82,12 @@ class TestMemoryLeakDetection:
                     print(f"вЏ±пёЏ  {int(elapsed/60)} РјРёРЅ: RSS={mem.rss_mb:.2f} MB, "
                           f"VMS={mem.vms_mb:.2f} MB, CPU={mem.memory_percent:.1f}%")
                 
+                # Последовательный тест: останавливаемся, как только вердикт по памяти
+                # статистически уверен (утечка fd или соединений не останавливает прогон)
+                if detector.update(mem) == 'no_leak' or 'rss_mb' in detector.leaking_metrics:
+                    print(f"🎯 Досрочный вердикт через {elapsed:.0f} с: {detector.verdict}")
+                    break
+                
                 time.sleep(5)
             
             load_gen.stop()
@@ -92,7 +102,7 @@ class TestMemoryLeakDetection:
                 title="РџРѕС‚СЂРµР±Р»РµРЅРёРµ РїР°РјСЏС‚Рё - App WITH Leak (10 min)",
                 filename="memory_with_leak_10min.png"
             )
-            allure.attach.file(chart_path, name="Р“СЂР°С„РёРє РїР°РјСЏС‚Рё", attachment_type=allure.attachment_type.PNG)
+            report.attach_chart(chart_path, name="Р“СЂР°С„РёРє РїР°РјСЏС‚Рё")
             
             # РђРЅР°Р»РёР· С‚СЂРµРЅРґР°
             trend_analysis = report.analyze_trend(memory_data)
@@ -117,26 +127,49 @@ class TestMemoryLeakDetection:
             )
         
         with allure.step("Р’РµСЂРґРёРєС‚: РћР±РЅР°СЂСѓР¶РµРЅР° Р»Рё СѓС‚РµС‡РєР°?"):
-            # РљСЂРёС‚РµСЂРёРё СѓС‚РµС‡РєРё:
+            # Критерии утечки, если детектор не вынес досрочный вердикт по памяти:
             # 1. Р РѕСЃС‚ РїР°РјСЏС‚Рё > 50 MB
             # 2. РџРѕСЃС‚РѕСЏРЅРЅС‹Р№ РІРѕСЃС…РѕРґСЏС‰РёР№ С‚СЂРµРЅРґ
             # 3. РЎРєРѕСЂРѕСЃС‚СЊ СЂРѕСЃС‚Р° > 3 MB/РјРёРЅ
             
-            is_leak = (
-                memory_growth > 50 and
-                trend_analysis['trend'] == 'increasing' and
-                trend_analysis['growth_rate'] > 3.0
+            detector_report = detector.get_report()
+            allure.attach(
+                json.dumps(detector_report, indent=2),
+                name="Онлайн детектор утечек",
+                attachment_type=allure.attachment_type.JSON
             )
             
+            # Досрочный вердикт детектора решает, только если он вынесен по памяти (rss_mb)
+            rss_decided = detector.verdict == 'no_leak' or 'rss_mb' in detector.leaking_metrics
+            if rss_decided:
+                # Прогон остановлен досрочно - пороги роста за полные 10 минут неприменимы
+                is_leak = 'rss_mb' in detector.leaking_metrics
+                rss = detector_report['metrics']['rss_mb']
+                criteria = (
+                    f"Критерии (последовательный тест, alpha={detector.alpha}, beta={detector.beta}):\n"
+                    f"✓ Решение принято через {detector.decided_at:.0f} с ({detector.samples} замеров)\n"
+                    f"✓ Метрики с утечкой: {', '.join(detector.leaking_metrics) or 'нет'}\n"
+                    f"✓ Наклон RSS: {rss.get('slope_per_min', 0.0):.2f} ± {rss.get('stderr_per_min', 0.0):.2f} MB/мин "
+                    f"(порог {rss['min_rate_per_min']:.1f} MB/мин)"
+                )
+            else:
+                is_leak = (
+                    memory_growth > 50 and
+                    trend_analysis['trend'] == 'increasing' and
+                    trend_analysis['growth_rate'] > 3.0
+                )
+                criteria = (
+                    f"РљСЂРёС‚РµСЂРёРё:\n"
+                    f"вњ“ Р РѕСЃС‚ > 50 MB: {'Р”Рђ' if memory_growth > 50 else 'РќР•Рў'} ({memory_growth:.2f} MB)\n"
+                    f"вњ“ РўСЂРµРЅРґ СЂР°СЃС‚СѓС‰РёР№: {'Р”Рђ' if trend_analysis['trend'] == 'increasing' else 'РќР•Рў'}\n"
+                    f"вњ“ РЎРєРѕСЂРѕСЃС‚СЊ > 3 MB/РјРёРЅ: {'Р”Рђ' if trend_analysis['growth_rate'] > 3.0 else 'РќР•Рў'} "
+                    f"({trend_analysis['growth_rate']:.2f} MB/РјРёРЅ)"
+                )
+            
             verdict = "рџ”ґ РЈРўР•Р§РљРђ РћР‘РќРђР РЈР–Р•РќРђ" if is_leak else "рџџў РЈС‚РµС‡РєР° РЅРµ РѕР±РЅР°СЂСѓР¶РµРЅР°"
             
             allure.attach(
-                f"{verdict}\n\n"
-                f"РљСЂРёС‚РµСЂРёРё:\n"
-                f"вњ“ Р РѕСЃС‚ > 50 MB: {'Р”Рђ' if memory_growth > 50 else 'РќР•Рў'} ({memory_growth:.2f} MB)\n"
-                f"вњ“ РўСЂРµРЅРґ СЂР°СЃС‚СѓС‰РёР№: {'Р”Рђ' if trend_analysis['trend'] == 'increasing' else 'РќР•Рў'}\n"
-                f"вњ“ РЎРєРѕСЂРѕСЃС‚СЊ > 3 MB/РјРёРЅ: {'Р”Рђ' if trend_analysis['growth_rate'] > 3.0 else 'РќР•Рў'} "
-                f"({trend_analysis['growth_rate']:.2f} MB/РјРёРЅ)",
+                f"{verdict}\n\n{criteria}",
                 name="рџЋЇ Р’Р•Р Р”РРљРў",
                 attachment_type=allure.attachment_type.TEXT
             )
@@ -182,6 +215,7 @@ class TestMemoryLeakDetection:
         
         with allure.step(f"Load generation for {duration} seconds"):
             memory_data = []
+            detector = OnlineLeakDetector()
             start_time = time.time()
             
             load_gen.start(
@@ -205,6 +239,12 @@ class TestMemoryLeakDetection:
                     print(f"вЏ±пёЏ  {int(elapsed/60)} РјРёРЅ: RSS={mem.rss_mb:.2f} MB, "
                           f"VMS={mem.vms_mb:.2f} MB, CPU={mem.memory_percent:.1f}%")
                 
+                # Последовательный тест: останавливаемся, как только вердикт по памяти
+                # статистически уверен (утечка fd или соединений не останавливает прогон)
+                if detector.update(mem) == 'no_leak' or 'rss_mb' in detector.leaking_metrics:
+                    print(f"🎯 Досрочный вердикт через {elapsed:.0f} с: {detector.verdict}")
+                    break
+                
                 time.sleep(5)
             
             load_gen.stop()
@@ -218,7 +258,7 @@ class TestMemoryLeakDetection:
                 title="РџРѕС‚СЂРµР±Р»РµРЅРёРµ РїР°РјСЏС‚Рё - App WITHOUT Leak (10 min)",
                 filename="memory_without_leak_10min.png"
             )
-            allure.attach.file(chart_path, name="Р“СЂР°С„РёРє РїР°РјСЏС‚Рё", attachment_type=allure.attachment_type.PNG)
+            report.attach_chart(chart_path, name="Р“СЂР°С„РёРє РїР°РјСЏС‚Рё")
             
             trend_analysis = report.analyze_trend(memory_data)
             allure.attach(
@@ -241,21 +281,44 @@ class TestMemoryLeakDetection:
             )
         
         with allure.step("Р’РµСЂРґРёРєС‚: РћР±РЅР°СЂСѓР¶РµРЅР° Р»Рё СѓС‚РµС‡РєР°?"):
-            is_leak = (
-                memory_growth > 50 and
-                trend_analysis['trend'] == 'increasing' and
-                trend_analysis['growth_rate'] > 3.0
+            detector_report = detector.get_report()
+            allure.attach(
+                json.dumps(detector_report, indent=2),
+                name="Онлайн детектор утечек",
+                attachment_type=allure.attachment_type.JSON
             )
             
+            # Досрочный вердикт детектора решает, только если он вынесен по памяти (rss_mb)
+            rss_decided = detector.verdict == 'no_leak' or 'rss_mb' in detector.leaking_metrics
+            if rss_decided:
+                # Прогон остановлен досрочно - пороги роста за полные 10 минут неприменимы
+                is_leak = 'rss_mb' in detector.leaking_metrics
+                rss = detector_report['metrics']['rss_mb']
+                criteria = (
+                    f"Критерии (последовательный тест, alpha={detector.alpha}, beta={detector.beta}):\n"
+                    f"✓ Решение принято через {detector.decided_at:.0f} с ({detector.samples} замеров)\n"
+                    f"✓ Метрики с утечкой: {', '.join(detector.leaking_metrics) or 'нет'}\n"
+                    f"✓ Наклон RSS: {rss.get('slope_per_min', 0.0):.2f} ± {rss.get('stderr_per_min', 0.0):.2f} MB/мин "
+                    f"(порог {rss['min_rate_per_min']:.1f} MB/мин)"
+                )
+            else:
+                is_leak = (
+                    memory_growth > 50 and
+                    trend_analysis['trend'] == 'increasing' and
+                    trend_analysis['growth_rate'] > 3.0
+                )
+                criteria = (
+                    f"РљСЂРёС‚РµСЂРёРё:\n"
+                    f"вњ“ Р РѕСЃС‚ > 50 MB: {'Р”Рђ' if memory_growth > 50 else 'РќР•Рў'} ({memory_growth:.2f} MB)\n"
+                    f"вњ“ РўСЂРµРЅРґ СЂР°СЃС‚СѓС‰РёР№: {'Р”Рђ' if trend_analysis['trend'] == 'increasing' else 'РќР•Рў'}\n"
+                    f"вњ“ РЎРєРѕСЂРѕСЃС‚СЊ > 3 MB/РјРёРЅ: {'Р”Рђ' if trend_analysis['growth_rate'] > 3.0 else 'РќР•Рў'} "
+                    f"({trend_analysis['growth_rate']:.2f} MB/РјРёРЅ)"
+                )
+            
             verdict = "рџ”ґ РЈРўР•Р§РљРђ РћР‘РќРђР РЈР–Р•РќРђ" if is_leak else "рџџў РЈС‚РµС‡РєР° РЅРµ РѕР±РЅР°СЂСѓР¶РµРЅР°"
             
             allure.attach(
-                f"{verdict}\n\n"
-                f"РљСЂРёС‚РµСЂРёРё:\n"
-                f"вњ“ Р РѕСЃС‚ > 50 MB: {'Р”Рђ' if memory_growth > 50 else 'РќР•Рў'} ({memory_growth:.2f} MB)\n"
-                f"вњ“ РўСЂРµРЅРґ СЂР°СЃС‚СѓС‰РёР№: {'Р”Рђ' if trend_analysis['trend'] == 'increasing' else 'РќР•Рў'}\n"
-                f"вњ“ РЎРєРѕСЂРѕСЃС‚СЊ > 3 MB/РјРёРЅ: {'Р”Рђ' if trend_analysis['growth_rate'] > 3.0 else 'РќР•Рў'} "
-                f"({trend_analysis['growth_rate']:.2f} MB/РјРёРЅ)",
+                f"{verdict}\n\n{criteria}",
                 name="рџЋЇ Р’Р•Р Р”РРљРў",
                 attachment_type=allure.attachment_type.TEXT
             )
@@ -301,13 +364,13 @@ class TestMemoryLeakDetection:
                 duration=duration
             )
             
-            start_time = time.time()
+            monitors = MonitorGroup({'leak': monitor_leak, 'no_leak': monitor_no_leak})
             
-            while time.time() - start_time < duration:
-                elapsed = time.time() - start_time
-                
-                mem_leak = monitor_leak.get_detailed_metrics()
-                mem_no_leak = monitor_no_leak.get_detailed_metrics()
+            for elapsed, samples in monitors.ticks(duration, interval=5):
+                if len(samples) < 2:
+                    continue
+                mem_leak = samples['leak']
+                mem_no_leak = samples['no_leak']
                 
                 data_leak.append({
                     'time': elapsed,
@@ -325,9 +388,8 @@ class TestMemoryLeakDetection:
                     print(f"вЏ±пёЏ  {int(elapsed/60)} РјРёРЅ:")
                     print(f"   WITH leak: RSS={mem_leak.rss_mb:.2f} MB")
                     print(f"   WITHOUT leak: RSS={mem_no_leak.rss_mb:.2f} MB")
-                
-                time.sleep(5)
             
+            monitors.close()
             load_leak.stop()
             load_no_leak.stop()
         
@@ -339,7 +401,7 @@ class TestMemoryLeakDetection:
                 title="РЎСЂР°РІРЅРµРЅРёРµ РїРѕС‚СЂРµР±Р»РµРЅРёСЏ РїР°РјСЏС‚Рё (15 min)",
                 filename="memory_comparison_15min.png"
             )
-            allure.attach.file(chart_path, name="РЎСЂР°РІРЅРёС‚РµР»СЊРЅС‹Р№ РіСЂР°С„РёРє", attachment_type=allure.attachment_type.PNG)
+            report.attach_chart(chart_path, name="РЎСЂР°РІРЅРёС‚РµР»СЊРЅС‹Р№ РіСЂР°С„РёРє")
             
             # РђРЅР°Р»РёР· С‚СЂРµРЅРґРѕРІ
             trend_leak = report.analyze_trend(data_leak)
@@ -0,0 +1,56 @@
+"""
+Юнит-тесты потокового экспорта метрик
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List
+import allure
+import numpy as np
+from .utils.metrics_export import MetricsExporter, read_metrics
+
+
+@dataclass
+class Sample:
+    timestamp: float
+    rss_mb: float
+    open_files: int
+    source: str = 'cgroup'
+    processes: List[Dict] = field(default_factory=list)
+
+
+def write_samples(path, count: int, chunk_rows: int = 60):
+    exporter = MetricsExporter(str(path), Sample, chunk_rows=chunk_rows)
+    for i in range(count):
+        exporter.append(Sample(1_700_000_000.0 + i, 50 + i * 0.1, i, processes=[{'pid': i}]))
+    return exporter
+
+
+@allure.feature('Memory Monitor')
+@allure.story('Metrics Export')
+class TestMetricsExport:
+    
+    @allure.title('Экспорт читается обратно в колонки без потерь')
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / 'metrics.mlk'
+        write_samples(path, 1000).close()
+        
+        data = read_metrics(str(path))
+        assert np.array_equal(data['timestamp'], 1_700_000_000.0 + np.arange(1000))
+        assert np.allclose(data['rss_mb'], 50 + np.arange(1000) * 0.1)
+        assert data['open_files'].dtype == np.int64
+        assert data['source'][0] == 'cgroup'
+        assert data['processes'][999] == [{'pid': 999}]
+        
+        numeric = read_metrics(str(path), columns=['timestamp', 'rss_mb'])
+        assert set(numeric) == {'timestamp', 'rss_mb'}
+    
+    @allure.title('Недописанный блок после падения пропускается')
+    def test_truncated_tail(self, tmp_path):
+        path = tmp_path / 'metrics.mlk'
+        # Последние 30 замеров еще в буфере - как при падении процесса
+        write_samples(path, 150, chunk_rows=60)
+        
+        assert len(read_metrics(str(path))['timestamp']) == 120
+        
+        with open(path, 'r+b') as f:
+            f.truncate(path.stat().st_size - 10)
+        assert len(read_metrics(str(path))['timestamp']) == 60
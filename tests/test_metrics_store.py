@@ -0,0 +1,72 @@
+"""
+Юнит-тесты колоночного хранилища замеров
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List
+import allure
+import numpy as np
+from .utils.metrics_store import MetricsStore
+
+
+@dataclass
+class Sample:
+    timestamp: float
+    rss_mb: float
+    open_files: int
+    source: str = 'docker'
+    processes: List[Dict] = field(default_factory=list)
+
+
+@allure.feature('Memory Monitor')
+@allure.story('Metrics Store')
+class TestMetricsStore:
+    
+    @allure.title('Кольцо отдает последние замеры по порядку без копирования')
+    def test_ring_buffer_views(self):
+        store = MetricsStore(Sample, capacity=2500)
+        for i in range(6000):
+            store.append(Sample(float(i), i * 0.5, i))
+        
+        timestamps = store.column('timestamp')
+        assert len(store) == 2500
+        assert timestamps.base is not None  # view, а не копия
+        assert np.array_equal(timestamps, np.arange(3500, 6000))
+        assert store.column('open_files').dtype == np.int64
+        
+        assert store[0] == Sample(3500.0, 1750.0, 3500)
+        assert store[-1].timestamp == 5999.0
+        assert [s.open_files for s in store[-3:]] == [5997, 5998, 5999]
+    
+    @allure.title('Вытесненные замеры сбрасываются на диск блоками')
+    def test_spill(self, tmp_path):
+        store = MetricsStore(Sample, capacity=1000, spill_dir=str(tmp_path), spill_chunk=250)
+        for i in range(2600):
+            store.append(Sample(float(i), 1.0, i, processes=[{'pid': i}]))
+        
+        chunks = list(store.iter_spilled())
+        spilled = np.concatenate([chunk['timestamp'] for chunk in chunks])
+        
+        # Блок сбрасывается целиком до перезаписи своей первой строки
+        assert store.spilled == len(spilled) == 1750
+        assert np.array_equal(spilled, np.arange(1750))
+        assert np.array_equal(store.column('timestamp'), np.arange(1600, 2600))
+        assert chunks[0]['processes'][1] == [{'pid': 1}]
+    
+    @allure.title('Колонки объектов хранятся без зеркала и сбрасываются без pickle')
+    def test_object_columns(self, tmp_path):
+        store = MetricsStore(Sample, capacity=100, spill_dir=str(tmp_path), spill_chunk=50)
+        for i in range(260):
+            store.append(Sample(float(i), 1.0, i, source=f's{i}', processes=[{'pid': i}]))
+        
+        processes = store.column('processes')
+        assert [p[0]['pid'] for p in processes] == list(range(160, 260))
+        assert list(store.column('source')[-2:]) == ['s258', 's259']
+        assert store[0].processes == [{'pid': 160}] and store[-1].source == 's259'
+        
+        # Блоки читаются без allow_pickle, объекты восстанавливаются из JSON
+        for path in sorted(tmp_path.glob('chunk_*.npz')):
+            with np.load(path, allow_pickle=False) as chunk:
+                assert chunk['processes'].dtype == np.uint8
+        chunks = list(store.iter_spilled())
+        assert [p[0]['pid'] for p in np.concatenate([c['processes'] for c in chunks])] == list(range(200))
+        assert chunks[-1]['source'][-1] == 's199'
@@ -0,0 +1,50 @@
+"""
+Юнит-тесты параллельного опроса мониторов
+Мониторы подменены заглушками, контейнеры не нужны
+"""
+import threading
+import allure
+from .utils.monitor_group import MonitorGroup
+
+
+class FakeMonitor:
+    """Отдает метку времени замера; пока gate закрыт - зависает"""
+    
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.calls = 0
+    
+    def get_detailed_metrics(self, timestamp):
+        self.calls += 1
+        self.gate.wait()
+        return timestamp
+    
+    def close_stats_stream(self):
+        pass
+
+
+@allure.feature('Memory Monitor')
+@allure.story('Monitor Group')
+class TestMonitorGroup:
+    
+    @allure.title('Зависший монитор пропускает такты, а не копит очередь')
+    def test_hung_monitor_skipped(self):
+        fast, hung = FakeMonitor(), FakeMonitor()
+        hung.gate.clear()
+        with MonitorGroup({'fast': fast, 'hung': hung}) as group:
+            results = [group.sample(timeout=0.05) for _ in range(5)]
+            
+            assert all(set(samples) == {'fast'} for samples in results)
+            assert fast.calls == 5
+            # Зависший монитор вызван один раз, остальные такты пропущены
+            assert hung.calls == 1
+            assert group.late_samples == 1
+            assert group.skipped_samples == 4
+            
+            hung.gate.set()
+            group._in_flight['hung'].result(timeout=1)
+            samples = group.sample(timeout=1)
+            assert set(samples) == {'fast', 'hung'}
+            assert samples['fast'] == samples['hung']
+            assert hung.calls == 2
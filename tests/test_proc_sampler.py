@@ -0,0 +1,71 @@
+"""
+Юнит-тесты сэмплера процессов через /proc
+Сэмплируют сам процесс pytest, контейнеры не нужны
+"""
+import os
+import socket
+import subprocess
+import sys
+import allure
+import pytest
+from .utils.proc_sampler import ProcSampler
+
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="нужен /proc")
+
+
+@allure.feature('Memory Monitor')
+@allure.story('/proc sampler')
+class TestProcSampler:
+    
+    @allure.title('Память, fd и дочерние процессы текущего процесса')
+    def test_sample_current_process(self):
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(10)'])
+        files = [open(__file__) for _ in range(100)]
+        try:
+            sample = ProcSampler(os.getpid()).sample()
+        finally:
+            for f in files:
+                f.close()
+            child.kill()
+            child.wait()
+        
+        assert sample is not None
+        assert sample['open_files'] >= 100
+        assert sample['fds'] >= sample['open_files']
+        assert sample['rss_mb'] > 0
+        assert sample['threads'] >= 2
+        pids = [process['pid'] for process in sample['processes']]
+        assert pids[0] == os.getpid()
+        assert child.pid in pids
+    
+    @allure.title('Завершенный процесс не сэмплируется')
+    def test_exited_process(self):
+        child = subprocess.Popen([sys.executable, '-c', 'pass'])
+        sampler = ProcSampler(child.pid)
+        child.wait()
+        
+        assert not sampler.is_alive()
+        assert sampler.sample() is None
+    
+    @allure.title('Считаются только свои установленные TCP соединения')
+    def test_established_own_sockets(self):
+        before = ProcSampler(os.getpid()).sample()
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        clients = [socket.create_connection(listener.getsockname()) for _ in range(3)]
+        accepted = [listener.accept()[0] for _ in clients]
+        devnull = [open(os.devnull) for _ in range(10)]
+        try:
+            sample = ProcSampler(os.getpid()).sample()
+        finally:
+            for s in clients + accepted + [listener] + devnull:
+                s.close()
+        
+        # Обе стороны 3 соединений, LISTEN сокет не учитывается
+        assert sample['tcp_connections'] - before['tcp_connections'] == 6
+        assert sample['network_connections'] - before['network_connections'] == 6
+        # Сокеты и /dev/null - дескрипторы, но не файлы
+        assert sample['fds'] - before['fds'] >= 17
+        assert sample['open_files'] == before['open_files']
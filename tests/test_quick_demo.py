@@ -111,7 +111,7 @@ class TestQuickDemo:
                 title="Quick Test - App WITH Leak (1 min)",
                 filename="quick_with_leak.png"
             )
-            allure.attach.file(chart_path, name="График", attachment_type=allure.attachment_type.PNG)
+            report.attach_chart(chart_path, name="График")
             
             trend_analysis = report.analyze_trend(memory_data)
             
@@ -219,7 +219,7 @@ class TestQuickDemo:
                 title="Quick Test - App WITHOUT Leak (1 min)",
                 filename="quick_without_leak.png"
             )
-            allure.attach.file(chart_path, name="График", attachment_type=allure.attachment_type.PNG)
+            report.attach_chart(chart_path, name="График")
             
             trend_analysis = report.analyze_trend(memory_data)
             
@@ -0,0 +1,94 @@
+"""
+Юнит-тесты режимов отрисовки графиков
+"""
+import json
+import os
+import allure
+from .utils.report_builder import CHART_LABEL, JOB_SUFFIX, ReportBuilder, render_deferred_charts
+
+
+def memory_series(count: int, growth: float):
+    return [{'time': i * 5.0, 'rss_mb': 50 + growth * i, 'vms_mb': 200.0} for i in range(count)]
+
+
+@allure.feature('Reports')
+@allure.story('Chart Rendering')
+class TestReportBuilder:
+    
+    @allure.title('Отложенные графики рисуются после сессии и прикрепляются к своим тестам')
+    def test_deferred_rendering(self, tmp_path):
+        report = ReportBuilder(output_dir=str(tmp_path), render_mode='deferred', dpi=50)
+        
+        paths = [
+            report.create_memory_chart(memory_series(40, 0.5), title='leak', filename='leak.png'),
+            report.create_memory_chart(memory_series(40, 0.0), title='stable', filename='stable.png'),
+            report.create_comparison_chart(memory_series(40, 0.5), memory_series(30, 0.0),
+                                           title='compare', filename='compare.png')
+        ]
+        assert not any(os.path.exists(path) for path in paths)
+        assert all(os.path.exists(path + JOB_SUFFIX) for path in paths)
+        
+        # Вложение запоминается в задании и прикрепляется после отрисовки
+        report.attach_chart(paths[0], name='График памяти')
+        report.attach_chart(paths[2], name='Сравнение')
+        jobs = []
+        for path in paths:
+            with open(path + JOB_SUFFIX, 'r', encoding='utf-8') as f:
+                jobs.append(json.load(f))
+        assert jobs[0]['attachments'] == ['График памяти']
+        
+        # Результаты allure-pytest: тест с метками своих графиков и посторонний тест
+        results_dir = tmp_path / 'allure-results'
+        results_dir.mkdir()
+        labels = [{'name': CHART_LABEL, 'value': job['id']} for job in jobs]
+        own = {'name': 'test', 'labels': [{'name': 'feature', 'value': 'Reports'}] + labels}
+        other = {'name': 'other', 'labels': [{'name': CHART_LABEL, 'value': 'unknown'}]}
+        for name, result in (('own', own), ('other', other)):
+            with open(results_dir / f'{name}-result.json', 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+        
+        rendered = render_deferred_charts(str(tmp_path), processes=2, results_dir=str(results_dir))
+        
+        assert sorted(rendered) == sorted(paths)
+        for path in paths:
+            with open(path, 'rb') as f:
+                assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+            assert not os.path.exists(path + JOB_SUFFIX)
+        
+        with open(results_dir / 'own-result.json', 'r', encoding='utf-8') as f:
+            own = json.load(f)
+        assert [a['name'] for a in own['attachments']] == ['График памяти', 'Сравнение']
+        assert own['labels'] == [{'name': 'feature', 'value': 'Reports'}]
+        for attachment in own['attachments']:
+            assert attachment['type'] == 'image/png'
+            with open(results_dir / attachment['source'], 'rb') as f:
+                assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+        with open(results_dir / 'other-result.json', 'r', encoding='utf-8') as f:
+            assert 'attachments' not in json.load(f)
+    
+    @allure.title('SVG и режим без графиков')
+    def test_svg_and_none_modes(self, tmp_path):
+        svg = ReportBuilder(output_dir=str(tmp_path), fmt='svg', render_mode='immediate')
+        path = svg.create_memory_chart(memory_series(10, 1.0), title='svg', filename='chart.png')
+        
+        assert path.endswith('chart.svg')
+        with open(path, 'r', encoding='utf-8') as f:
+            assert '<svg' in f.read()
+        
+        none = ReportBuilder(output_dir=str(tmp_path), render_mode='none')
+        assert none.create_memory_chart(memory_series(10, 1.0), title='none', filename='none.png') is None
+        none.attach_chart(None, name='none')
+    
+    @allure.title('Сравнение десятков вариантов на одном графике')
+    def test_multi_comparison(self, tmp_path):
+        report = ReportBuilder(output_dir=str(tmp_path), render_mode='immediate', dpi=40)
+        
+        for count in (4, 30):
+            datasets = {f'variant-{i}': memory_series(30 + i, 0.05 * i) for i in range(count)}
+            path = report.create_multi_comparison_chart(datasets, title=f'{count} variants',
+                                                        filename=f'multi-{count}.png', baseline='variant-0')
+            with open(path, 'rb') as f:
+                assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+        
+        assert report.create_multi_comparison_chart({'only': memory_series(10, 1.0)},
+                                                    title='one', filename='one.png') is None
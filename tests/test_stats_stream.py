@@ -0,0 +1,96 @@
+"""
+Юнит-тесты потока статистики Docker
+Локальный HTTP сервер отдает stats?stream=1 как демон Docker
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import allure
+import pytest
+import requests
+from .utils import enhanced_monitor
+from .utils.enhanced_monitor import close_stats_streams, get_stats_stream, release_stats_stream
+
+
+class _StatsHandler(BaseHTTPRequestHandler):
+    """Бесконечный поток JSON строк раз в 0.05 с; контейнер 'gone' - 404"""
+    
+    def do_GET(self):
+        if '/containers/gone/' in self.path:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        sample = 0
+        try:
+            while True:
+                sample += 1
+                self.wfile.write(json.dumps({'read': sample, 'memory_stats': {'usage': 1024}}).encode() + b'\n')
+                self.wfile.flush()
+                time.sleep(0.05)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeContainer:
+    """Контейнер с client.api - сессией requests к локальному серверу"""
+    
+    def __init__(self, container_id: str, base_url: str):
+        api = requests.Session()
+        api.base_url = base_url
+        api.api_version = '1.41'
+        self.id = container_id
+        self.name = f'app-{container_id}'
+        self.client = type('Client', (), {'api': api})()
+
+
+@pytest.fixture
+def stats_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StatsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    close_stats_streams()
+    server.shutdown()
+    server.server_close()
+
+
+@allure.feature('Monitoring')
+@allure.story('Docker Stats Stream')
+class TestStatsStream:
+    
+    @allure.title('Последний пользователь закрывает соединение и убирает поток из реестра')
+    def test_release_closes_stream(self, stats_server):
+        container = FakeContainer('abc', stats_server)
+        first = get_stats_stream(container)
+        second = get_stats_stream(container)
+        
+        assert first is second and first.users == 2
+        assert first.latest(timeout=5)['memory_stats']['usage'] == 1024
+        
+        release_stats_stream(first)
+        assert not first.closed
+        started = time.monotonic()
+        release_stats_stream(second)
+        
+        # Соединение закрывается сразу, а не после следующего сэмпла
+        assert time.monotonic() - started < 1.0
+        assert first.closed and not first._thread.is_alive()
+        assert 'abc' not in enhanced_monitor._stats_streams
+    
+    @allure.title('Поток удаленного контейнера завершается сам')
+    def test_removed_container(self, stats_server):
+        stream = get_stats_stream(FakeContainer('gone', stats_server))
+        
+        assert stream.latest(timeout=5) is None
+        stream._thread.join(timeout=5)
+        assert stream.closed
+        assert 'gone' not in enhanced_monitor._stats_streams
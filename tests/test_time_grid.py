@@ -0,0 +1,60 @@
+"""
+Юнит-тесты выравнивания рядов на общую сетку времени
+"""
+import allure
+import numpy as np
+from .utils.time_grid import align_series, growth_on_grid
+
+
+@allure.feature('Reports')
+@allure.story('Time Grid')
+class TestTimeGrid:
+    
+    @allure.title('Ряды с разной частотой сравниваются по времени, а не по индексу')
+    def test_different_cadence(self):
+        fast = np.arange(0, 600.1, 2.0)
+        slow = np.arange(3, 603.1, 7.5)
+        series = {
+            'leak': (fast, 50 + 0.1 * fast),
+            'no_leak': (slow, 50 + 0.01 * slow),
+        }
+        
+        grid, values = align_series(series)
+        
+        assert (grid[0], grid[-1]) == (3.0, 600.0)
+        assert np.allclose(np.diff(grid[:-1]), 7.5)
+        assert np.allclose(values[0] - values[1], 0.09 * grid)
+        growth = growth_on_grid(values)
+        assert np.allclose(growth, [0.1 * 597, 0.01 * 597])
+    
+    @allure.title('Десятки вариантов выравниваются одним вызовом, вне ряда - NaN')
+    def test_many_series_union(self):
+        rng = np.random.default_rng(0)
+        series = {}
+        for i in range(40):
+            times = np.sort(rng.uniform(i, 300 + i, 200))
+            series[f'run-{i}'] = (times, 0.5 * i + 0.02 * times)
+        
+        grid, values = align_series(series, step=1.0, mode='union')
+        
+        assert values.shape == (40, len(grid))
+        assert np.isnan(values[-1, 0]) and np.isnan(values[0, -1])
+        inside = ~np.isnan(values)
+        expected = 0.5 * np.arange(40)[:, None] + 0.02 * grid[None, :]
+        assert np.allclose(values[inside], np.broadcast_to(expected, values.shape)[inside])
+    
+    @allure.title('Непересекающиеся прогоны выравниваются по объединению отрезков')
+    def test_disjoint_series_fallback(self, capsys):
+        first = np.arange(0, 60.1, 5.0)
+        second = np.arange(600, 660.1, 5.0)
+        series = {
+            'morning': (first, 50 + 0.1 * first),
+            'evening': (second, np.full(len(second), 70.0)),
+        }
+        
+        grid, values = align_series(series)
+        
+        assert 'не пересекаются' in capsys.readouterr().out
+        assert (grid[0], grid[-1]) == (0.0, 660.0)
+        assert np.isnan(values[0, -1]) and np.isnan(values[1, 0])
+        assert np.allclose(growth_on_grid(values), [6.0, 0.0])
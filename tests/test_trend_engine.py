@@ -0,0 +1,119 @@
+"""
+Юнит-тесты инкрементального анализа тренда
+"""
+import allure
+import numpy as np
+import pytest
+from .utils.report_builder import ReportBuilder
+from .utils.trend_engine import TrendEngine, t_quantile
+
+
+@allure.feature('Reports')
+@allure.story('Trend Engine')
+class TestTrendEngine:
+    
+    @allure.title('Бегущие суммы совпадают с np.polyfit на любом отрезке')
+    def test_matches_polyfit(self):
+        rng = np.random.default_rng(0)
+        times = 1.7e9 + np.arange(300) * 5.0
+        memory = 80 + 0.05 * (times - times[0]) + rng.normal(0, 1, 300)
+        
+        engine = TrendEngine()
+        for timestamp, value in zip(times[:100], memory[:100]):
+            engine.add(timestamp, value)
+        engine.extend(times[100:], memory[100:])
+        
+        for start, end in ((0, 300), (40, 170)):
+            minutes = (times[start:end] - times[0]) / 60
+            slope, _ = np.polyfit(minutes, memory[start:end], 1)
+            fit = engine.fit(start, end)
+            assert abs(fit['slope'] - slope) < 1e-9
+            low, high = fit['slope_ci']
+            assert low < 3.0 < high
+    
+    @allure.title('Прогрев отделяется от стационарной части')
+    def test_change_point(self):
+        rng = np.random.default_rng(1)
+        times = np.arange(240) * 5.0
+        memory = np.where(times < 300, 50 + times * 0.1, 80) + rng.normal(0, 0.5, 240)
+        
+        engine = TrendEngine()
+        engine.extend(times, memory)
+        summary = engine.summary(threshold=4.0)
+        
+        assert abs(summary['change_point']['time_minutes'] - 5.0) < 0.5
+        assert summary['slope'] > 0.5
+        assert abs(summary['steady_slope']) < 0.1
+        assert summary['trend'] == 'stable'
+    
+    @allure.title('Робастные наклоны не замечают всплесков')
+    def test_robust_slopes(self):
+        rng = np.random.default_rng(2)
+        times = np.arange(240) * 5.0
+        memory = 50 + 0.02 * times + rng.normal(0, 0.3, 240)
+        memory[::37] += 30
+        
+        engine = TrendEngine()
+        engine.extend(times, memory)
+        
+        assert abs(engine.theil_sen() - 1.2) < 0.05
+        assert abs(engine.huber() - 1.2) < 0.05
+    
+    @allure.title('Квантиль Стьюдента точен на малом числе степеней свободы')
+    def test_small_df_quantile(self):
+        assert t_quantile(1) == pytest.approx(12.706, abs=1e-3)
+        assert t_quantile(2) == pytest.approx(4.303, abs=1e-3)
+        assert t_quantile(3) == pytest.approx(3.182, abs=1e-3)
+        assert t_quantile(10) == pytest.approx(2.228, abs=1e-2)
+        assert t_quantile(0.5) == float('inf')
+    
+    @allure.title('На коротком ряду - обычный МНК без поправки на автокорреляцию и без точки смены')
+    def test_short_series(self):
+        rng = np.random.default_rng(3)
+        times = np.arange(8) * 5.0
+        memory = 50 + 0.1 * times + rng.normal(0, 0.5, 8)
+        
+        engine = TrendEngine()
+        engine.extend(times, memory)
+        fit = engine.fit()
+        
+        minutes = times / 60
+        slope, intercept = np.polyfit(minutes, memory, 1)
+        residuals = memory - (slope * minutes + intercept)
+        stderr = np.sqrt(np.sum(residuals ** 2) / 6 / np.sum((minutes - minutes.mean()) ** 2))
+        assert fit['autocorrelation'] == 0.0
+        assert fit['stderr'] == pytest.approx(stderr)
+        assert fit['slope_ci'][1] - fit['slope'] == pytest.approx(t_quantile(6) * stderr)
+        
+        # Излом на 12 замерах не ищется
+        engine = TrendEngine()
+        engine.extend(np.arange(12) * 5.0, [50, 52, 54, 56, 58, 60, 60, 60, 60, 60, 60, 60])
+        assert engine.change_point() is None
+
+
+@allure.feature('Reports')
+@allure.story('Trend Engine')
+class TestTrendVerdict:
+    
+    @allure.title('Короткий демо-прогон с ростом 8 MB - increasing по интервалу наклона')
+    def test_short_run(self, tmp_path):
+        report = ReportBuilder(output_dir=str(tmp_path), render_mode='none')
+        rng = np.random.default_rng(5)
+        growing = [{'time': i * 5.0, 'rss_mb': 50 + i * 8 / 6 + rng.normal(0, 0.2)} for i in range(7)]
+        flat = [{'time': i * 5.0, 'rss_mb': 50 + (i % 2) * 0.5} for i in range(7)]
+        
+        assert report.analyze_trend(growing)['trend'] == 'increasing'
+        assert report.analyze_trend(flat)['trend'] == 'stable'
+        assert report.analyze_trend(growing, mode='threshold')['trend'] == 'increasing'
+    
+    @allure.title('Длинный прогон: по умолчанию интервал наклона, пороги - только по выбору')
+    def test_long_run_modes(self, tmp_path):
+        report = ReportBuilder(output_dir=str(tmp_path), render_mode='none')
+        rng = np.random.default_rng(4)
+        data = [{'time': i * 5.0, 'rss_mb': 50 + 0.2 * i + rng.normal(0, 0.3)} for i in range(120)]
+        
+        # 2.4 MB/мин: интервал целиком выше 1 MB/мин, но ниже фиксированных порогов
+        assert report.analyze_trend(data, threshold=1.0)['trend'] == 'increasing'
+        assert report.analyze_trend(data, threshold=1.0, mode='threshold')['trend'] == 'stable'
+        # Нормальный рост 2.4 MB/мин не утечка и для интервала
+        assert report.analyze_trend(data)['trend'] == 'stable'
@@ -0,0 +1,228 @@
+"""
+Поиск максимальной устойчивой пропускной способности приложения
+Ступенчатый или бинарный поиск RPS в пределах SLO на базе LoadGenerator
+"""
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Union
+
+from .load_generator import LoadGenerator
+
+
+@dataclass
+class SLO:
+    """Ограничения, при которых нагрузка считается устойчивой"""
+    p99_ms: float = 500.0
+    max_error_rate: float = 0.01
+    # Доля от заданного RPS, которую приложение должно реально обслужить
+    min_throughput_ratio: float = 0.95
+
+
+@dataclass
+class CapacityStep:
+    """Результат одной ступени нагрузки"""
+    rps: float
+    achieved_rps: float
+    p50_ms: float
+    p99_ms: float
+    error_rate: float
+    memory_before_mb: Optional[float]
+    memory_after_mb: Optional[float]
+    passed: bool
+    
+    @property
+    def memory_delta_mb(self) -> Optional[float]:
+        if self.memory_before_mb is None or self.memory_after_mb is None:
+            return None
+        return self.memory_after_mb - self.memory_before_mb
+    
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['memory_delta_mb'] = self.memory_delta_mb
+        return data
+
+
+class CapacitySearch:
+    """
+    Подбирает максимальный RPS, который приложение держит в рамках SLO
+    
+    Каждая ступень - отдельный прогон LoadGenerator в открытой модели
+    (RPS задается расписанием, а не скоростью ответов). До и после ступени
+    снимается память контейнера, чтобы видеть, с какой нагрузки начинает
+    расти утечка.
+    """
+    
+    def __init__(self, base_url: str, endpoints: Union[List[str], Dict[str, float]],
+                 slo: Optional[SLO] = None, monitor=None, step_duration: float = 30,
+                 cooldown: float = 2, processes: Optional[int] = None,
+                 memory_growth_mb: float = 1.0):
+        """
+        Args:
+            base_url: Адрес приложения
+            endpoints: Список endpoint'ов ('/api/cache' или весь набор)
+            slo: Ограничения задержки и ошибок
+            monitor: EnhancedMemoryMonitor контейнера (необязательно)
+            step_duration: Длительность одной ступени в секундах
+            cooldown: Пауза между ступенями
+            processes: Число процессов генератора (None - автоматически)
+            memory_growth_mb: Рост памяти за ступень, считающийся значимым
+        """
+        self.base_url = base_url
+        self.endpoints = list(endpoints)
+        self.slo = slo or SLO()
+        self.monitor = monitor
+        self.step_duration = step_duration
+        self.cooldown = cooldown
+        self.processes = processes
+        self.memory_growth_mb = memory_growth_mb
+        self.steps: List[CapacityStep] = []
+    
+    def _memory_mb(self) -> Optional[float]:
+        if self.monitor is None:
+            return None
+        return self.monitor.get_detailed_metrics().rss_mb
+    
+    def _run_step(self, rps: int) -> CapacityStep:
+        """
+        Прогоняет одну ступень нагрузки и проверяет SLO
+        """
+        memory_before = self._memory_mb()
+        
+        load_gen = LoadGenerator(self.base_url, processes=self.processes)
+        load_gen.verbose = False
+        load_gen.start(self.endpoints, rps=rps, duration=self.step_duration, mode='open')
+        time.sleep(self.step_duration)
+        load_gen.stop()
+        stats = load_gen.get_statistics()
+        
+        memory_after = self._memory_mb()
+        
+        total = stats['total_requests']
+        error_rate = stats['errors'] / total if total else 1.0
+        achieved_rps = stats['successful'] / self.step_duration
+        # Задержка от планового момента отправки: учитывает очередь генератора
+        p99_ms = (stats['corrected_latency_histogram']['p99'] or stats['p99_response_time']) * 1000
+        
+        passed = (
+            total > 0
+            and p99_ms <= self.slo.p99_ms
+            and error_rate <= self.slo.max_error_rate
+            and achieved_rps >= rps * self.slo.min_throughput_ratio
+        )
+        
+        return CapacityStep(
+            rps=rps,
+            achieved_rps=achieved_rps,
+            p50_ms=stats['p50_response_time'] * 1000,
+            p99_ms=p99_ms,
+            error_rate=error_rate,
+            memory_before_mb=memory_before,
+            memory_after_mb=memory_after,
+            passed=passed
+        )
+    
+    def _measure(self, rps: float) -> CapacityStep:
+        # LoadGenerator принимает целый RPS (по нему считается число потоков)
+        rps = max(1, round(rps))
+        if self.steps and self.cooldown:
+            time.sleep(self.cooldown)
+        
+        step = self._run_step(rps)
+        self.steps.append(step)
+        
+        mark = "✅" if step.passed else "❌"
+        memory = f", память {step.memory_delta_mb:+.1f} MB" if step.memory_delta_mb is not None else ""
+        print(f"{mark} {rps} RPS: обслужено {step.achieved_rps:.1f} RPS, "
+              f"p99 {step.p99_ms:.0f} мс, ошибки {step.error_rate:.1%}{memory}")
+        return step
+    
+    def step_search(self, start_rps: float = 10, step_rps: float = 10,
+                    max_rps: float = 1000) -> Dict:
+        """
+        Линейно поднимает RPS до первого нарушения SLO
+        """
+        print(f"🔍 Ступенчатый поиск: {start_rps:.0f} -> {max_rps:.0f} RPS, шаг {step_rps:.0f}")
+        rps = start_rps
+        while rps <= max_rps:
+            if not self._measure(rps).passed:
+                break
+            rps += step_rps
+        return self.get_report()
+    
+    def binary_search(self, low_rps: float = 1, high_rps: float = 1000,
+                      tolerance: float = 0.05) -> Dict:
+        """
+        Бинарный поиск границы SLO между low_rps и high_rps
+        
+        Args:
+            tolerance: Относительная ширина интервала, при которой поиск останавливается
+        """
+        low_rps, high_rps = max(1, round(low_rps)), round(high_rps)
+        print(f"🔍 Бинарный поиск: {low_rps}..{high_rps} RPS")
+        if not self._measure(low_rps).passed:
+            print("⚠️ SLO нарушен уже на нижней границе")
+            return self.get_report()
+        if self._measure(high_rps).passed:
+            print("⚠️ SLO выдержан на верхней границе - поднимите high_rps")
+            return self.get_report()
+        
+        # Границы целые: при разнице больше 1 середина строго между ними
+        while high_rps - low_rps > max(1, low_rps * tolerance):
+            middle = (low_rps + high_rps) // 2
+            if self._measure(middle).passed:
+                low_rps = middle
+            else:
+                high_rps = middle
+        return self.get_report()
+    
+    @property
+    def max_sustainable_rps(self) -> Optional[float]:
+        """Наибольший RPS, прошедший SLO"""
+        passed = [step.rps for step in self.steps if step.passed]
+        return max(passed) if passed else None
+    
+    def find_knee(self) -> Optional[float]:
+        """
+        Точка перегиба кривой "RPS -> p99"
+        
+        Кривая нормируется в [0, 1] по обеим осям, перегибом считается
+        точка, сильнее всего отклонившаяся вниз от хорды между крайними
+        ступенями (метод Kneedle): до нее задержка почти не растет,
+        после - растет быстрее нагрузки.
+        """
+        steps = sorted(self.steps, key=lambda step: step.rps)
+        if len(steps) < 3:
+            return None
+        
+        rps_min, rps_max = steps[0].rps, steps[-1].rps
+        p99_min = min(step.p99_ms for step in steps)
+        p99_max = max(step.p99_ms for step in steps)
+        if rps_max == rps_min or p99_max == p99_min:
+            return None
+        
+        best_rps, best_distance = None, 0.0
+        for step in steps:
+            x = (step.rps - rps_min) / (rps_max - rps_min)
+            y = (step.p99_ms - p99_min) / (p99_max - p99_min)
+            if x - y > best_distance:
+                best_rps, best_distance = step.rps, x - y
+        return best_rps
+    
+    def get_report(self) -> Dict:
+        """
+        Итог поиска: максимальный устойчивый RPS, перегиб и все ступени
+        """
+        steps = sorted(self.steps, key=lambda step: step.rps)
+        growing = [step.rps for step in steps
+                   if step.memory_delta_mb is not None and step.memory_delta_mb >= self.memory_growth_mb]
+        
+        return {
+            'base_url': self.base_url,
+            'endpoints': self.endpoints,
+            'slo': asdict(self.slo),
+            'max_sustainable_rps': self.max_sustainable_rps,
+            'knee_rps': self.find_knee(),
+            # Первая ступень, на которой память контейнера выросла
+            'memory_growth_from_rps': growing[0] if growing else None,
+            'steps': [step.to_dict() for step in steps]
+        }
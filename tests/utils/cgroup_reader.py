@@ -0,0 +1,169 @@
+"""
+Прямое чтение метрик контейнера из cgroup v2
+Без Docker API: несколько pread по уже открытым файлам на замер
+"""
+import os
+import time
+from typing import Dict, Optional
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+# Ключи memory.stat, которые попадают в метрики
+MEMORY_STAT_KEYS = ('anon', 'file', 'kernel', 'sock', 'inactive_file')
+
+
+class CgroupV2Reader:
+    """
+    Читает memory.current, memory.stat, cpu.stat и pids.current
+    из каталога cgroup контейнера
+    
+    Файлы открываются один раз и перечитываются через os.pread с нулевого
+    смещения - ядро заново формирует содержимое при каждом чтении. Замер
+    стоит десятки микросекунд против 1-2 секунд у container.stats().
+    
+    working set считается так же, как в docker stats и kubelet:
+    memory.current - inactive_file, т.е. без page cache, который ядро
+    может вытеснить (например, файлы /tmp от /api/file).
+    """
+    
+    FILES = ('memory.current', 'memory.stat', 'cpu.stat', 'pids.current')
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Каталог cgroup контейнера
+        
+        Raises:
+            OSError: Каталог или обязательные файлы недоступны
+        """
+        self.path = path
+        self._fds: Dict[str, int] = {}
+        try:
+            for name in self.FILES:
+                file_path = os.path.join(path, name)
+                # pids.current может отсутствовать, если контроллер pids выключен
+                if name == 'pids.current' and not os.path.exists(file_path):
+                    continue
+                self._fds[name] = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            self.close()
+            raise
+        
+        self._last_cpu_usec: Optional[int] = None
+        self._last_time: Optional[float] = None
+    
+    def _read(self, name: str) -> str:
+        return os.pread(self._fds[name], 65536, 0).decode('ascii')
+    
+    @staticmethod
+    def _parse_flat_keyed(text: str) -> Dict[str, int]:
+        """Разбирает формат "ключ значение" построчно"""
+        values = {}
+        for line in text.splitlines():
+            key, _, value = line.partition(' ')
+            if value:
+                values[key] = int(value)
+        return values
+    
+    def read(self) -> Dict:
+        """
+        Снимает один замер
+        
+        Returns:
+            dict: usage_bytes, working_set_bytes, anon_bytes, file_bytes,
+                  kernel_bytes, sock_bytes, inactive_file_bytes,
+                  cpu_usage_usec, cpu_percent, pids
+        
+        Raises:
+            OSError: cgroup исчез (контейнер остановлен или пересоздан)
+        """
+        now = time.monotonic()
+        usage = int(self._read('memory.current'))
+        memory_stat = self._parse_flat_keyed(self._read('memory.stat'))
+        cpu_usec = self._parse_flat_keyed(self._read('cpu.stat')).get('usage_usec', 0)
+        pids = int(self._read('pids.current')) if 'pids.current' in self._fds else 0
+        
+        # CPU в процентах одного ядра между соседними замерами
+        cpu_percent = 0.0
+        if self._last_cpu_usec is not None and now > self._last_time:
+            cpu_percent = (cpu_usec - self._last_cpu_usec) / ((now - self._last_time) * 1_000_000) * 100
+            cpu_percent = max(0.0, min(100.0, cpu_percent))
+        self._last_cpu_usec = cpu_usec
+        self._last_time = now
+        
+        metrics = {f'{key}_bytes': memory_stat.get(key, 0) for key in MEMORY_STAT_KEYS}
+        metrics.update({
+            'usage_bytes': usage,
+            'working_set_bytes': max(0, usage - memory_stat.get('inactive_file', 0)),
+            'cpu_usage_usec': cpu_usec,
+            'cpu_percent': cpu_percent,
+            'pids': pids
+        })
+        return metrics
+    
+    def close(self):
+        for fd in self._fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._fds = {}
+    
+    @classmethod
+    def for_container(cls, container, root: str = CGROUP_ROOT) -> Optional['CgroupV2Reader']:
+        """
+        Находит cgroup контейнера и открывает его
+        
+        Returns:
+            CgroupV2Reader или None, если cgroup v2 недоступен
+            (cgroup v1, Docker в VM, нет прав на /sys/fs/cgroup)
+        """
+        path = find_cgroup_path(container, root)
+        if path is None:
+            return None
+        try:
+            return cls(path)
+        except OSError:
+            return None
+
+
+def find_cgroup_path(container, root: str = CGROUP_ROOT) -> Optional[str]:
+    """
+    Каталог cgroup v2 контейнера
+    
+    Сначала смотрит /proc/<pid>/cgroup основного процесса, затем типовые
+    пути драйверов systemd и cgroupfs.
+    """
+    if not os.path.exists(os.path.join(root, 'cgroup.controllers')):
+        return None
+    
+    candidates = []
+    try:
+        attrs = container.attrs
+        container_id = attrs.get('Id') or container.id
+        pid = attrs.get('State', {}).get('Pid')
+    except Exception:
+        container_id = getattr(container, 'id', None)
+        pid = None
+    
+    if pid:
+        try:
+            with open(f'/proc/{pid}/cgroup', 'r', encoding='utf-8') as f:
+                for line in f:
+                    # Единственная строка cgroup v2: "0::/system.slice/docker-<id>.scope"
+                    # "0::/" означает чужой cgroup namespace - путь бесполезен
+                    relative = line[3:].strip().lstrip('/')
+                    if line.startswith('0::') and relative:
+                        candidates.append(os.path.join(root, relative))
+        except OSError:
+            pass
+    
+    if container_id:
+        candidates.append(os.path.join(root, 'system.slice', f'docker-{container_id}.scope'))
+        candidates.append(os.path.join(root, 'docker', container_id))
+    
+    for path in candidates:
+        if os.path.exists(os.path.join(path, 'memory.current')):
+            return path
+    return None
@@ -0,0 +1,112 @@
+"""
+Прореживание длинных рядов перед построением графиков
+LTTB (Largest-Triangle-Three-Buckets) и огибающая min/max
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Индексы точек, выбранных алгоритмом LTTB
+    
+    Ряд без первой и последней точки делится на n_out - 2 корзины. Из каждой
+    корзины берется точка, образующая треугольник наибольшей площади с уже
+    выбранной точкой предыдущей корзины и средним следующей корзины. Форма
+    ряда (наклон, всплески, провалы) сохраняется визуально.
+    
+    Выбор внутри корзины векторный; цикл только по корзинам (O(n_out)
+    итераций, O(n) работы в сумме).
+    
+    Args:
+        x, y: Координаты ряда (x по возрастанию)
+        n_out: Сколько точек оставить (>= 3)
+    
+    Returns:
+        np.ndarray: Индексы выбранных точек по возрастанию
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # Границы корзин для точек 1..n-2; шаг > 1, поэтому корзины не пустые
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Средние корзин через кумулятивные суммы - без цикла
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = np.diff(edges)
+    mean_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    mean_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+    # Для последней корзины "следующая" - последняя точка ряда
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+    
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        # Удвоенная площадь треугольника (предыдущая, кандидат, среднее следующей)
+        area = np.abs((ax - next_x[bucket]) * (y[start:end] - ay)
+                      - (ax - x[start:end]) * (next_y[bucket] - ay))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Индексы минимумов и максимумов корзин (огибающая ряда)
+    
+    Полностью векторный: ряд раскладывается в матрицу корзин, min и max
+    ищутся по строкам. Гарантированно сохраняет все экстремумы на уровне
+    корзины, поэтому пики и провалы пилы GC не теряются.
+    
+    Returns:
+        np.ndarray: Индексы выбранных точек по возрастанию (включая концы ряда)
+    """
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # По две точки на корзину, концы ряда добавляются отдельно
+    buckets = (n_out - 2) // 2
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.nanargmin(padded, axis=1)
+    highs = offsets + np.nanargmax(padded, axis=1)
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+
+def downsample(x, y, n_out: int, method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Прореживает ряд до n_out точек (короткие ряды возвращаются как есть)
+    
+    Args:
+        method: 'lttb' - форма ряда, 'minmax' - огибающая экстремумов
+    
+    Returns:
+        (x, y): Прореженные массивы
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method должен быть одним из {DOWNSAMPLE_METHODS}, получено: {method}")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if n_out <= 0:
+        return x, y
+    indices = lttb_indices(x, y, n_out) if method == 'lttb' else minmax_indices(x, y, n_out)
+    return x[indices], y[indices]
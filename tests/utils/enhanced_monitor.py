@@ -4,12 +4,21 @@
 """
 import psutil
 import docker
+import requests
+import threading
 import time
 import json
-from typing import Dict, List
-from dataclasses import dataclass
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass, field
 from datetime import datetime
 
+from .cgroup_reader import CgroupV2Reader
+from .latency_histogram import LatencyHistogram
+from .metrics_export import MetricsExporter
+from .metrics_store import MetricsStore
+from .proc_sampler import ProcSampler
+
 
 @dataclass
 class SystemMetrics:
@@ -29,6 +38,214 @@ class SystemMetrics:
     # Дополнительно
     threads_count: int
     context_switches: int
+    # Память без вытесняемого page cache (usage - inactive_file)
+    working_set_mb: float = 0.0
+    # Анонимная память (heap, стеки) - именно она растет при утечке
+    anon_mb: float = 0.0
+    file_mb: float = 0.0
+    kernel_mb: float = 0.0
+    sock_mb: float = 0.0
+    pids: int = 0
+    # Источник замера: 'cgroup' или 'docker'
+    source: str = 'docker'
+    # Память дерева процессов приложения из /proc/<pid>/smaps_rollup
+    process_rss_mb: float = 0.0
+    pss_mb: float = 0.0
+    uss_mb: float = 0.0
+    swap_mb: float = 0.0
+    # Все дескрипторы дерева процессов (open_files - только обычные файлы)
+    fds: int = 0
+    # По каждому процессу (основной + дочерние воркеры)
+    processes: List[Dict] = field(default_factory=list)
+
+
+class DockerStatsStream:
+    """
+    Постоянное потоковое соединение со статистикой одного контейнера
+    
+    stats(stream=False) блокирует вызов на 1-2 секунды: демон делает два
+    замера, чтобы посчитать CPU. Здесь соединение со stats?stream=1
+    открывается один раз, фоновый поток декодирует сэмплы (демон шлет их
+    раз в секунду), а latest() сразу отдает последний из них.
+    
+    HTTP ответ открывается через сессию APIClient (requests.Session), а не
+    через генератор container.stats(): так stop() может закрыть соединение
+    из другого потока, не дожидаясь следующего сэмпла.
+    """
+    
+    def __init__(self, container, max_age: float = 5.0):
+        """
+        Args:
+            container: Docker контейнер
+            max_age: Сэмпл старше max_age секунд считается устаревшим
+        """
+        self.container = container
+        self.key = _stream_key(container)
+        self.max_age = max_age
+        self._latest: Optional[Dict] = None
+        self._received_at = 0.0
+        self._lock = threading.Lock()
+        self._response = None
+        self._first_sample = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Число мониторов, использующих поток (см. get_stats_stream)
+        self.users = 0
+        self.closed = False
+        self.samples_received = 0
+        self.reconnects = 0
+    
+    def start(self):
+        """
+        Запускает фоновый поток чтения (повторный вызов ничего не делает)
+        """
+        if self.closed or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+    
+    def _open(self):
+        """HTTP ответ со статистикой в режиме stream"""
+        api = self.container.client.api
+        url = f"{api.base_url}/v{api.api_version}/containers/{self.container.id}/stats"
+        return api.get(url, params={'stream': True}, stream=True, timeout=(10, None))
+    
+    def _reader(self):
+        """
+        Фоновый поток: читает поток статистики, переподключается при обрыве
+        (например, после перезапуска контейнера) и завершается, когда
+        контейнер удален
+        """
+        while not self._stop_event.is_set():
+            response = None
+            try:
+                response = self._open()
+                with self._lock:
+                    self._response = response
+                if self._stop_event.is_set():
+                    break
+                if response.status_code == 404:
+                    print(f"ℹ️  Контейнер {self.container.name} удален, поток статистики закрыт")
+                    break
+                response.raise_for_status()
+                
+                for line in response.iter_lines():
+                    if self._stop_event.is_set():
+                        break
+                    if not line:
+                        continue
+                    stats = json.loads(line)
+                    with self._lock:
+                        self._latest = stats
+                        self._received_at = time.time()
+                        self.samples_received += 1
+                    self._first_sample.set()
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    print(f"⚠️  Поток статистики {self.container.name} прерван: {type(e).__name__}: {e}")
+            finally:
+                with self._lock:
+                    self._response = None
+                if response is not None:
+                    response.close()
+            
+            if self._stop_event.is_set():
+                break
+            self.reconnects += 1
+            self._stop_event.wait(1)
+        
+        self.closed = True
+        # Первый сэмпл уже не придет - не держим ожидающих latest()
+        self._first_sample.set()
+        _forget_stats_stream(self)
+    
+    def latest(self, timeout: float = 5.0) -> Optional[Dict]:
+        """
+        Последний сэмпл статистики без ожидания
+        
+        Блокируется только до прихода самого первого сэмпла.
+        
+        Returns:
+            dict или None, если свежего сэмпла нет
+        """
+        self.start()
+        self._first_sample.wait(timeout)
+        with self._lock:
+            if self._latest is None or time.time() - self._received_at > self.max_age:
+                return None
+            return self._latest
+    
+    def stop(self, timeout: float = 5.0):
+        """
+        Закрывает HTTP соединение и дожидается завершения потока
+        """
+        self._stop_event.set()
+        with self._lock:
+            response = self._response
+        if response is not None:
+            # Закрытие ответа прерывает iter_lines() в потоке чтения
+            response.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self.closed = True
+
+
+# Одно потоковое соединение на контейнер, общее для всех мониторов
+_stats_streams: Dict[str, DockerStatsStream] = {}
+_stats_streams_lock = threading.Lock()
+
+
+def _stream_key(container) -> str:
+    return getattr(container, 'id', None) or container.name
+
+
+def _forget_stats_stream(stream: DockerStatsStream):
+    """Убирает поток из реестра (если там именно он)"""
+    with _stats_streams_lock:
+        if _stats_streams.get(stream.key) is stream:
+            del _stats_streams[stream.key]
+
+
+def get_stats_stream(container) -> DockerStatsStream:
+    """
+    Возвращает (и при необходимости запускает) поток статистики контейнера
+    
+    Каждый вызов добавляет пользователя потока; когда поток больше не
+    нужен, его надо вернуть через release_stats_stream().
+    """
+    key = _stream_key(container)
+    with _stats_streams_lock:
+        stream = _stats_streams.get(key)
+        if stream is None or stream.closed:
+            stream = _stats_streams[key] = DockerStatsStream(container)
+        stream.users += 1
+    stream.start()
+    return stream
+
+
+def release_stats_stream(stream: DockerStatsStream):
+    """
+    Возвращает поток; последний пользователь закрывает соединение
+    """
+    with _stats_streams_lock:
+        stream.users = max(0, stream.users - 1)
+        if stream.users > 0:
+            return
+        if _stats_streams.get(stream.key) is stream:
+            del _stats_streams[stream.key]
+    stream.stop()
+
+
+def close_stats_streams():
+    """
+    Закрывает все потоки статистики (в конце сессии тестов)
+    """
+    with _stats_streams_lock:
+        streams = list(_stats_streams.values())
+        _stats_streams.clear()
+    for stream in streams:
+        stream.stop()
 
 
 class EnhancedMemoryMonitor:
@@ -36,111 +253,269 @@ class EnhancedMemoryMonitor:
     Расширенный мониторинг памяти с детальными метриками
     """
     
-    def __init__(self, container):
+    BACKENDS = ('auto', 'cgroup', 'docker')
+    
+    def __init__(self, container, stream_stats: bool = True, backend: str = 'auto',
+                 history_capacity: int = 1_000_000, spill_dir: Optional[str] = None):
+        """
+        Args:
+            container: Docker контейнер
+            stream_stats: Читать статистику из постоянного потока (не блокирует
+                          вызов на 1-2 секунды и позволяет замеры чаще раза в секунду)
+            backend: 'cgroup' - читать cgroup v2 напрямую, 'docker' - Docker API,
+                     'auto' - cgroup, если доступен, иначе Docker API
+            history_capacity: Сколько замеров хранить в памяти
+            spill_dir: Каталог для сброса вытесняемых замеров на диск
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"backend должен быть одним из {self.BACKENDS}, получено: {backend}")
         self.container = container
         self.container_name = container.name
         self.client = docker.from_env()
-        self.metrics_history: List[SystemMetrics] = []
+        # Колоночный кольцевой буфер; индексация и итерация как у списка
+        self.metrics_history = MetricsStore(SystemMetrics, history_capacity, spill_dir)
+        self._history_lock = threading.Lock()
+        # Фоновый сэмплер
+        self._subscribers: List[Callable[[SystemMetrics], None]] = []
+        self._sampler_thread: Optional[threading.Thread] = None
+        self._sampler_stop = threading.Event()
+        self.sampling_interval: Optional[float] = None
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.jitter = LatencyHistogram()
+        self._exporter: Optional[MetricsExporter] = None
+        # Разницы аллокаций из /debug/tracemalloc приложения
+        self.allocation_diffs: List[Dict] = []
+        self._allocation_thread: Optional[threading.Thread] = None
+        self._allocation_stop = threading.Event()
+        self.stream_stats = stream_stats
+        self._stats_stream: Optional[DockerStatsStream] = None
+        self.backend = backend
+        self._cgroup: Optional[CgroupV2Reader] = None
+        self._cgroup_checked = False
+        self._proc: Optional[ProcSampler] = None
+        self._proc_retry_at = 0.0
         print(f"✅ EnhancedMemoryMonitor для {self.container_name}")
     
-    def get_detailed_metrics(self) -> SystemMetrics:
+    def _read_stats(self) -> Dict:
         """
-        Получает детальные метрики контейнера
+        Статистика контейнера: последний сэмпл потока или разовый запрос
+        """
+        if self.stream_stats:
+            if self._stats_stream is None:
+                self._stats_stream = get_stats_stream(self.container)
+            # Закрытый поток (контейнер удален) не переоткрываем на каждом замере
+            stats = self._stats_stream.latest() if not self._stats_stream.closed else None
+            if stats is not None:
+                return stats
+        # Поток недоступен или отстал - блокирующий запрос
+        return self.container.stats(stream=False)
+    
+    def _read_cgroup(self) -> Optional[Dict]:
         """
+        Замер напрямую из cgroup v2 или None, если нужно идти в Docker API
+        """
+        if self.backend == 'docker':
+            return None
+        
+        if self._cgroup is None and not self._cgroup_checked:
+            self._cgroup_checked = True
+            self._cgroup = CgroupV2Reader.for_container(self.container)
+            if self._cgroup is None:
+                print(f"ℹ️  cgroup v2 для {self.container_name} недоступен, использую Docker API")
+        
+        if self._cgroup is None:
+            return None
+        
         try:
-            # Получаем статистику Docker контейнера
-            stats = self.container.stats(stream=False)
-            
-            # Парсим память безопасно
-            memory_stats = stats.get('memory_stats', {})
-            memory_usage = memory_stats.get('usage', 0)
-            memory_limit = memory_stats.get('limit', 1)  # Избегаем деления на ноль
-            memory_percent = (memory_usage / memory_limit) * 100 if memory_limit > 0 else 0
-            
-            rss_mb = memory_usage / (1024 * 1024)
-            vms_mb = memory_stats.get('max_usage', memory_usage) / (1024 * 1024)
-            
-            # Парсим CPU безопасно
-            cpu_stats = stats.get('cpu_stats', {})
-            precpu_stats = stats.get('precpu_stats', {})
-            
-            cpu_percent = 0.0
-            if cpu_stats and precpu_stats:
-                try:
-                    cpu_usage = cpu_stats.get('cpu_usage', {})
-                    precpu_usage = precpu_stats.get('cpu_usage', {})
-                    
-                    total_usage = cpu_usage.get('total_usage', 0)
-                    prev_total_usage = precpu_usage.get('total_usage', 0)
-                    
-                    system_usage = cpu_stats.get('system_cpu_usage', 0)
-                    prev_system_usage = precpu_stats.get('system_cpu_usage', 0)
-                    
-                    cpu_delta = total_usage - prev_total_usage
-                    system_delta = system_usage - prev_system_usage
-                    
-                    if system_delta > 0:
-                        # Безопасный подсчет CPU
-                        percpu_usage = cpu_usage.get('percpu_usage', [])
-                        num_cpus = len(percpu_usage) if percpu_usage else 1
-                        cpu_percent = (cpu_delta / system_delta) * num_cpus * 100
-                        cpu_percent = max(0, min(100, cpu_percent))  # Ограничиваем 0-100%
-                except (KeyError, TypeError, ZeroDivisionError):
-                    cpu_percent = 0.0
-            
-            # Получаем процесс в контейнере для детальной информации
-            container_pid = None
+            return self._cgroup.read()
+        except OSError:
+            # Контейнер пересоздан - найдем новый cgroup при следующем замере
+            self._cgroup.close()
+            self._cgroup = None
+            self._cgroup_checked = False
+            return None
+    
+    # Как часто повторять поиск PID, если процесс не виден из /proc
+    PID_RETRY_INTERVAL = 10.0
+    
+    def _resolve_proc(self, reload: bool = False) -> Optional[ProcSampler]:
+        """
+        Находит PID основного процесса контейнера
+        
+        Args:
+            reload: Перечитать attrs из Docker API (после перезапуска контейнера)
+        """
+        try:
+            if reload:
+                self.container.reload()
+            pid = self.container.attrs.get('State', {}).get('Pid', None)
+        except Exception:
+            return None
+        
+        if not pid or pid <= 0:
+            return None
+        sampler = ProcSampler(pid)
+        # Docker в VM (macOS/Windows): PID контейнера не виден из /proc хоста
+        return sampler if sampler.start_time is not None else None
+    
+    def _process_metrics(self) -> Optional[Dict]:
+        """
+        Метрики процессов приложения из /proc с закешированным PID
+        """
+        if self._proc is None:
+            if time.time() < self._proc_retry_at:
+                return None
+            self._proc = self._resolve_proc(reload=self._proc_retry_at > 0)
+        
+        sample = self._proc.sample() if self._proc is not None else None
+        if sample is None and self._proc is not None:
+            # Процесс перезапущен - PID мог измениться
+            self._proc = self._resolve_proc(reload=True)
+            sample = self._proc.sample() if self._proc is not None else None
+        
+        if sample is None:
+            self._proc = None
+            self._proc_retry_at = time.time() + self.PID_RETRY_INTERVAL
+        return sample
+    
+    def _memory_cpu_metrics(self) -> Dict:
+        """
+        Память и CPU контейнера из cgroup или Docker API
+        
+        Returns:
+            dict: поля SystemMetrics, относящиеся к памяти, CPU и процессам
+        """
+        mb = 1024 * 1024
+        cgroup = self._read_cgroup()
+        
+        if cgroup is not None:
+            memory_limit = 0
             try:
-                container_attrs = self.container.attrs
-                container_pid = container_attrs.get('State', {}).get('Pid', None)
+                memory_limit = self.container.attrs.get('HostConfig', {}).get('Memory', 0)
             except Exception:
-                container_pid = None
+                pass
+            memory_limit = memory_limit or psutil.virtual_memory().total
+            return {
+                # rss_mb сохраняет прежний смысл (usage вместе с page cache)
+                'rss_mb': cgroup['usage_bytes'] / mb,
+                'vms_mb': cgroup['usage_bytes'] / mb,
+                'memory_percent': cgroup['usage_bytes'] / memory_limit * 100,
+                'cpu_percent': cgroup['cpu_percent'],
+                'working_set_mb': cgroup['working_set_bytes'] / mb,
+                'anon_mb': cgroup['anon_bytes'] / mb,
+                'file_mb': cgroup['file_bytes'] / mb,
+                'kernel_mb': cgroup['kernel_bytes'] / mb,
+                'sock_mb': cgroup['sock_bytes'] / mb,
+                'pids': cgroup['pids'],
+                'source': 'cgroup'
+            }
+        
+        # Получаем статистику Docker контейнера
+        stats = self._read_stats()
+        
+        # Парсим память безопасно
+        memory_stats = stats.get('memory_stats', {})
+        memory_usage = memory_stats.get('usage', 0)
+        memory_limit = memory_stats.get('limit', 1)  # Избегаем деления на ноль
+        memory_percent = (memory_usage / memory_limit) * 100 if memory_limit > 0 else 0
+        
+        # Детализация: cgroup v2 (anon/file/inactive_file) или v1 (rss/cache/total_inactive_file)
+        detail = memory_stats.get('stats', {})
+        inactive_file = detail.get('inactive_file', detail.get('total_inactive_file', 0))
+        
+        # Парсим CPU безопасно
+        cpu_stats = stats.get('cpu_stats', {})
+        precpu_stats = stats.get('precpu_stats', {})
+        
+        cpu_percent = 0.0
+        if cpu_stats and precpu_stats:
+            try:
+                cpu_usage = cpu_stats.get('cpu_usage', {})
+                precpu_usage = precpu_stats.get('cpu_usage', {})
                 
-            if container_pid and container_pid > 0:
-                try:
-                    process = psutil.Process(container_pid)
-                    
-                    # Сетевые соединения
-                    connections = process.connections()
-                    tcp_connections = len([c for c in connections if c.type == psutil.SOCK_STREAM])
-                    
-                    # Открытые файлы
-                    open_files = len(process.open_files())
-                    
-                    # Потоки
-                    threads_count = process.num_threads()
-                    
-                    # Переключения контекста
-                    ctx_switches = process.num_ctx_switches().voluntary + process.num_ctx_switches().involuntary
-                except (psutil.NoSuchProcess, psutil.AccessDenied, Exception):
-                    # Fallback значения если процесс недоступен
-                    connections = []
-                    tcp_connections = 0
-                    open_files = 0
-                    threads_count = 1
-                    ctx_switches = 0
+                total_usage = cpu_usage.get('total_usage', 0)
+                prev_total_usage = precpu_usage.get('total_usage', 0)
+                
+                system_usage = cpu_stats.get('system_cpu_usage', 0)
+                prev_system_usage = precpu_stats.get('system_cpu_usage', 0)
+                
+                cpu_delta = total_usage - prev_total_usage
+                system_delta = system_usage - prev_system_usage
+                
+                if system_delta > 0:
+                    # Безопасный подсчет CPU
+                    percpu_usage = cpu_usage.get('percpu_usage', [])
+                    num_cpus = len(percpu_usage) if percpu_usage else 1
+                    cpu_percent = (cpu_delta / system_delta) * num_cpus * 100
+                    cpu_percent = max(0, min(100, cpu_percent))  # Ограничиваем 0-100%
+            except (KeyError, TypeError, ZeroDivisionError):
+                cpu_percent = 0.0
+        
+        return {
+            'rss_mb': memory_usage / mb,
+            'vms_mb': memory_stats.get('max_usage', memory_usage) / mb,
+            'memory_percent': memory_percent,
+            'cpu_percent': cpu_percent,
+            'working_set_mb': max(0, memory_usage - inactive_file) / mb,
+            'anon_mb': detail.get('anon', detail.get('rss', 0)) / mb,
+            'file_mb': detail.get('file', detail.get('cache', 0)) / mb,
+            'kernel_mb': detail.get('kernel', 0) / mb,
+            'sock_mb': detail.get('sock', 0) / mb,
+            'pids': stats.get('pids_stats', {}).get('current', 0),
+            'source': 'docker'
+        }
+    
+    def get_detailed_metrics(self, timestamp: Optional[float] = None) -> SystemMetrics:
+        """
+        Получает детальные метрики контейнера
+        
+        Args:
+            timestamp: Метка времени замера (общая для группы контейнеров,
+                       см. MonitorGroup). По умолчанию - текущее время
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        
+        try:
+            memory_cpu = self._memory_cpu_metrics()
+            
+            # Процессы приложения: PID кешируется, fd классифицируются readlink'ом
+            process = self._process_metrics()
+            if process is not None:
+                process_fields = {
+                    'network_connections': process['network_connections'],
+                    'tcp_connections': process['tcp_connections'],
+                    'open_files': process['open_files'],
+                    'fds': process['fds'],
+                    'threads_count': process['threads'],
+                    'context_switches': process['ctx_switches'],
+                    'process_rss_mb': process['rss_mb'],
+                    'pss_mb': process['pss_mb'],
+                    'uss_mb': process['uss_mb'],
+                    'swap_mb': process['swap_mb'],
+                    'processes': process['processes']
+                }
             else:
-                # Fallback значения
-                connections = []
-                tcp_connections = 0
-                open_files = 0
-                threads_count = 1
-                ctx_switches = 0
+                # Fallback значения если процесс недоступен
+                process_fields = {
+                    'network_connections': 0,
+                    'tcp_connections': 0,
+                    'open_files': 0,
+                    'threads_count': 1,
+                    'context_switches': 0
+                }
             
             metrics = SystemMetrics(
-                timestamp=time.time(),
-                rss_mb=rss_mb,
-                vms_mb=vms_mb,
-                memory_percent=memory_percent,
-                cpu_percent=max(0, cpu_percent),  # Не может быть отрицательным
-                network_connections=len(connections),
-                tcp_connections=tcp_connections,
-                open_files=open_files,
-                threads_count=threads_count,
-                context_switches=ctx_switches
+                timestamp=timestamp,
+                **process_fields,
+                **memory_cpu
             )
             
-            self.metrics_history.append(metrics)
+            with self._history_lock:
+                self.metrics_history.append(metrics)
+                if self._exporter is not None:
+                    self._exporter.append(metrics)
             return metrics
             
         except Exception as e:
@@ -149,13 +524,13 @@ class EnhancedMemoryMonitor:
             
             # Попробуем получить хотя бы базовые метрики памяти
             try:
-                stats = self.container.stats(stream=False)
+                stats = self._read_stats()
                 memory_usage = stats.get('memory_stats', {}).get('usage', 0)
                 rss_mb = memory_usage / (1024 * 1024) if memory_usage > 0 else 1.0  # Минимальное значение
                 print(f"📊 Получены базовые метрики: RSS={rss_mb:.1f}MB")
                 
                 return SystemMetrics(
-                    timestamp=time.time(),
+                    timestamp=timestamp,
                     rss_mb=rss_mb,
                     vms_mb=rss_mb * 1.2,  # Примерное значение
                     memory_percent=min(rss_mb / 100, 50.0),  # Примерный процент
@@ -170,7 +545,7 @@ class EnhancedMemoryMonitor:
                 print(f"❌ Не удалось получить даже базовые метрики: {inner_e}")
                 # Возвращаем минимально рабочие метрики
                 return SystemMetrics(
-                    timestamp=time.time(),
+                    timestamp=timestamp,
                     rss_mb=1.0,  # Минимальное ненулевое значение
                     vms_mb=1.5,
                     memory_percent=1.0,
@@ -182,24 +557,231 @@ class EnhancedMemoryMonitor:
                     context_switches=1
                 )
     
+    def subscribe(self, callback: Callable[[SystemMetrics], None]):
+        """
+        Подписывает callback на замеры фонового сэмплера
+        
+        Callback вызывается в потоке сэмплера и не должен надолго блокироваться.
+        """
+        self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Callable[[SystemMetrics], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+    
+    def start(self, interval: float = 5.0):
+        """
+        Запускает фоновые замеры с фиксированным периодом
+        
+        Такты идут по сетке монотонных часов (start + k * interval), так что
+        длительность замера не сдвигает следующие такты. Если замер занял
+        больше периода, пропущенные такты не догоняются пачкой, а
+        учитываются в missed_ticks. Отставание начала замера от сетки
+        копится в гистограмме jitter. Статистика сэмплера сбрасывается при
+        каждом запуске.
+        """
+        if self._sampler_thread is not None and self._sampler_thread.is_alive():
+            raise RuntimeError(f"Сэмплер {self.container_name} уже запущен")
+        if interval <= 0:
+            raise ValueError("interval должен быть > 0")
+        
+        self.sampling_interval = interval
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.jitter = LatencyHistogram()
+        self._sampler_stop.clear()
+        self._sampler_thread = threading.Thread(target=self._sampler, args=(interval,), daemon=True)
+        self._sampler_thread.start()
+        print(f"⏱️  Фоновый мониторинг {self.container_name}: каждые {interval}с")
+    
+    def _sampler(self, interval: float):
+        """
+        Поток фонового сэмплера
+        """
+        start = time.monotonic()
+        tick = 0
+        
+        while True:
+            scheduled = start + tick * interval
+            if self._sampler_stop.wait(max(0.0, scheduled - time.monotonic())):
+                break
+            
+            self.jitter.record(time.monotonic() - scheduled)
+            metrics = self.get_detailed_metrics()
+            self.ticks += 1
+            
+            for callback in list(self._subscribers):
+                try:
+                    callback(metrics)
+                except Exception as e:
+                    print(f"⚠️  Ошибка подписчика мониторинга: {type(e).__name__}: {e}")
+            
+            # Следующая точка сетки, еще не оставшаяся в прошлом
+            next_tick = int((time.monotonic() - start) // interval) + 1
+            self.missed_ticks += max(0, next_tick - tick - 1)
+            tick = max(tick + 1, next_tick)
+    
+    def stop(self, timeout: float = 30.0):
+        """
+        Останавливает фоновый сэмплер (дожидается текущего замера)
+        и возвращает поток статистики Docker
+        """
+        self._sampler_stop.set()
+        if self._sampler_thread is not None:
+            self._sampler_thread.join(timeout=timeout)
+            self._sampler_thread = None
+        self.close_stats_stream()
+        print(f"🛑 Мониторинг {self.container_name} остановлен: {self.ticks} замеров, "
+              f"пропущено тактов {self.missed_ticks}, "
+              f"jitter p99 {self.jitter.percentile(99.0) * 1000:.1f} мс")
+    
+    def close_stats_stream(self):
+        """
+        Возвращает поток статистики; соединение закрывается, когда его
+        вернули все мониторы контейнера
+        """
+        if self._stats_stream is not None:
+            release_stats_stream(self._stats_stream)
+            self._stats_stream = None
+    
+    def get_sampler_statistics(self) -> Dict:
+        """
+        Статистика фонового сэмплера: такты, пропуски и jitter (секунды)
+        """
+        return {
+            'interval': self.sampling_interval,
+            'ticks': self.ticks,
+            'missed_ticks': self.missed_ticks,
+            'jitter': self.jitter.to_dict()
+        }
+    
+    def start_export(self, path: Optional[str] = None, chunk_rows: int = 60,
+                     flush_interval: float = 30.0) -> str:
+        """
+        Включает потоковый экспорт замеров в файл во время прогона
+        
+        Замеры дописываются сжатыми колоночными блоками (см. MetricsExporter),
+        прочитать файл можно через metrics_export.read_metrics().
+        
+        Returns:
+            str: Путь к файлу экспорта
+        """
+        if not path:
+            path = f"metrics_{self.container_name}_{int(time.time())}.mlk"
+        with self._history_lock:
+            if self._exporter is not None:
+                self._exporter.close()
+            self._exporter = MetricsExporter(path, SystemMetrics, chunk_rows, flush_interval)
+        print(f"💾 Потоковый экспорт метрик в {path}")
+        return path
+    
+    def stop_export(self):
+        """
+        Дописывает последний блок и закрывает файл экспорта
+        """
+        with self._history_lock:
+            if self._exporter is None:
+                return
+            self._exporter.close()
+            print(f"💾 Экспорт завершен: {self._exporter.rows_written} замеров, "
+                  f"{self._exporter.bytes_written / 1024:.1f} KB")
+            self._exporter = None
+    
+    def fetch_allocation_diff(self, base_url: str, window: float = 5.0, limit: int = 20,
+                              group_by: str = 'traceback') -> Optional[Dict]:
+        """
+        Запрашивает у приложения места аллокаций, выросшие за окно
+        
+        Требует MEMORY_DEBUG=1 в контейнере (см. apps/common/debug_memory.py).
+        
+        Returns:
+            dict: {'timestamp', 'mode', 'group_by', 'top': [...], 'overhead': {...}}
+                  или None, если отладочные endpoint'ы выключены
+        """
+        try:
+            response = requests.get(
+                f"{base_url}/debug/tracemalloc",
+                params={'window': window, 'limit': limit, 'group_by': group_by},
+                timeout=window + 30
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  tracemalloc {self.container_name} недоступен: {type(e).__name__}: {e}")
+            return None
+        
+        if response.status_code == 404:
+            print(f"ℹ️  В {self.container_name} нет /debug/tracemalloc (нужен MEMORY_DEBUG=1)")
+            return None
+        response.raise_for_status()
+        
+        diff = response.json()
+        self.allocation_diffs.append(diff)
+        return diff
+    
+    def start_allocation_tracking(self, base_url: str, period: float = 60.0,
+                                  window: float = 5.0, limit: int = 20):
+        """
+        Периодически забирает разницы аллокаций в allocation_diffs
+        
+        В режиме window трассировка в приложении включена только
+        window из каждых period секунд (по умолчанию ~8% времени).
+        """
+        if self._allocation_thread is not None and self._allocation_thread.is_alive():
+            raise RuntimeError(f"Отслеживание аллокаций {self.container_name} уже запущено")
+        
+        def tracker():
+            start = time.monotonic()
+            tick = 0
+            while not self._allocation_stop.wait(max(0.0, start + tick * period - time.monotonic())):
+                if self.fetch_allocation_diff(base_url, window, limit) is None and not self.allocation_diffs:
+                    # Отладка в приложении выключена - дальше не пытаемся
+                    break
+                tick = max(tick + 1, int((time.monotonic() - start) // period) + 1)
+        
+        self._allocation_stop.clear()
+        self._allocation_thread = threading.Thread(target=tracker, daemon=True)
+        self._allocation_thread.start()
+    
+    def stop_allocation_tracking(self):
+        self._allocation_stop.set()
+        if self._allocation_thread is not None:
+            self._allocation_thread.join(timeout=60)
+            self._allocation_thread = None
+    
+    def history_columns(self, names: Optional[List[str]] = None, last: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Копии колонок истории, снятые под блокировкой
+        
+        Views MetricsStore перезаписываются фоновым сэмплером, поэтому
+        читатели из других потоков работают только с копиями.
+        
+        Args:
+            names: Какие колонки (по умолчанию все)
+            last: Сколько последних замеров (0 - все)
+        """
+        with self._history_lock:
+            return {name: values[-last:].copy() if last else values.copy()
+                    for name, values in self.metrics_history.columns(names).items()}
+    
     def detect_memory_leak_patterns(self) -> Dict:
         """
         Анализирует паттерны утечек памяти
         """
-        if len(self.metrics_history) < 10:
-            return {"status": "insufficient_data", "message": "Недостаточно данных для анализа"}
-        
         # Анализируем последние 10 измерений
-        recent_metrics = self.metrics_history[-10:]
+        columns = self.history_columns(['rss_mb', 'tcp_connections', 'open_files'], last=10)
+        rss = columns['rss_mb']
+        tcp = columns['tcp_connections']
+        files = columns['open_files']
+        if len(rss) < 10:
+            return {"status": "insufficient_data", "message": "Недостаточно данных для анализа"}
         
         # Рост памяти
-        memory_growth = recent_metrics[-1].rss_mb - recent_metrics[0].rss_mb
+        memory_growth = float(rss[-1] - rss[0])
         
         # Рост сетевых соединений
-        conn_growth = recent_metrics[-1].tcp_connections - recent_metrics[0].tcp_connections
+        conn_growth = int(tcp[-1] - tcp[0])
         
         # Рост файловых дескрипторов
-        files_growth = recent_metrics[-1].open_files - recent_metrics[0].open_files
+        files_growth = int(files[-1] - files[0])
         
         # Определяем типы утечек
         leak_types = []
@@ -214,8 +796,7 @@ class EnhancedMemoryMonitor:
             leak_types.append("file_descriptor_leak")
         
         # Анализ тренда
-        memory_values = [m.rss_mb for m in recent_metrics]
-        trend = "increasing" if memory_values[-1] > memory_values[0] else "stable"
+        trend = "increasing" if rss[-1] > rss[0] else "stable"
         
         return {
             "status": "analyzed",
@@ -234,37 +815,56 @@ class EnhancedMemoryMonitor:
         if not filename:
             filename = f"metrics_{self.container_name}_{int(time.time())}.json"
         
+        # Колонки переводятся в списки Python одним вызовом, без обхода объектов
+        columns = {name: values.tolist() for name, values in self.history_columns().items()}
+        timestamps = columns['timestamp']
+        
         data = {
             "container": self.container_name,
             "monitoring_period": {
-                "start": self.metrics_history[0].timestamp if self.metrics_history else time.time(),
-                "end": self.metrics_history[-1].timestamp if self.metrics_history else time.time(),
-                "duration_minutes": len(self.metrics_history) * 5 / 60  # Предполагаем измерения каждые 5 сек
+                "start": timestamps[0] if timestamps else time.time(),
+                "end": timestamps[-1] if timestamps else time.time(),
+                "duration_minutes": (timestamps[-1] - timestamps[0]) / 60 if timestamps else 0
             },
             "leak_analysis": self.detect_memory_leak_patterns(),
             "metrics": [
                 {
-                    "timestamp": m.timestamp,
-                    "datetime": datetime.fromtimestamp(m.timestamp).isoformat(),
+                    "timestamp": timestamps[i],
+                    "datetime": datetime.fromtimestamp(timestamps[i]).isoformat(),
                     "memory": {
-                        "rss_mb": m.rss_mb,
-                        "vms_mb": m.vms_mb,
-                        "percent": m.memory_percent
+                        "rss_mb": columns['rss_mb'][i],
+                        "vms_mb": columns['vms_mb'][i],
+                        "percent": columns['memory_percent'][i],
+                        "working_set_mb": columns['working_set_mb'][i],
+                        "anon_mb": columns['anon_mb'][i],
+                        "file_mb": columns['file_mb'][i],
+                        "kernel_mb": columns['kernel_mb'][i],
+                        "sock_mb": columns['sock_mb'][i]
+                    },
+                    "pids": columns['pids'][i],
+                    "source": columns['source'][i],
+                    "process": {
+                        "rss_mb": columns['process_rss_mb'][i],
+                        "pss_mb": columns['pss_mb'][i],
+                        "uss_mb": columns['uss_mb'][i],
+                        "swap_mb": columns['swap_mb'][i],
+                        "processes": columns['processes'][i]
                     },
-                    "cpu_percent": m.cpu_percent,
+                    "cpu_percent": columns['cpu_percent'][i],
                     "network": {
-                        "total_connections": m.network_connections,
-                        "tcp_connections": m.tcp_connections
+                        "total_connections": columns['network_connections'][i],
+                        "tcp_connections": columns['tcp_connections'][i]
                     },
                     "files": {
-                        "open_files": m.open_files
+                        "open_files": columns['open_files'][i],
+                        "fds": columns['fds'][i]
                     },
                     "system": {
-                        "threads": m.threads_count,
-                        "context_switches": m.context_switches
+                        "threads": columns['threads_count'][i],
+                        "context_switches": columns['context_switches'][i]
                     }
                 }
-                for m in self.metrics_history
+                for i in range(len(timestamps))
             ]
         }
         
@@ -278,20 +878,26 @@ class EnhancedMemoryMonitor:
         """
         Выводит краткую сводку мониторинга
         """
-        if not self.metrics_history:
-            print("❌ Нет данных для анализа")
-            return
-        
-        first = self.metrics_history[0]
-        last = self.metrics_history[-1] 
+        with self._history_lock:
+            if not self.metrics_history:
+                print("❌ Нет данных для анализа")
+                return
+            first = self.metrics_history[0]
+            last = self.metrics_history[-1]
+            count = len(self.metrics_history)
+            rss = self.metrics_history.column('rss_mb').copy()
         
         print(f"\n📊 СВОДКА МОНИТОРИНГА: {self.container_name}")
         print("=" * 60)
-        print(f"⏱️  Период мониторинга: {len(self.metrics_history)} измерений")
+        print(f"⏱️  Период мониторинга: {count} измерений")
         print(f"📈 Память RSS: {first.rss_mb:.1f} → {last.rss_mb:.1f} MB (Δ{last.rss_mb-first.rss_mb:+.1f})")
+        print(f"🏔️  RSS пик/медиана: {rss.max():.1f} / {np.median(rss):.1f} MB")
         print(f"💾 Память VMS: {first.vms_mb:.1f} → {last.vms_mb:.1f} MB (Δ{last.vms_mb-first.vms_mb:+.1f})")
+        print(f"🧮 Working set: {first.working_set_mb:.1f} → {last.working_set_mb:.1f} MB (Δ{last.working_set_mb-first.working_set_mb:+.1f})")
+        print(f"🧠 Anon: {first.anon_mb:.1f} → {last.anon_mb:.1f} MB (Δ{last.anon_mb-first.anon_mb:+.1f})")
         print(f"🔗 TCP соединения: {first.tcp_connections} → {last.tcp_connections} (Δ{last.tcp_connections-first.tcp_connections:+d})")
         print(f"📁 Открытые файлы: {first.open_files} → {last.open_files} (Δ{last.open_files-first.open_files:+d})")
+        print(f"🔢 Дескрипторы: {first.fds} → {last.fds} (Δ{last.fds-first.fds:+d})")
         print(f"🧵 Потоки: {first.threads_count} → {last.threads_count} (Δ{last.threads_count-first.threads_count:+d})")
         
         # Анализ утечек
@@ -0,0 +1,153 @@
+"""
+Гистограмма задержек с ограниченным объемом памяти (в стиле HDR Histogram)
+Запись за O(1), перцентили и слияние гистограмм разных потоков
+"""
+import math
+from typing import Dict, Iterable, Optional
+
+
+class LatencyHistogram:
+    """
+    Лог-корзинная гистограмма задержек
+    
+    Значения хранятся в микросекундах. Каждая степень двойки делится на
+    2**(sub_bucket_bits - 1) линейных корзин, поэтому относительная ошибка
+    перцентилей не превышает 1 / 2**(sub_bucket_bits - 1) (~1.6% по умолчанию).
+    Число корзин ограничено сверху и не зависит от количества запросов.
+    """
+    
+    PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+    
+    def __init__(self, sub_bucket_bits: int = 7, max_value_seconds: float = 3600.0):
+        """
+        Args:
+            sub_bucket_bits: Точность (число бит на корзины внутри степени двойки)
+            max_value_seconds: Максимальное значение, большие значения обрезаются
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_value_seconds = max_value_seconds
+        self._sub_bucket_count = 1 << sub_bucket_bits
+        self._sub_bucket_half = self._sub_bucket_count >> 1
+        self._max_value_us = int(max_value_seconds * 1_000_000)
+        
+        # Разреженное хранение: индекс корзины -> количество
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.total_sum = 0.0
+        self.min_value: Optional[float] = None
+        self.max_value = 0.0
+    
+    @property
+    def max_buckets(self) -> int:
+        """Верхняя граница числа корзин"""
+        return self._index(self._max_value_us) + 1
+    
+    def _index(self, value_us: int) -> int:
+        """Индекс корзины для значения в микросекундах"""
+        if value_us < self._sub_bucket_count:
+            return value_us
+        shift = value_us.bit_length() - self.sub_bucket_bits
+        return ((shift + 1) << (self.sub_bucket_bits - 1)) + (value_us >> shift) - self._sub_bucket_half
+    
+    def _value_at(self, index: int) -> int:
+        """Наибольшее значение (мкс), попадающее в корзину"""
+        if index < self._sub_bucket_count:
+            return index
+        shift = (index >> (self.sub_bucket_bits - 1)) - 1
+        sub_bucket = (index & (self._sub_bucket_half - 1)) + self._sub_bucket_half
+        return ((sub_bucket + 1) << shift) - 1
+    
+    def record(self, seconds: float):
+        """
+        Записывает одно значение задержки
+        
+        Args:
+            seconds: Задержка в секундах
+        """
+        value_us = min(max(int(seconds * 1_000_000), 0), self._max_value_us)
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        
+        self.total_count += 1
+        self.total_sum += seconds
+        if self.min_value is None or seconds < self.min_value:
+            self.min_value = seconds
+        if seconds > self.max_value:
+            self.max_value = seconds
+    
+    def merge(self, other: 'LatencyHistogram'):
+        """
+        Добавляет значения другой гистограммы (например, другого потока)
+        """
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Нельзя объединить гистограммы с разной точностью")
+        
+        # list() снимает копию целиком, даже если владелец пишет параллельно
+        for index, count in list(other.counts.items()):
+            self.counts[index] = self.counts.get(index, 0) + count
+        
+        self.total_count += other.total_count
+        self.total_sum += other.total_sum
+        if other.min_value is not None and (self.min_value is None or other.min_value < self.min_value):
+            self.min_value = other.min_value
+        self.max_value = max(self.max_value, other.max_value)
+    
+    def copy(self) -> 'LatencyHistogram':
+        """Независимая копия гистограммы"""
+        histogram = LatencyHistogram(self.sub_bucket_bits, self.max_value_seconds)
+        histogram.merge(self)
+        return histogram
+    
+    @property
+    def mean(self) -> float:
+        return self.total_sum / self.total_count if self.total_count else 0.0
+    
+    def percentiles(self, percentiles: Iterable[float] = PERCENTILES) -> Dict[float, float]:
+        """
+        Считает несколько перцентилей за один проход по корзинам
+        
+        Returns:
+            dict: {перцентиль: значение в секундах}
+        """
+        percentiles = sorted(percentiles)
+        result = {p: 0.0 for p in percentiles}
+        if not self.total_count:
+            return result
+        
+        # round() убирает ошибку float (99.9 / 100 * 20000 = 19980.000000000004)
+        targets = [(p, max(1, math.ceil(round(p / 100.0 * self.total_count, 6))))
+                   for p in percentiles]
+        cumulative = 0
+        position = 0
+        
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            while position < len(targets) and cumulative >= targets[position][1]:
+                percentile = targets[position][0]
+                # Не выходим за реальный максимум из-за ширины корзины
+                result[percentile] = min(self._value_at(index) / 1_000_000, self.max_value)
+                position += 1
+            if position == len(targets):
+                break
+        
+        return result
+    
+    def percentile(self, percentile: float) -> float:
+        """Значение перцентиля в секундах"""
+        return self.percentiles([percentile])[percentile]
+    
+    def to_dict(self) -> Dict:
+        """
+        Сводка для отчетов: count, mean, min, p50/p90/p99/p99.9, max (секунды)
+        """
+        values = self.percentiles()
+        return {
+            'count': self.total_count,
+            'mean': self.mean,
+            'min': self.min_value or 0.0,
+            'p50': values[50.0],
+            'p90': values[90.0],
+            'p99': values[99.0],
+            'p99.9': values[99.9],
+            'max': self.max_value
+        }
@@ -0,0 +1,251 @@
+"""
+Онлайн-детектор утечек с ранней остановкой теста
+Последовательный тест Вальда (SPRT) на наклон каждой метрики, O(1) на замер
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .trend_engine import TrendEngine
+
+
+LEAK = 'leak'
+NO_LEAK = 'no_leak'
+UNDECIDED = 'undecided'
+
+
+@dataclass
+class LeakThreshold:
+    """
+    Порог для одной метрики
+    
+    min_rate: Минимальная скорость роста, которую считаем утечкой (единиц/мин)
+    noise_floor: Нижняя граница шума (разрешение метрики), чтобы ступенчатые
+                 счетчики без шума не давали нулевую дисперсию
+    """
+    metric: str
+    min_rate: float
+    noise_floor: float = 0.5
+
+
+# RSS: > 3 MB/мин - тот же критерий скорости, что и в вердиктах тестов
+DEFAULT_THRESHOLDS = [
+    LeakThreshold('rss_mb', min_rate=3.0, noise_floor=0.5),
+    LeakThreshold('open_files', min_rate=1.0),
+    LeakThreshold('tcp_connections', min_rate=1.0),
+    LeakThreshold('threads_count', min_rate=1.0),
+]
+
+
+class SeriesTest:
+    """
+    Последовательный тест наклона одного ряда
+    
+    Ряд ведет TrendEngine: замер добавляется за O(1), МНК с поправкой
+    AR(1) на автокорреляцию остатков (пила GC, пачки запросов) - тоже O(1).
+    Для гипотез H0: наклон 0 и H1: наклон min_rate логарифм отношения
+    правдоподобия при известной дисперсии равен
+        llr = (b1 / se^2) * (b - b1 / 2),
+    где b - МНК оценка наклона, se - ее стандартная ошибка. Тест Вальда
+    принимает H1 при llr >= ln((1 - beta) / alpha) и H0 при
+    llr <= ln(beta / (1 - alpha)).
+    
+    Утечка дополнительно подтверждается наклоном Тейла-Сена по последним
+    window замерам: одиночный всплеск или ступенька не дают вердикт.
+    """
+    
+    # Минимум эффективно независимых замеров n * (1 - rho) / (1 + rho) для вердикта
+    MIN_EFFECTIVE_SAMPLES = 8
+    
+    def __init__(self, threshold: LeakThreshold, alpha: float, beta: float, window: int = 60):
+        self.threshold = threshold
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+        self.window = window
+        self.engine = TrendEngine()
+    
+    @property
+    def n(self) -> int:
+        return self.engine.n
+    
+    def update(self, timestamp: float, value: float):
+        """Добавляет замер (время в секундах)"""
+        self.engine.add(timestamp, value)
+    
+    @property
+    def duration_minutes(self) -> float:
+        # Время в движке отсчитывается от первого замера
+        return float(self.engine.t[self.n - 1]) if self.n else 0.0
+    
+    def fit(self) -> Optional[Dict]:
+        """
+        Текущая оценка: наклон, стандартная ошибка с поправкой AR(1), llr
+        
+        Returns:
+            dict или None, если замеров меньше 3 или время не менялось
+        """
+        fit = self.engine.fit(min_variance=self.threshold.noise_floor ** 2)
+        if fit is None:
+            return None
+        se = fit['stderr']
+        b1 = self.threshold.min_rate
+        return {
+            'slope_per_min': fit['slope'],
+            'stderr_per_min': se,
+            'residual_std': fit['residual_std'],
+            'autocorrelation': fit['autocorrelation'],
+            'effective_samples': fit['effective_samples'],
+            'llr': b1 / (se * se) * (fit['slope'] - b1 / 2)
+        }
+    
+    def theil_sen_slope(self) -> float:
+        """Наклон Тейла-Сена по последним window замерам (единиц/мин)"""
+        slope = self.engine.theil_sen(max(0, self.n - self.window))
+        return slope if slope is not None else 0.0
+    
+    def decide(self) -> Dict:
+        result = self.fit()
+        if result is None:
+            return {'decision': UNDECIDED, 'samples': self.n}
+        
+        decision = UNDECIDED
+        if self.n < TrendEngine.MIN_AR_SAMPLES or result['effective_samples'] < self.MIN_EFFECTIVE_SAMPLES:
+            # Оценки дисперсии и rho по нескольким независимым точкам ненадежны
+            pass
+        elif result['llr'] >= self.upper:
+            result['theil_sen_per_min'] = self.theil_sen_slope()
+            if result['theil_sen_per_min'] >= self.threshold.min_rate / 2:
+                decision = LEAK
+        elif result['llr'] <= self.lower:
+            decision = NO_LEAK
+        
+        result['decision'] = decision
+        result['samples'] = self.n
+        return result
+
+
+class OnlineLeakDetector:
+    """
+    Онлайн-вердикт по всем метрикам (RSS, fd, соединения, потоки)
+    
+    Каждый замер обновляет последовательные тесты метрик за O(1).
+    Вердикт 'leak' - как только хотя бы одна метрика уверенно растет
+    быстрее min_rate; 'no_leak' - когда все метрики одновременно уверенно
+    не растут. До этого - 'undecided', и тест продолжает работать.
+    
+    alpha (доля ложных утечек) делится между метриками (поправка
+    Бонферрони), beta - доля пропущенных утечек на метрику. Первые warmup
+    секунд (прогрев интерпретатора и кешей) не учитываются, а вердикт не
+    выносится раньше min_duration секунд после прогрева.
+    
+    Пример:
+        detector = OnlineLeakDetector()
+        monitor.subscribe(detector.update)
+        ...
+        if detector.decided:
+            break
+    """
+    
+    def __init__(self, thresholds: Optional[List[LeakThreshold]] = None,
+                 alpha: float = 0.01, beta: float = 0.05,
+                 warmup: float = 30.0, min_duration: float = 90.0, window: int = 60):
+        """
+        Args:
+            thresholds: Пороги по метрикам (по умолчанию DEFAULT_THRESHOLDS)
+            alpha: Допустимая доля ложных срабатываний на весь тест
+            beta: Допустимая доля пропущенных утечек
+            warmup: Сколько секунд от первого замера пропустить
+            min_duration: Минимальная длительность наблюдения после прогрева (секунды)
+            window: Окно оценки Тейла-Сена (замеры)
+        """
+        thresholds = thresholds if thresholds is not None else DEFAULT_THRESHOLDS
+        if not thresholds:
+            raise ValueError("Нужна хотя бы одна метрика")
+        if not 0 < alpha < 1 or not 0 < beta < 1:
+            raise ValueError("alpha и beta должны быть в (0, 1)")
+        
+        self.alpha = alpha
+        self.beta = beta
+        self.warmup = warmup
+        self.min_duration = min_duration
+        self.tests = {
+            threshold.metric: SeriesTest(threshold, alpha / len(thresholds), beta, window)
+            for threshold in thresholds
+        }
+        
+        self.started_at = None
+        self.samples = 0
+        self.verdict = UNDECIDED
+        self.decided_at = None
+        self.leaking_metrics: List[str] = []
+        self._decisions: Dict[str, Dict] = {}
+    
+    @property
+    def decided(self) -> bool:
+        return self.verdict != UNDECIDED
+    
+    def update(self, metrics, timestamp: Optional[float] = None) -> str:
+        """
+        Добавляет замер (подходит как подписчик EnhancedMemoryMonitor.subscribe)
+        
+        Args:
+            metrics: SystemMetrics или dict с полями метрик
+            timestamp: Время замера (по умолчанию metrics.timestamp)
+        
+        Returns:
+            str: Текущий вердикт ('leak', 'no_leak', 'undecided')
+        """
+        if isinstance(metrics, dict):
+            values = metrics
+        else:
+            values = {name: getattr(metrics, name) for name in self.tests}
+            values['timestamp'] = metrics.timestamp
+        if timestamp is None:
+            timestamp = values['timestamp']
+        
+        self.samples += 1
+        if self.started_at is None:
+            self.started_at = timestamp
+        elapsed = timestamp - self.started_at
+        # Вердикт окончательный - дальнейшие замеры его не меняют
+        if self.decided or elapsed < self.warmup:
+            return self.verdict
+        
+        for metric, test in self.tests.items():
+            test.update(timestamp, float(values[metric]))
+        
+        observed = min(test.duration_minutes for test in self.tests.values()) * 60
+        if observed < self.min_duration:
+            return self.verdict
+        
+        self._decisions = {metric: test.decide() for metric, test in self.tests.items()}
+        leaking = [metric for metric, result in self._decisions.items() if result['decision'] == LEAK]
+        if leaking:
+            self.verdict = LEAK
+            self.leaking_metrics = leaking
+        elif all(result['decision'] == NO_LEAK for result in self._decisions.values()):
+            self.verdict = NO_LEAK
+        
+        if self.decided:
+            self.decided_at = elapsed
+        return self.verdict
+    
+    def get_report(self) -> Dict:
+        """
+        Состояние детектора: вердикт, время решения и оценки по метрикам
+        """
+        metrics = {}
+        for metric, test in self.tests.items():
+            result = self._decisions.get(metric) or test.decide()
+            result['min_rate_per_min'] = test.threshold.min_rate
+            metrics[metric] = result
+        
+        return {
+            'verdict': self.verdict,
+            'decided_at_seconds': self.decided_at,
+            'samples': self.samples,
+            'leaking_metrics': self.leaking_metrics,
+            'alpha': self.alpha,
+            'beta': self.beta,
+            'metrics': metrics
+        }
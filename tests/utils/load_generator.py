@@ -2,39 +2,299 @@
 Генератор нагрузки для тестирования приложений
 """
 import requests
+from requests.adapters import HTTPAdapter
+import multiprocessing
+from multiprocessing.connection import wait
+import os
 import threading
 import time
+import json
+import math
 import random
-from typing import List, Dict
-from queue import Queue
+from collections import deque
+from typing import List, Dict, Iterator, Optional, Tuple
+from queue import Queue, Full
+from .latency_histogram import LatencyHistogram
+from .payload_pool import PayloadPool, POST_ENDPOINTS, JSON_HEADERS, generate_payload
+from .request_log import RequestLogSink
+from .traffic_profile import TrafficProfile
+
+
+class _SeriesCell:
+    """
+    Ячейка временного ряда: один endpoint за одну секунду
+    
+    Пока секунда "открыта", задержки копятся в грубой гистограмме. После
+    финализации остаются только квантили - память ряда растет на несколько
+    чисел в секунду, а не на гистограмму.
+    """
+    
+    __slots__ = ('requests', 'errors', 'histogram', 'quantiles')
+    
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        # 5 бит точности (~6%) достаточно для посекундного ряда
+        self.histogram: Optional[LatencyHistogram] = LatencyHistogram(sub_bucket_bits=5)
+        self.quantiles: Optional[Tuple[float, float, float, float]] = None
+    
+    def add(self, success: bool, response_time: Optional[float]):
+        self.requests += 1
+        if not success:
+            self.errors += 1
+        if response_time is not None:
+            self.histogram.record(response_time)
+    
+    def merge(self, other: '_SeriesCell'):
+        """
+        Добавляет другую ячейку той же секунды
+        
+        Если одна из ячеек уже финализирована, квантили объединяются
+        приближенно (взвешенно по числу запросов).
+        """
+        if self.histogram is not None and other.histogram is not None:
+            self.histogram.merge(other.histogram)
+        else:
+            mine, theirs = self.get_quantiles(), other.get_quantiles()
+            total = self.requests + other.requests
+            if total:
+                weighted = [
+                    (a * self.requests + b * other.requests) / total
+                    for a, b in zip(mine[:3], theirs[:3])
+                ]
+                self.quantiles = (weighted[0], weighted[1], weighted[2], max(mine[3], theirs[3]))
+            self.histogram = None
+        self.requests += other.requests
+        self.errors += other.errors
+    
+    def get_quantiles(self) -> Tuple[float, float, float, float]:
+        """(p50, p90, p99, max) в секундах"""
+        if self.histogram is None:
+            return self.quantiles or (0.0, 0.0, 0.0, 0.0)
+        values = self.histogram.percentiles((50.0, 90.0, 99.0))
+        return values[50.0], values[90.0], values[99.0], self.histogram.max_value
+    
+    def finalize(self):
+        """Заменяет гистограмму квантилями"""
+        if self.histogram is not None:
+            self.quantiles = self.get_quantiles()
+            self.histogram = None
+    
+    def copy(self) -> '_SeriesCell':
+        cell = _SeriesCell()
+        cell.merge(self)
+        return cell
+
+
+class _StatsShard:
+    """
+    Статистика одного рабочего потока
+    
+    Пишет в шард только поток-владелец, поэтому общих счетчиков нет.
+    Генератор объединяет шарды при чтении: запись (record) и чтение живого
+    шарда идут под его собственным lock - без конкуренции между потоками он
+    почти ничего не стоит, а читатель не видит наполовину обновленные
+    гистограммы. Посекундные ячейки по endpoint'ам копятся в текущей
+    корзине и при смене секунды уходят в общий outbox (deque.append
+    потокобезопасен).
+    """
+    
+    __slots__ = (
+        'total_requests', 'successful', 'errors', 'connections_opened',
+        'response_times', 'corrected_response_times', 'send_lags',
+        'bucket_second', 'bucket_cells', 'stages', '_outbox', 'lock'
+    )
+    
+    def __init__(self, outbox: Optional[deque] = None):
+        self.total_requests = 0
+        self.successful = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.response_times = LatencyHistogram()
+        self.corrected_response_times = LatencyHistogram()
+        self.send_lags = LatencyHistogram()
+        self.bucket_second: Optional[int] = None
+        self.bucket_cells: Dict[str, _SeriesCell] = {}
+        # Статистика по стадиям профиля: имя -> [запросы, ошибки, гистограмма]
+        self.stages: Dict[str, list] = {}
+        self._outbox = outbox
+        self.lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict:
+        # Итоговый шард дочернего процесса передается через pipe, lock не сериализуется
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'lock'}
+    
+    def __setstate__(self, state: Dict):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.lock = threading.Lock()
+    
+    def record(self, success: bool, response_time: Optional[float] = None,
+               corrected_time: Optional[float] = None, stage: Optional[str] = None,
+               endpoint: str = ''):
+        """
+        Записывает результат одного запроса
+        """
+        with self.lock:
+            # Те же часы time.time(), что и у EnhancedMemoryMonitor
+            second = int(time.time())
+            if second != self.bucket_second:
+                self.close_bucket()
+                self.bucket_second = second
+            
+            cell = self.bucket_cells.get(endpoint)
+            if cell is None:
+                cell = self.bucket_cells[endpoint] = _SeriesCell()
+            cell.add(success, response_time)
+            
+            self.total_requests += 1
+            if success:
+                self.successful += 1
+            else:
+                self.errors += 1
+            
+            if response_time is not None:
+                self.response_times.record(response_time)
+            if corrected_time is not None:
+                self.corrected_response_times.record(corrected_time)
+            
+            if stage is not None:
+                stage_stats = self.stages.get(stage)
+                if stage_stats is None:
+                    stage_stats = self.stages[stage] = [0, 0, LatencyHistogram()]
+                stage_stats[0] += 1
+                if not success:
+                    stage_stats[1] += 1
+                if response_time is not None:
+                    stage_stats[2].record(response_time)
+    
+    def close_bucket(self):
+        """
+        Отдает текущую посекундную корзину в outbox генератора (под lock шарда)
+        """
+        if self.bucket_second is not None and self.bucket_cells and self._outbox is not None:
+            self._outbox.append((self.bucket_second, self.bucket_cells))
+        self.bucket_second = None
+        self.bucket_cells = {}
+    
+    def merge(self, other: '_StatsShard'):
+        """
+        Добавляет счетчики и гистограммы другого шарда
+        """
+        self.total_requests += other.total_requests
+        self.successful += other.successful
+        self.errors += other.errors
+        self.connections_opened += other.connections_opened
+        self.response_times.merge(other.response_times)
+        self.corrected_response_times.merge(other.corrected_response_times)
+        self.send_lags.merge(other.send_lags)
+        
+        for name, (requests_count, errors, histogram) in list(other.stages.items()):
+            stage_stats = self.stages.get(name)
+            if stage_stats is None:
+                stage_stats = self.stages[name] = [0, 0, LatencyHistogram()]
+            stage_stats[0] += requests_count
+            stage_stats[1] += errors
+            stage_stats[2].merge(histogram)
 
 
 class LoadGenerator:
     """
     Генератор HTTP нагрузки на приложение
+    
+    Режимы работы:
+        closed - каждый поток ждет ответа и спит 1 сек (реальный RPS падает,
+                 когда приложение замедляется)
+        open   - диспетчер отправляет запросы по фиксированному расписанию
+                 (constant или poisson) независимо от времени ответа
+    
+    start_profile() запускает open-loop нагрузку по TrafficProfile: веса
+    endpoint'ов и стадии со своим RPS, статистика размечается по стадиям.
+    
+    Каждый рабочий поток держит свою requests.Session с keep-alive пулом,
+    поэтому накладные расходы клиента на TCP handshake не смешиваются
+    с утечками соединений на стороне сервера.
+    
+    Если rps больше MAX_RPS_PER_PROCESS, нагрузка делится между несколькими
+    процессами (обход GIL), API start/stop/get_statistics не меняется.
     """
     
-    def __init__(self, base_url: str):
+    MODES = ('closed', 'open')
+    ARRIVALS = ('constant', 'poisson')
+    # Сколько закрытых корзин может накопиться до свертки рабочим потоком
+    OUTBOX_FOLD_THRESHOLD = 1000
+    # Через сколько секунд ячейки ряда финализируются (гистограмма -> квантили)
+    SERIES_FINALIZE_DELAY = 5
+    # Выше этого RPS один процесс упирается в GIL
+    MAX_RPS_PER_PROCESS = 200
+    # Сколько запланированных запросов может ждать в очереди на один рабочий
+    # поток open режима; сверх этого запросы отбрасываются как пропущенные
+    SEND_QUEUE_PER_WORKER = 50
+    # Общий дедлайн ожидания итогов всех дочерних процессов при stop()
+    PROCESS_COLLECT_TIMEOUT = 30
+    
+    def __init__(self, base_url: str, pool_size: int = 10, keep_alive: bool = True,
+                 processes: Optional[int] = None, payload_pool_size: int = 1024,
+                 request_log: Optional[str] = None):
         """
         Args:
             base_url: Базовый URL приложения (например, http://localhost:5000)
+            pool_size: Размер пула соединений в сессии каждого рабочего потока
+            keep_alive: False - намеренно открывать новое соединение на каждый запрос
+            processes: Число процессов-генераторов. None - автоматически:
+                       1 процесс до MAX_RPS_PER_PROCESS, иначе по числу CPU
+            payload_pool_size: Число заранее сериализованных тел на POST endpoint
+            request_log: Путь к журналу запросов (TSV). В многопроцессном режиме
+                         каждый процесс пишет в свой файл <request_log>.<N>
         """
         self.base_url = base_url
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.processes = processes
+        self.payload_pool_size = payload_pool_size
+        self._payload_pool: Optional[PayloadPool] = None
+        self.verbose = True
         self.stop_flag = False
+        self._stop_event = threading.Event()
         self.threads = []
-        self.results_queue = Queue()
+        self.request_log = request_log
+        self._request_sink: Optional[RequestLogSink] = None
+        self._send_queue: Optional[Queue] = None
+        self.mode = 'closed'
+        self.stage_windows: List[Dict] = []
+        self._sessions: List[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+        
+        # Шарды статистики рабочих потоков и посекундная шкала
+        self._shards: List[_StatsShard] = []
+        self._shards_lock = threading.Lock()
+        self._bucket_outbox: deque = deque()
+        # секунда -> endpoint -> ячейка ряда
+        self._timeline: Dict[int, Dict[str, _SeriesCell]] = {}
+        self._open_seconds: set = set()
+        self._timeline_lock = threading.Lock()
+        
+        # Дочерние процессы: (process, общие счетчики, pipe для итогов)
+        self._workers: List[tuple] = []
+        self._process_stop = None
+        # Сетка расписания дочернего процесса: (общее начало, сдвиг, период), см. _dispatcher
+        self._schedule_grid: Optional[Tuple[float, float, float]] = None
         
         # Статистика
         self.stats = {
-            'total_requests': 0,
-            'successful': 0,
-            'errors': 0,
-            'response_times': [],
+            'scheduled_requests': 0,
+            'missed_requests': 0,
+            'connections_opened': 0,
+            'connection_reuses': 0,
+            'request_log_written': 0,
+            'request_log_dropped': 0,
             'start_time': None,
             'end_time': None
         }
     
-    def start(self, endpoints: List[str], rps: int = 5, duration: int = 600):
+    def start(self, endpoints: List[str], rps: int = 5, duration: int = 600,
+              mode: str = 'closed', arrival: str = 'constant',
+              concurrency: Optional[int] = None):
         """
         Запускает генерацию нагрузки
         
@@ -42,16 +302,47 @@ class LoadGenerator:
             endpoints: Список endpoint'ов для запросов
             rps: Запросов в секунду (requests per second)
             duration: Длительность в секундах
+            mode: 'closed' (поток ждет ответа) или 'open' (запросы по расписанию)
+            arrival: Расписание для open режима - 'constant' или 'poisson'
+            concurrency: Число рабочих потоков для open режима (по умолчанию = rps)
         """
-        print(f"🚀 Запуск генератора нагрузки:")
-        print(f"   URL: {self.base_url}")
-        print(f"   RPS: {rps}")
-        print(f"   Длительность: {duration} сек ({duration/60:.1f} мин)")
-        print(f"   Endpoints: {endpoints}")
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим: {mode}, доступны {self.MODES}")
+        if arrival not in self.ARRIVALS:
+            raise ValueError(f"Неизвестное расписание: {arrival}, доступны {self.ARRIVALS}")
+        if mode == 'open' and rps <= 0:
+            raise ValueError(f"RPS для open режима должен быть > 0, получено: {rps}")
         
+        processes = self._resolve_processes(rps)
+        
+        if self.verbose:
+            print(f"🚀 Запуск генератора нагрузки:")
+            print(f"   URL: {self.base_url}")
+            print(f"   RPS: {rps}")
+            print(f"   Режим: {mode}" + (f" ({arrival})" if mode == 'open' else ""))
+            print(f"   Keep-alive: {'да' if self.keep_alive else 'нет'} (пул {self.pool_size})")
+            print(f"   Процессы: {processes}")
+            print(f"   Длительность: {duration} сек ({duration/60:.1f} мин)")
+            print(f"   Endpoints: {endpoints}")
+        
+        self.mode = mode
         self.stop_flag = False
+        self._stop_event.clear()
         self.stats['start_time'] = time.time()
         
+        if processes > 1:
+            self._start_processes(processes, endpoints=endpoints, rps=rps, duration=duration,
+                                  mode=mode, arrival=arrival, concurrency=concurrency)
+            return
+        
+        self._payload_pool = PayloadPool(endpoints, self.payload_pool_size)
+        self._open_request_log()
+        
+        if mode == 'open':
+            schedule = self._plain_schedule(endpoints, rps, duration, arrival)
+            self._start_open_loop(schedule, concurrency or rps)
+            return
+        
         # Запускаем потоки
         for i in range(rps):
             thread = threading.Thread(
@@ -65,120 +356,748 @@ class LoadGenerator:
             # Небольшая задержка для равномерного распределения запросов
             time.sleep(1.0 / rps)
     
+    def start_profile(self, profile: TrafficProfile, arrival: str = 'constant',
+                      concurrency: Optional[int] = None):
+        """
+        Запускает open-loop нагрузку по профилю со стадиями
+        
+        Args:
+            profile: Профиль нагрузки (веса endpoint'ов и стадии)
+            arrival: Расписание внутри стадии - 'constant' или 'poisson'
+            concurrency: Число рабочих потоков (по умолчанию = пиковый RPS профиля)
+        """
+        if arrival not in self.ARRIVALS:
+            raise ValueError(f"Неизвестное расписание: {arrival}, доступны {self.ARRIVALS}")
+        
+        processes = self._resolve_processes(profile.peak_rps)
+        concurrency = concurrency or math.ceil(profile.peak_rps)
+        
+        if self.verbose:
+            print(f"🚀 Запуск генератора нагрузки по профилю '{profile.name}':")
+            print(f"   URL: {self.base_url}")
+            for stage in profile.stages:
+                rate = f"{stage.start_rps:g} → {stage.rps:g}" if stage.start_rps is not None else f"{stage.rps:g}"
+                print(f"   {stage.name}: {stage.duration:g} сек, RPS {rate}")
+            print(f"   Процессы: {processes}")
+            print(f"   Endpoints: {profile.endpoints}")
+        
+        self.mode = 'open'
+        self.stop_flag = False
+        self._stop_event.clear()
+        self.stats['start_time'] = time.time()
+        
+        # Окна стадий на часах time.time() - по ним можно отделить метрики
+        # памяти warm-up от базовой линии
+        self.stage_windows = []
+        stage_start = self.stats['start_time']
+        for stage in profile.stages:
+            self.stage_windows.append({
+                'name': stage.name,
+                'start': stage_start,
+                'end': stage_start + stage.duration,
+                'rps': stage.rps,
+                'start_rps': stage.start_rps
+            })
+            stage_start += stage.duration
+        
+        if processes > 1:
+            self._start_processes(processes, profile=profile, arrival=arrival,
+                                  concurrency=concurrency)
+            return
+        
+        self._payload_pool = PayloadPool(profile.all_endpoints, self.payload_pool_size)
+        self._open_request_log()
+        self._start_open_loop(profile.schedule(arrival), concurrency)
+    
+    def _open_request_log(self):
+        """
+        Запускает фоновую запись журнала запросов, если он включен
+        """
+        if self.request_log and self._request_sink is None:
+            self._request_sink = RequestLogSink(self.request_log)
+            self._request_sink.start()
+    
+    def stage_at(self, timestamp: float) -> Optional[str]:
+        """
+        Имя стадии профиля, активной в момент timestamp (time.time())
+        """
+        for window in self.stage_windows:
+            if window['start'] <= timestamp < window['end']:
+                return window['name']
+        return None
+    
+    def _resolve_processes(self, rps: float) -> int:
+        """
+        Сколько процессов нужно для заданного RPS
+        """
+        if self.processes is not None:
+            return max(1, self.processes)
+        if rps <= self.MAX_RPS_PER_PROCESS:
+            return 1
+        return os.cpu_count() or 1
+    
+    def _start_processes(self, processes: int, endpoints: Optional[List[str]] = None,
+                         rps: int = 0, duration: int = 0, mode: str = 'closed',
+                         arrival: str = 'constant', concurrency: Optional[int] = None,
+                         profile: Optional[TrafficProfile] = None):
+        """
+        Делит целевой RPS (или профиль) между дочерними процессами-генераторами
+        
+        Живые счетчики каждый процесс публикует в разделяемой памяти,
+        гистограммы и посекундная шкала приходят через pipe при остановке.
+        
+        Расписания процессов отсчитываются от общего начала, а расписание
+        процесса i сдвинуто на i / (processes * rps): иначе все процессы
+        отправляли бы запросы одновременно, пачками по processes штук,
+        вместо равномерного потока.
+        """
+        # spawn безопаснее fork: в тестовом процессе уже работают потоки
+        context = multiprocessing.get_context('spawn')
+        self._process_stop = context.Event()
+        # perf_counter - CLOCK_MONOTONIC, общие часы для всех процессов машины
+        epoch = time.perf_counter()
+        total_rps = profile.peak_rps if profile is not None else rps
+        
+        for i in range(processes):
+            if profile is not None:
+                share = profile.scaled(1.0 / processes)
+                period = processes / total_rps if total_rps > 0 else 0.0
+            else:
+                share = rps // processes + (1 if i < rps % processes else 0)
+                if share <= 0:
+                    continue
+                period = 1.0 / share
+            phase = i / (processes * total_rps) if total_rps > 0 else 0.0
+            process_concurrency = None
+            if concurrency:
+                process_concurrency = max(1, concurrency // processes)
+            
+            counters = context.Array('q', 3, lock=False)
+            receiver, sender = context.Pipe(duplex=False)
+            request_log = f"{self.request_log}.{i}" if self.request_log else None
+            process = context.Process(
+                target=_process_main,
+                args=(self.base_url, self.pool_size, self.keep_alive, self.payload_pool_size,
+                      request_log, endpoints, share, duration, mode, arrival, process_concurrency,
+                      (epoch, phase, period), self._process_stop, counters, sender),
+                daemon=True
+            )
+            process.start()
+            sender.close()
+            self._workers.append((process, counters, receiver))
+    
+    def _collect_processes(self):
+        """
+        Останавливает дочерние процессы и забирает их итоговую статистику
+        
+        Pipe'ы всех процессов ждутся одновременно с общим дедлайном
+        PROCESS_COLLECT_TIMEOUT, поэтому зависшие процессы задерживают
+        остановку не больше чем на один таймаут, а не на таймаут каждый.
+        """
+        if self._process_stop is None:
+            return
+        self._process_stop.set()
+        
+        pending = {receiver: process for process, counters, receiver in self._workers}
+        deadline = time.monotonic() + self.PROCESS_COLLECT_TIMEOUT
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for receiver in wait(list(pending), timeout=remaining):
+                process = pending.pop(receiver)
+                try:
+                    self._merge_process_state(receiver.recv())
+                except (EOFError, OSError) as e:
+                    print(f"⚠️  Ошибка получения статистики процесса {process.pid}: {e}")
+                finally:
+                    receiver.close()
+        
+        for receiver, process in pending.items():
+            print(f"⚠️  Процесс {process.pid} не вернул статистику")
+            receiver.close()
+        for process, counters, receiver in self._workers:
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        
+        self._workers = []
+        self._process_stop = None
+    
+    def _merge_process_state(self, state: Dict):
+        """
+        Добавляет итоговое состояние дочернего процесса (см. export_state)
+        """
+        with self._shards_lock:
+            self._shards.append(state['shard'])
+        with self._timeline_lock:
+            for second, cells in state['timeline'].items():
+                self._merge_cells(second, cells)
+        for key in ('scheduled_requests', 'missed_requests', 'connections_opened', 'connection_reuses',
+                    'request_log_written', 'request_log_dropped'):
+            self.stats[key] += state[key]
+    
+    def _live_process_counters(self) -> List[int]:
+        """
+        Текущие [total, successful, errors] еще работающих дочерних процессов
+        """
+        totals = [0, 0, 0]
+        for process, counters, receiver in self._workers:
+            for i in range(3):
+                totals[i] += counters[i]
+        return totals
+    
+    def export_state(self) -> Dict:
+        """
+        Итоговое состояние генератора для передачи координатору
+        """
+        self._fold_timeline(finalize_all=True)
+        with self._timeline_lock:
+            timeline = dict(self._timeline)
+        connection_stats = self._collect_connection_stats()
+        
+        return {
+            'shard': self._merged_shard(),
+            'timeline': timeline,
+            'scheduled_requests': self.stats['scheduled_requests'],
+            'missed_requests': self.stats['missed_requests'],
+            'connections_opened': connection_stats['connections_opened'],
+            'connection_reuses': connection_stats['connection_reuses'],
+            'request_log_written': self.stats['request_log_written'],
+            'request_log_dropped': self.stats['request_log_dropped']
+        }
+    
+    def _start_open_loop(self, schedule: Iterator[Tuple[float, str, Optional[str]]],
+                         concurrency: int):
+        """
+        Запускает диспетчер и пул рабочих потоков для open-loop режима
+        
+        Очередь отправки ограничена: если сервер завис и рабочие потоки не
+        успевают, память генератора не растет, а лишние запросы
+        отбрасываются и считаются в missed_requests.
+        """
+        self._send_queue = Queue(maxsize=concurrency * self.SEND_QUEUE_PER_WORKER)
+        
+        for i in range(concurrency):
+            thread = threading.Thread(target=self._open_worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        
+        dispatcher = threading.Thread(
+            target=self._dispatcher,
+            args=(schedule, concurrency),
+            daemon=True
+        )
+        dispatcher.start()
+        self.threads.append(dispatcher)
+    
+    @staticmethod
+    def _arrival_offsets(rps: int, duration: int, arrival: str) -> Iterator[float]:
+        """
+        Плановые моменты отправки (секунды от старта); при rps <= 0 - ни одного
+        """
+        if rps <= 0:
+            return
+        if arrival == 'poisson':
+            offset = random.expovariate(rps)
+            while offset < duration:
+                yield offset
+                offset += random.expovariate(rps)
+        else:
+            interval = 1.0 / rps
+            i = 0
+            while i * interval < duration:
+                yield i * interval
+                i += 1
+    
+    def _plain_schedule(self, endpoints: List[str], rps: int, duration: int,
+                        arrival: str) -> Iterator[Tuple[float, str, Optional[str]]]:
+        """
+        Расписание без стадий: равные веса endpoint'ов, постоянный RPS
+        """
+        for offset in self._arrival_offsets(rps, duration, arrival):
+            yield offset, random.choice(endpoints), None
+    
+    def _dispatcher(self, schedule: Iterator[Tuple[float, str, Optional[str]]],
+                    concurrency: int):
+        """
+        Ставит запросы в очередь строго по расписанию, не дожидаясь ответов
+        
+        В дочернем процессе расписание начинается в ближайшем узле общей
+        сетки процессов epoch + phase + k * period: процесс, запущенный
+        позже других, сдвигается на целое число периодов и сохраняет свой
+        сдвиг относительно соседей.
+        """
+        start = time.perf_counter()
+        if self._schedule_grid is not None:
+            epoch, phase, period = self._schedule_grid
+            first = epoch + phase
+            if period > 0 and start > first:
+                first += math.ceil((start - first) / period) * period
+            start = max(start, first)
+        
+        for offset, endpoint, stage in schedule:
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            
+            # Если отстаем от расписания - отправляем сразу, без ожидания
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            if self._stop_event.is_set():
+                break
+            
+            self.stats['scheduled_requests'] += 1
+            try:
+                self._send_queue.put_nowait((intended, endpoint, stage))
+            except Full:
+                # Рабочие потоки не успевают (сервер завис) - запрос пропущен
+                self.stats['missed_requests'] += 1
+        
+        # Сигнал завершения для рабочих потоков. При остановке потоки выходят
+        # сами по _stop_event, поэтому ждать места в полной очереди не нужно
+        for i in range(concurrency):
+            while True:
+                try:
+                    self._send_queue.put(None, timeout=0.5)
+                    break
+                except Full:
+                    if self._stop_event.is_set():
+                        return
+    
+    def _open_worker(self):
+        """
+        Рабочий поток open-loop режима: выполняет запросы из очереди диспетчера
+        """
+        session = self._create_session()
+        shard = self._create_shard()
+        
+        while True:
+            job = self._send_queue.get()
+            if job is None or self._stop_event.is_set():
+                break
+            
+            intended, endpoint, stage = job
+            with shard.lock:
+                shard.send_lags.record(time.perf_counter() - intended)
+            self._execute_request(session, shard, endpoint, intended, stage)
+    
     def _worker(self, endpoints: List[str], duration: int):
         """
         Рабочий поток для генерации запросов
         """
         start_time = time.time()
+        session = self._create_session()
+        shard = self._create_shard()
         
-        while not self.stop_flag and (time.time() - start_time < duration):
-            try:
-                # Выбираем случайный endpoint
-                endpoint = random.choice(endpoints)
-                url = f"{self.base_url}{endpoint}"
-                
-                # Генерируем случайные данные
-                payload = self._generate_payload(endpoint)
-                
-                # Выполняем запрос
-                request_start = time.time()
-                
-                if endpoint in ['/api/cache', '/api/file', '/api/redis']:
-                    response = requests.post(url, json=payload, timeout=5)
-                else:
-                    response = requests.get(url, timeout=5)
-                
-                response_time = time.time() - request_start
-                
-                # Записываем результат
-                self.results_queue.put({
-                    'endpoint': endpoint,
-                    'status_code': response.status_code,
-                    'response_time': response_time,
-                    'success': response.status_code == 200
-                })
-                
-                self.stats['total_requests'] += 1
-                self.stats['response_times'].append(response_time)
-                
-                if response.status_code == 200:
-                    self.stats['successful'] += 1
-                else:
-                    self.stats['errors'] += 1
-                
-            except Exception as e:
-                self.stats['total_requests'] += 1
-                self.stats['errors'] += 1
-                self.results_queue.put({
-                    'endpoint': endpoint,
-                    'error': str(e),
-                    'success': False
-                })
+        while not self._stop_event.is_set() and (time.time() - start_time < duration):
+            # Выбираем случайный endpoint
+            endpoint = random.choice(endpoints)
+            self._execute_request(session, shard, endpoint)
             
             # Пауза между запросами (1 секунда для каждого потока)
-            time.sleep(1)
+            self._stop_event.wait(1)
     
-    def _generate_payload(self, endpoint: str) -> Dict:
+    def _create_shard(self) -> _StatsShard:
         """
-        Генерирует payload для POST запросов
+        Регистрирует шард статистики для нового рабочего потока
         """
-        if endpoint == '/api/cache':
-            return {
-                'key': f'key_{random.randint(1, 1000)}',
-                'value': 'x' * random.randint(100, 1000)
-            }
+        shard = _StatsShard(self._bucket_outbox)
+        with self._shards_lock:
+            self._shards.append(shard)
+        return shard
+    
+    def _merged_shard(self) -> _StatsShard:
+        """
+        Объединяет шарды всех рабочих потоков в один
+        """
+        merged = _StatsShard()
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            with shard.lock:
+                merged.merge(shard)
+        return merged
+    
+    def _merge_cells(self, second: int, cells: Dict[str, _SeriesCell]):
+        """
+        Добавляет ячейки одной секунды в общий ряд (вызывать под _timeline_lock)
+        """
+        bucket = self._timeline.get(second)
+        if bucket is None:
+            self._timeline[second] = cells
+        else:
+            for endpoint, cell in cells.items():
+                existing = bucket.get(endpoint)
+                if existing is None:
+                    bucket[endpoint] = cell
+                else:
+                    existing.merge(cell)
+        self._open_seconds.add(second)
+    
+    def _fold_timeline(self, blocking: bool = True, finalize_all: bool = False):
+        """
+        Переносит закрытые посекундные корзины из outbox в общий ряд
+        и финализирует ячейки старше SERIES_FINALIZE_DELAY секунд
         
-        elif endpoint == '/api/file':
-            return {
-                'content': 'test data\n' * random.randint(10, 100)
+        Args:
+            blocking: False - выйти сразу, если свертку уже делает другой поток
+            finalize_all: Финализировать все ячейки (после остановки)
+        """
+        if not self._timeline_lock.acquire(blocking):
+            return
+        try:
+            while self._bucket_outbox:
+                second, cells = self._bucket_outbox.popleft()
+                self._merge_cells(second, cells)
+            
+            horizon = int(time.time()) - self.SERIES_FINALIZE_DELAY
+            for second in [s for s in self._open_seconds if finalize_all or s < horizon]:
+                for cell in self._timeline[second].values():
+                    cell.finalize()
+                self._open_seconds.discard(second)
+        finally:
+            self._timeline_lock.release()
+    
+    def _timeline_snapshot(self) -> Dict[int, Dict[str, _SeriesCell]]:
+        """
+        Копия ряда вместе с еще открытыми корзинами рабочих потоков
+        """
+        self._fold_timeline()
+        
+        with self._timeline_lock:
+            timeline = {
+                second: {endpoint: cell.copy() for endpoint, cell in cells.items()}
+                for second, cells in self._timeline.items()
             }
+        with self._shards_lock:
+            shards = list(self._shards)
         
-        elif endpoint == '/api/redis':
-            return {
-                'key': f'redis_key_{random.randint(1, 1000)}',
-                'value': 'y' * random.randint(100, 1000)
+        for shard in shards:
+            # Рабочий поток продолжает писать в корзину - копируем ее под lock шарда
+            with shard.lock:
+                second = shard.bucket_second
+                cells = {endpoint: cell.copy() for endpoint, cell in shard.bucket_cells.items()}
+            if second is None or not cells:
+                continue
+            bucket = timeline.setdefault(second, {})
+            for endpoint, cell in cells.items():
+                if endpoint in bucket:
+                    bucket[endpoint].merge(cell)
+                else:
+                    bucket[endpoint] = cell
+        
+        return timeline
+    
+    def get_timeline(self) -> List[Dict]:
+        """
+        Посекундная шкала запросов и ошибок по всем endpoint'ам
+        
+        Returns:
+            list: [{'timestamp': int, 'requests': int, 'errors': int}, ...]
+        """
+        return [
+            {
+                'timestamp': second,
+                'requests': sum(cell.requests for cell in cells.values()),
+                'errors': sum(cell.errors for cell in cells.values())
             }
+            for second, cells in sorted(self._timeline_snapshot().items())
+        ]
+    
+    def get_timeseries(self, endpoint: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """
+        Посекундные ряды по endpoint'ам: число запросов, ошибок и квантили задержки
+        
+        timestamp - целая секунда time.time(), те же часы, что у
+        SystemMetrics.timestamp, поэтому ряды можно сопоставлять с памятью.
         
-        return {}
+        Args:
+            endpoint: Вернуть ряд только для одного endpoint'а
+        
+        Returns:
+            dict: {endpoint: [{'timestamp', 'requests', 'errors',
+                               'p50', 'p90', 'p99', 'max'}, ...]}
+        """
+        series: Dict[str, List[Dict]] = {}
+        for second, cells in sorted(self._timeline_snapshot().items()):
+            for name, cell in cells.items():
+                if endpoint is not None and name != endpoint:
+                    continue
+                p50, p90, p99, maximum = cell.get_quantiles()
+                series.setdefault(name, []).append({
+                    'timestamp': second,
+                    'requests': cell.requests,
+                    'errors': cell.errors,
+                    'p50': p50,
+                    'p90': p90,
+                    'p99': p99,
+                    'max': maximum
+                })
+        return series
+    
+    def _create_session(self) -> requests.Session:
+        """
+        Создает сессию рабочего потока с собственным пулом соединений
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        
+        with self._sessions_lock:
+            self._sessions.append(session)
+        return session
+    
+    def _collect_connection_stats(self, close: bool = False) -> Dict:
+        """
+        Считает открытые и переиспользованные соединения по пулам urllib3
+        
+        Args:
+            close: Закрыть сессии и перенести их счетчики в self.stats
+        """
+        opened = 0
+        requests_sent = 0
+        
+        with self._sessions_lock:
+            sessions = list(self._sessions)
+            if close:
+                self._sessions = []
+        
+        for session in sessions:
+            adapters = {id(a): a for a in session.adapters.values()}.values()
+            for adapter in adapters:
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        opened += pool.num_connections
+                        requests_sent += pool.num_requests
+            if close:
+                session.close()
+        
+        if close:
+            self.stats['connections_opened'] += opened
+            self.stats['connection_reuses'] += max(0, requests_sent - opened)
+            opened = requests_sent = 0
+        
+        return {
+            'connections_opened': self.stats['connections_opened'] + opened,
+            'connection_reuses': self.stats['connection_reuses'] + max(0, requests_sent - opened)
+        }
+    
+    def _execute_request(self, session: requests.Session, shard: _StatsShard,
+                         endpoint: str, intended: Optional[float] = None,
+                         stage: Optional[str] = None):
+        """
+        Выполняет один запрос и записывает результат
+        
+        Args:
+            session: Сессия рабочего потока
+            shard: Шард статистики рабочего потока
+            endpoint: Endpoint для запроса
+            intended: Плановое время отправки (perf_counter) в open режиме.
+                      От него считается скорректированная задержка, включающая
+                      ожидание в очереди (защита от coordinated omission)
+            stage: Имя стадии профиля для разметки статистики
+        """
+        request_start = time.perf_counter()
+        try:
+            url = f"{self.base_url}{endpoint}"
+            
+            # Берем готовое тело из пула - без сборки строк и json.dumps
+            body = self._payload_pool.body(endpoint) if self._payload_pool else None
+            
+            # Выполняем запрос
+            request_start = time.perf_counter()
+            
+            # Без keep-alive модульные requests.* открывают новое соединение
+            # на каждый запрос - так можно намеренно воспроизвести нагрузку
+            # на accept/handshake
+            client = session if self.keep_alive else requests
+            if not self.keep_alive:
+                shard.connections_opened += 1
+            
+            if endpoint in POST_ENDPOINTS:
+                if body is None:
+                    body = json.dumps(self._generate_payload(endpoint)).encode('utf-8')
+                response = client.post(url, data=body, headers=JSON_HEADERS, timeout=5)
+            else:
+                response = client.get(url, timeout=5)
+            
+            request_end = time.perf_counter()
+            response_time = request_end - request_start
+            
+            # Записываем результат
+            if self._request_sink is not None:
+                self._request_sink.put(time.time(), endpoint, response.status_code,
+                                       response_time, len(response.content))
+            
+            shard.record(
+                response.status_code == 200,
+                response_time,
+                request_end - intended if intended is not None else None,
+                stage,
+                endpoint
+            )
+            
+            if len(self._bucket_outbox) > self.OUTBOX_FOLD_THRESHOLD:
+                self._fold_timeline(blocking=False)
+            
+        except Exception:
+            shard.record(False, stage=stage, endpoint=endpoint)
+            if self._request_sink is not None:
+                self._request_sink.put(time.time(), endpoint, 0,
+                                       time.perf_counter() - request_start, 0)
+    
+    def _generate_payload(self, endpoint: str) -> Dict:
+        """
+        Генерирует payload для POST запросов
+        """
+        return generate_payload(endpoint)
     
     def stop(self):
         """
         Останавливает генерацию нагрузки
         """
-        print("🛑 Остановка генератора нагрузки...")
+        if self.verbose:
+            print("🛑 Остановка генератора нагрузки...")
         self.stop_flag = True
+        self._stop_event.set()
         self.stats['end_time'] = time.time()
         
         # Ждем завершения всех потоков
         for thread in self.threads:
             thread.join(timeout=5)
+        self.threads = []
+        self._collect_connection_stats(close=True)
+        
+        # Потоки завершены - закрываем их текущие посекундные корзины
+        with self._shards_lock:
+            for shard in self._shards:
+                with shard.lock:
+                    shard.close_bucket()
+        self._fold_timeline(finalize_all=True)
+        self._collect_processes()
+        
+        if self._request_sink is not None:
+            self._request_sink.close()
+            sink_stats = self._request_sink.get_statistics()
+            self.stats['request_log_written'] += sink_stats['written']
+            self.stats['request_log_dropped'] += sink_stats['dropped']
+            self._request_sink = None
         
-        print("✅ Генератор нагрузки остановлен")
+        if self.verbose:
+            print("✅ Генератор нагрузки остановлен")
     
     def get_statistics(self) -> Dict:
         """
         Возвращает статистику выполнения
         """
-        if not self.stats['response_times']:
-            avg_response_time = 0.0
-            min_response_time = 0.0
-            max_response_time = 0.0
-        else:
-            avg_response_time = sum(self.stats['response_times']) / len(self.stats['response_times'])
-            min_response_time = min(self.stats['response_times'])
-            max_response_time = max(self.stats['response_times'])
+        merged = self._merged_shard()
+        if self._workers:
+            # Процессы еще работают - гистограммы придут при stop()
+            live = self._live_process_counters()
+            merged.total_requests += live[0]
+            merged.successful += live[1]
+            merged.errors += live[2]
+        response_times = merged.response_times.to_dict()
+        corrected = merged.corrected_response_times.to_dict()
+        send_lags = merged.send_lags.to_dict()
+        connection_stats = self._collect_connection_stats()
+        timeline = self.get_timeline()
         
         total_time = 0
         if self.stats['start_time'] and self.stats['end_time']:
             total_time = self.stats['end_time'] - self.stats['start_time']
         
         return {
-            'total_requests': self.stats['total_requests'],
-            'successful': self.stats['successful'],
-            'errors': self.stats['errors'],
-            'avg_response_time': avg_response_time,
-            'min_response_time': min_response_time,
-            'max_response_time': max_response_time,
+            'total_requests': merged.total_requests,
+            'successful': merged.successful,
+            'errors': merged.errors,
+            'avg_response_time': response_times['mean'],
+            'min_response_time': response_times['min'],
+            'max_response_time': response_times['max'],
+            'p50_response_time': response_times['p50'],
+            'p90_response_time': response_times['p90'],
+            'p99_response_time': response_times['p99'],
+            'p999_response_time': response_times['p99.9'],
             'total_duration': total_time,
-            'actual_rps': self.stats['total_requests'] / total_time if total_time > 0 else 0
+            'actual_rps': merged.total_requests / total_time if total_time > 0 else 0,
+            'peak_second_rps': max((b['requests'] for b in timeline), default=0),
+            'mode': self.mode,
+            'scheduled_requests': self.stats['scheduled_requests'],
+            'missed_requests': self.stats['missed_requests'],
+            'avg_send_lag': send_lags['mean'],
+            'max_send_lag': send_lags['max'],
+            'avg_corrected_response_time': corrected['mean'],
+            'max_corrected_response_time': corrected['max'],
+            'backlog': self._send_queue.qsize() if self._send_queue is not None else 0,
+            'keep_alive': self.keep_alive,
+            'connections_opened': connection_stats['connections_opened'] + merged.connections_opened,
+            'connection_reuses': connection_stats['connection_reuses'],
+            'latency_histogram': response_times,
+            'corrected_latency_histogram': corrected,
+            'send_lag_histogram': send_lags,
+            'request_log': self.request_log,
+            'request_log_written': self.stats['request_log_written'],
+            'request_log_dropped': self.stats['request_log_dropped'],
+            'stages': self._stage_statistics(merged)
         }
+    
+    def _stage_statistics(self, merged: _StatsShard) -> Dict:
+        """
+        Статистика по стадиям профиля (пусто, если запуск без профиля)
+        """
+        stages = {}
+        for window in self.stage_windows:
+            requests_count, errors, histogram = merged.stages.get(
+                window['name'], [0, 0, LatencyHistogram()]
+            )
+            latency = histogram.to_dict()
+            duration = window['end'] - window['start']
+            stages[window['name']] = {
+                'start': window['start'],
+                'end': window['end'],
+                'target_rps': window['rps'],
+                'requests': requests_count,
+                'errors': errors,
+                'actual_rps': requests_count / duration if duration > 0 else 0,
+                'avg_response_time': latency['mean'],
+                'p50_response_time': latency['p50'],
+                'p99_response_time': latency['p99']
+            }
+        return stages
+
+
+def _process_main(base_url: str, pool_size: int, keep_alive: bool, payload_pool_size: int,
+                  request_log: Optional[str], endpoints: Optional[List[str]], share,
+                  duration: int, mode: str, arrival: str, concurrency: Optional[int],
+                  schedule_grid: Tuple[float, float, float], stop_event, counters, sender):
+    """
+    Точка входа дочернего процесса многопроцессного режима
+    
+    Args:
+        share: Доля RPS процесса (int) или его доля профиля (TrafficProfile)
+        schedule_grid: (общее начало, сдвиг процесса, период) для open режима
+    """
+    generator = LoadGenerator(base_url, pool_size=pool_size, keep_alive=keep_alive,
+                              processes=1, payload_pool_size=payload_pool_size,
+                              request_log=request_log)
+    generator.verbose = False
+    generator._schedule_grid = schedule_grid
+    if isinstance(share, TrafficProfile):
+        generator.start_profile(share, arrival=arrival, concurrency=concurrency)
+    else:
+        generator.start(endpoints, rps=share, duration=duration, mode=mode,
+                        arrival=arrival, concurrency=concurrency)
+    
+    # Публикуем живые счетчики, пока координатор не вызовет stop()
+    while not stop_event.wait(0.5):
+        merged = generator._merged_shard()
+        counters[0] = merged.total_requests
+        counters[1] = merged.successful
+        counters[2] = merged.errors
+    
+    generator.stop()
+    sender.send(generator.export_state())
+    sender.close()
@@ -0,0 +1,145 @@
+"""
+Пол памяти после сборок мусора (нижняя огибающая ряда)
+RSS Python процесса растет "пилой": объекты накапливаются между сборками и
+освобождаются при сборке. Утечка - это рост пола пилы, а не ее зубцов
+"""
+from typing import Dict
+
+import numpy as np
+
+from .trend_engine import TrendEngine
+
+
+# Сброс памяти считается сборкой, если он больше шума ряда в NOISE_FACTOR раз
+# и не меньше MIN_DROP_MB
+MIN_DROP_MB = 1.0
+NOISE_FACTOR = 4.0
+# Меньше циклов - пила не найдена, пол берется минимумами окон
+MIN_CYCLES = 3
+FLOOR_WINDOWS = 30
+
+
+def collection_starts(values, min_drop_mb: float = MIN_DROP_MB, noise_factor: float = NOISE_FACTOR) -> np.ndarray:
+    """
+    Индексы первых замеров после сборок (резких сбросов памяти)
+    
+    Порог сброса - noise_factor * MAD разностей соседних замеров: медленный
+    рост между сборками дает маленькие разности, а сборка - одну большую
+    отрицательную, которая из этого распределения выпадает.
+    """
+    diffs = np.diff(np.asarray(values, dtype=np.float64))
+    if len(diffs) == 0:
+        return np.array([], dtype=np.int64)
+    scale = 1.4826 * np.median(np.abs(diffs - np.median(diffs)))
+    return np.flatnonzero(diffs < -max(min_drop_mb, noise_factor * scale)) + 1
+
+
+def _segment_minima(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Индекс минимума каждого отрезка [starts[k], starts[k + 1]) без цикла"""
+    segment = np.zeros(len(values), dtype=np.int64)
+    segment[starts[1:]] = 1
+    segment = np.cumsum(segment)
+    # Сортировка по (отрезок, значение): первый элемент отрезка - его минимум
+    order = np.lexsort((values, segment))
+    first = np.concatenate(([0], np.flatnonzero(np.diff(segment[order])) + 1))
+    return order[first]
+
+
+def lower_envelope(times, values, min_drop_mb: float = MIN_DROP_MB,
+                   noise_factor: float = NOISE_FACTOR) -> Dict:
+    """
+    Нижняя огибающая ряда: минимум каждого цикла сборки мусора
+    
+    Если сборки не видны (меньше MIN_CYCLES циклов, например аллокатор не
+    возвращает память ОС), ряд делится на FLOOR_WINDOWS равных окон и
+    берутся их минимумы.
+    
+    Args:
+        times: Время замеров (секунды, по возрастанию)
+        values: Значения (MB)
+    
+    Returns:
+        dict: {
+            'times', 'values', 'indices': np.ndarray,  # точки пола
+            'method': str,             # 'gc_cycles' или 'window'
+            'cycles': int,             # Сколько сборок найдено
+            'churn_mb': float,         # Медианная высота зубца (накопление между сборками)
+            'cycle_seconds': float     # Медианный период пилы (0 - пила не найдена)
+        }
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    drops = collection_starts(values, min_drop_mb, noise_factor)
+    
+    if len(drops) + 1 >= MIN_CYCLES:
+        method = 'gc_cycles'
+        starts = np.concatenate(([0], drops))
+        cycle_seconds = float(np.median(np.diff(times[drops]))) if len(drops) > 1 else 0.0
+    else:
+        method = 'window'
+        windows = max(1, min(FLOOR_WINDOWS, n // 3))
+        starts = np.unique(np.linspace(0, n, windows, endpoint=False).astype(np.int64))
+        cycle_seconds = 0.0
+    
+    indices = _segment_minima(values, starts) if n else np.array([], dtype=np.int64)
+    churn = np.maximum.reduceat(values, starts) - values[indices] if n else np.array([])
+    return {
+        'times': times[indices],
+        'values': values[indices],
+        'indices': indices,
+        'method': method,
+        'cycles': int(len(drops)) if method == 'gc_cycles' else 0,
+        'churn_mb': float(np.median(churn)) if method == 'gc_cycles' else 0.0,
+        'cycle_seconds': cycle_seconds
+    }
+
+
+def analyze_floor(times, values, threshold: float, confidence: float = 0.95) -> Dict:
+    """
+    Скорость удержания памяти по полу пилы
+    
+    Наклон пола - монотонное удержание (утечка), высота зубцов - циклический
+    оборот объектов между сборками. Вердикт строится так же, как в
+    TrendEngine.summary: по доверительному интервалу наклона пола.
+    
+    Args:
+        threshold: Нормальная скорость роста пола (MB/мин)
+    
+    Returns:
+        dict: trend, floor_slope и floor_slope_ci (MB/мин), floor_growth_mb,
+              floor_points, indices (точки пола в исходном ряду), method,
+              cycles, churn_mb, cycle_seconds
+    """
+    envelope = lower_envelope(times, values)
+    result = {
+        'method': envelope['method'],
+        'cycles': envelope['cycles'],
+        'churn_mb': envelope['churn_mb'],
+        'cycle_seconds': envelope['cycle_seconds'],
+        'floor_points': len(envelope['values']),
+        'indices': envelope['indices']
+    }
+    
+    engine = TrendEngine(confidence=confidence)
+    engine.extend(envelope['times'], envelope['values'])
+    fit = engine.fit()
+    if fit is None:
+        result.update(trend='insufficient_data', floor_slope=0.0, floor_slope_ci=(0.0, 0.0), floor_growth_mb=0.0)
+        return result
+    
+    low, high = fit['slope_ci']
+    if low > threshold:
+        trend = 'increasing'
+    elif high < -threshold:
+        trend = 'decreasing'
+    else:
+        trend = 'stable'
+    duration_minutes = (envelope['times'][-1] - envelope['times'][0]) / 60
+    result.update(
+        trend=trend,
+        floor_slope=fit['slope'],
+        floor_slope_ci=fit['slope_ci'],
+        floor_growth_mb=float(fit['slope'] * duration_minutes)
+    )
+    return result
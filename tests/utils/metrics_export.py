@@ -0,0 +1,203 @@
+"""
+Потоковый экспорт замеров мониторинга в компактный колоночный файл
+Запись блоками во время прогона и быстрое чтение обратно в NumPy массивы
+"""
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from dataclasses import fields
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+MAGIC = b'MLKMETR1'
+# Длина заголовка блока (uint32, little-endian)
+HEADER_LENGTH = struct.Struct('<I')
+
+
+class MetricsExporter:
+    """
+    Дописывает замеры в файл сжатыми колоночными блоками
+    
+    Формат файла:
+        MAGIC
+        блок*: [uint32 длина заголовка][JSON заголовок][zlib данные]
+    
+    Заголовок блока описывает колонки: имя, dtype и размер в распакованных
+    данных. Числовые колонки хранятся как сырые float64/int64, строки и
+    вложенные структуры - как JSON Lines. Метки времени записываются
+    дельтами от первой метки блока, что заметно улучшает сжатие.
+    
+    Блок пишется каждые chunk_rows замеров или flush_interval секунд и сразу
+    сбрасывается на диск: при падении теряется только незаписанный хвост,
+    а читатель пропускает недописанный последний блок.
+    """
+    
+    def __init__(self, path: str, record_type, chunk_rows: int = 60,
+                 flush_interval: float = 30.0, level: int = 6):
+        """
+        Args:
+            path: Путь к файлу (дописывается, если уже существует)
+            record_type: dataclass записи (SystemMetrics)
+            chunk_rows: Максимум замеров в одном блоке
+            flush_interval: Максимальный интервал между записями блоков (секунды)
+            level: Уровень сжатия zlib
+        """
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.level = level
+        
+        self.dtypes: Dict[str, str] = {}
+        for record_field in fields(record_type):
+            if record_field.type in (float, 'float'):
+                self.dtypes[record_field.name] = '<f8'
+            elif record_field.type in (int, 'int'):
+                self.dtypes[record_field.name] = '<i8'
+            else:
+                self.dtypes[record_field.name] = 'json'
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+        
+        self._buffer: Dict[str, List] = {name: [] for name in self.dtypes}
+        self._last_flush = time.monotonic()
+        self.rows_written = 0
+        self.bytes_written = self._file.tell()
+    
+    def append(self, record):
+        """
+        Добавляет замер (подходит как подписчик EnhancedMemoryMonitor.subscribe)
+        """
+        for name, values in self._buffer.items():
+            values.append(getattr(record, name))
+        
+        rows = len(self._buffer['timestamp'])
+        if rows >= self.chunk_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """
+        Записывает накопленные замеры одним блоком
+        """
+        self._last_flush = time.monotonic()
+        rows = len(self._buffer['timestamp'])
+        if not rows or self._file is None:
+            return
+        
+        columns = []
+        parts = []
+        for name, dtype in self.dtypes.items():
+            values = self._buffer[name]
+            if dtype == 'json':
+                data = ''.join(json.dumps(value, ensure_ascii=False) + '\n' for value in values).encode('utf-8')
+            elif name == 'timestamp':
+                data = (np.asarray(values, dtype=dtype) - values[0]).astype(dtype).tobytes()
+            else:
+                data = np.asarray(values, dtype=dtype).tobytes()
+            columns.append({'name': name, 'dtype': dtype, 'size': len(data)})
+            parts.append(data)
+        
+        header = json.dumps({
+            'rows': rows,
+            'timestamp_base': self._buffer['timestamp'][0],
+            'columns': columns
+        }, separators=(',', ':')).encode('utf-8')
+        payload = zlib.compress(b''.join(parts), self.level)
+        
+        self._file.write(HEADER_LENGTH.pack(len(header)) + header + HEADER_LENGTH.pack(len(payload)) + payload)
+        self._file.flush()
+        
+        self.rows_written += rows
+        self.bytes_written = self._file.tell()
+        for values in self._buffer.values():
+            values.clear()
+    
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+
+def iter_metric_chunks(path: str, columns: Optional[List[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Читает блоки экспорта по одному (память - один блок)
+    
+    Файл отображается в память (mmap), числовые колонки создаются через
+    np.frombuffer без поэлементного разбора.
+    
+    Args:
+        columns: Какие колонки вернуть (по умолчанию все); JSON колонки
+                 разбираются только если запрошены
+    
+    Yields:
+        dict: имя колонки -> массив значений блока
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} не является файлом экспорта метрик")
+            
+            offset = len(MAGIC)
+            size = len(data)
+            while offset + HEADER_LENGTH.size <= size:
+                (header_length,) = HEADER_LENGTH.unpack_from(data, offset)
+                header_end = offset + HEADER_LENGTH.size + header_length
+                if header_end + HEADER_LENGTH.size > size:
+                    break
+                (payload_length,) = HEADER_LENGTH.unpack_from(data, header_end)
+                payload_start = header_end + HEADER_LENGTH.size
+                if payload_start + payload_length > size:
+                    # Недописанный блок (процесс упал во время записи)
+                    break
+                
+                header = json.loads(data[offset + HEADER_LENGTH.size:header_end])
+                payload = memoryview(zlib.decompress(data[payload_start:payload_start + payload_length]))
+                offset = payload_start + payload_length
+                
+                chunk = {}
+                position = 0
+                for column in header['columns']:
+                    raw = payload[position:position + column['size']]
+                    position += column['size']
+                    if columns is not None and column['name'] not in columns:
+                        continue
+                    if column['dtype'] == 'json':
+                        values = np.empty(header['rows'], dtype=object)
+                        values[:] = [json.loads(line) for line in bytes(raw).decode('utf-8').splitlines()]
+                    else:
+                        values = np.frombuffer(raw, dtype=column['dtype'])
+                    chunk[column['name']] = values
+                if 'timestamp' in chunk:
+                    chunk['timestamp'] = chunk['timestamp'] + header['timestamp_base']
+                yield chunk
+
+
+def read_metrics(path: str, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Читает весь экспорт в колонки
+    
+    Args:
+        columns: Какие колонки вернуть (по умолчанию все)
+    
+    Returns:
+        dict: имя колонки -> массив значений за весь прогон
+    """
+    chunks = {}
+    for chunk in iter_metric_chunks(path, columns):
+        for name, values in chunk.items():
+            chunks.setdefault(name, []).append(values)
+    return {name: np.concatenate(parts) for name, parts in chunks.items()}
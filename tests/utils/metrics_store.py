@@ -0,0 +1,218 @@
+"""
+Колоночное кольцевое хранилище замеров мониторинга
+NumPy массивы вместо списка dataclass, O(1) добавление и колонки без копирования
+"""
+import glob
+import json
+import os
+from dataclasses import fields
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+class MetricsStore:
+    """
+    Кольцевой буфер замеров по колонкам (одна колонка на поле dataclass)
+    
+    Каждая запись пишется дважды: в позицию pos и pos + capacity. Поэтому
+    последние N замеров всегда лежат в массиве подряд, и column() отдает
+    срез (view) без копирования даже после переполнения кольца.
+    
+    Зеркалируются только числовые колонки. Строки и вложенные структуры
+    (source, processes) лежат в отдельном кольце без зеркала: их ссылки не
+    удваиваются, а column() для них собирает копию в хронологическом порядке.
+    
+    Массивы растут удвоением до capacity, так что короткие прогоны не
+    занимают память под миллионы строк. При переполнении самые старые
+    замеры перезаписываются; если задан spill_dir, они сначала
+    сбрасываются на диск блоками по spill_chunk строк.
+    
+    Поддерживает протокол последовательности (len, индексы, срезы,
+    итерация, append), поэтому заменяет прежний List[SystemMetrics].
+    """
+    
+    INITIAL_ROWS = 1024
+    
+    def __init__(self, record_type, capacity: int = 1_000_000,
+                 spill_dir: Optional[str] = None, spill_chunk: int = 65536):
+        """
+        Args:
+            record_type: dataclass записи (SystemMetrics)
+            capacity: Максимум замеров в памяти
+            spill_dir: Каталог для сброса вытесняемых замеров (None - отбрасывать)
+            spill_chunk: Размер блока сброса на диск
+        """
+        if capacity <= 0:
+            raise ValueError("capacity должен быть > 0")
+        self.record_type = record_type
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        # Блок должен делить capacity, чтобы граница блока совпадала с началом кольца
+        self.spill_chunk = max(1, min(spill_chunk, capacity))
+        while capacity % self.spill_chunk:
+            self.spill_chunk -= 1
+        
+        self.dtypes: Dict[str, object] = {}
+        for record_field in fields(record_type):
+            if record_field.type in (float, 'float'):
+                self.dtypes[record_field.name] = np.float64
+            elif record_field.type in (int, 'int'):
+                self.dtypes[record_field.name] = np.int64
+            else:
+                # Строки и вложенные структуры (source, processes)
+                self.dtypes[record_field.name] = object
+        
+        self._rows = min(self.INITIAL_ROWS, capacity)
+        self._columns = {name: np.empty(2 * self._rows, dtype=dtype)
+                         for name, dtype in self.dtypes.items() if dtype is not object}
+        self._objects = {name: np.empty(self._rows, dtype=object)
+                         for name, dtype in self.dtypes.items() if dtype is object}
+        self._pos = 0
+        self._count = 0
+        self.total_appended = 0
+        self.spilled = 0
+        self._spill_files = 0
+        
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+    
+    def _grow(self):
+        """Удваивает массивы (только пока кольцо не заполнено)"""
+        rows = min(self._rows * 2, self.capacity)
+        for name, column in self._columns.items():
+            grown = np.empty(2 * rows, dtype=column.dtype)
+            # До переполнения данные лежат подряд в зеркальной половине
+            grown[rows:rows + self._count] = column[self._rows:self._rows + self._count]
+            grown[:self._count] = grown[rows:rows + self._count]
+            self._columns[name] = grown
+        for name, column in self._objects.items():
+            grown = np.empty(rows, dtype=object)
+            grown[:self._count] = column[:self._count]
+            self._objects[name] = grown
+        self._rows = rows
+        self._pos = self._count
+    
+    def append(self, record):
+        """
+        Добавляет замер за O(1) (амортизированно)
+        """
+        if self._count == self._rows and self._rows < self.capacity:
+            self._grow()
+        
+        if self._count == self.capacity and self._pos % self.spill_chunk == 0 and self.spill_dir:
+            self._spill()
+        
+        pos = self._pos
+        mirror = pos + self._rows
+        for name, column in self._columns.items():
+            value = getattr(record, name)
+            column[pos] = value
+            column[mirror] = value
+        for name, column in self._objects.items():
+            column[pos] = getattr(record, name)
+        
+        self._pos = (pos + 1) % self._rows
+        self._count = min(self._count + 1, self._rows)
+        self.total_appended += 1
+    
+    def _window(self) -> slice:
+        """Срез массива с замерами в хронологическом порядке"""
+        end = self._pos + self._rows
+        return slice(end - self._count, end)
+    
+    def _object_indices(self) -> np.ndarray:
+        """Позиции кольца без зеркала в хронологическом порядке"""
+        return np.arange(self._pos - self._count, self._pos) % self._rows
+    
+    def column(self, name: str) -> np.ndarray:
+        """
+        Колонка в хронологическом порядке
+        
+        Числовая колонка - view без копирования, корректный до следующего
+        append(); колонка объектов - копия.
+        """
+        if name in self._objects:
+            return self._objects[name][self._object_indices()]
+        return self._columns[name][self._window()]
+    
+    def columns(self, names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        return {name: self.column(name) for name in (names or self.dtypes)}
+    
+    def _spill(self):
+        """
+        Сбрасывает на диск самый старый блок, который сейчас будет перезаписан
+        """
+        start = self._window().start
+        chunk = slice(start, start + self.spill_chunk)
+        data = {name: column[chunk] for name, column in self._columns.items()}
+        # Блок не переходит через конец кольца: spill_chunk делит capacity
+        objects = slice(start % self._rows, start % self._rows + self.spill_chunk)
+        for name, column in self._objects.items():
+            # JSON Lines в байтах: np.savez не пикклит, np.load не нужен allow_pickle
+            lines = '\n'.join(json.dumps(value, ensure_ascii=False) for value in column[objects])
+            data[name] = np.frombuffer(lines.encode('utf-8'), dtype=np.uint8)
+        
+        self._spill_files += 1
+        np.savez_compressed(os.path.join(self.spill_dir, f'chunk_{self._spill_files:06d}.npz'), **data)
+        self.spilled += self.spill_chunk
+    
+    def iter_spilled(self) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Сброшенные на диск блоки в хронологическом порядке
+        
+        Блок сбрасывается до перезаписи первой своей строки, поэтому
+        последний блок может частично совпадать с началом column().
+        """
+        if not self.spill_dir:
+            return
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, 'chunk_*.npz'))):
+            with np.load(path) as chunk:
+                data = {}
+                for name, dtype in self.dtypes.items():
+                    if dtype is object:
+                        # np.array() превратил бы списки одинаковой длины в 2D массив
+                        lines = chunk[name].tobytes().decode('utf-8').split('\n')
+                        values = np.empty(len(lines), dtype=object)
+                        values[:] = [json.loads(line) for line in lines]
+                        data[name] = values
+                    else:
+                        data[name] = chunk[name]
+                yield data
+    
+    def _record(self, index: int):
+        column_index = self._window().start + index
+        values = {}
+        for name, column in self._columns.items():
+            values[name] = column[column_index].item()
+        for name, column in self._objects.items():
+            values[name] = column[column_index % self._rows]
+        return self.record_type(**values)
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __bool__(self) -> bool:
+        return self._count > 0
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("индекс замера вне диапазона")
+        return self._record(index)
+    
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._record(i)
+    
+    def clear(self):
+        self._pos = 0
+        self._count = 0
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Память под числовые колонки"""
+        return sum(column.nbytes for column in self._columns.values())
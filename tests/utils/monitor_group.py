@@ -0,0 +1,131 @@
+"""
+Параллельный замер нескольких контейнеров на общем такте
+Все замеры одного такта получают одну и ту же метку времени
+"""
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Tuple
+
+from .enhanced_monitor import EnhancedMemoryMonitor, SystemMetrics
+
+
+class MonitorGroup:
+    """
+    Группа мониторов, опрашиваемых параллельно
+    
+    Последовательные вызовы get_detailed_metrics() сдвигают ряды разных
+    контейнеров на время замера и растягивают период цикла. Здесь замеры
+    одного такта запускаются одновременно в пуле потоков, а такты идут по
+    монотонным часам от старта (start + k * interval), поэтому длительность
+    замера не накапливается в дрейф.
+    
+    Для каждого монитора хранится его незавершенный замер. Пока зависший
+    вызов (например, Docker API) не вернулся, новые такты этот монитор
+    пропускают и учитывают в skipped_samples, а не ставят в очередь пула:
+    иначе очередь растет, и замеры устаревают еще до старта.
+    
+    Пример:
+        group = MonitorGroup({'leak': monitor_leak, 'no_leak': monitor_no_leak})
+        for elapsed, samples in group.ticks(duration=900, interval=5):
+            print(samples['leak'].rss_mb, samples['no_leak'].rss_mb)
+    """
+    
+    def __init__(self, monitors: Dict[str, EnhancedMemoryMonitor], max_workers: Optional[int] = None,
+                 sample_timeout: Optional[float] = None):
+        """
+        Args:
+            monitors: имя -> монитор контейнера
+            max_workers: Размер пула (по умолчанию - по потоку на монитор)
+            sample_timeout: Сколько ждать отстающий замер (по умолчанию - интервал такта)
+        """
+        if not monitors:
+            raise ValueError("MonitorGroup требует хотя бы один монитор")
+        self.monitors = dict(monitors)
+        self.sample_timeout = sample_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or len(self.monitors),
+            thread_name_prefix='monitor-group'
+        )
+        self._in_flight: Dict[str, Future] = {}
+        self.ticks_done = 0
+        self.missed_ticks = 0
+        self.late_samples = 0
+        self.skipped_samples = 0
+    
+    def sample(self, timeout: Optional[float] = None) -> Dict[str, SystemMetrics]:
+        """
+        Один такт: параллельный замер всех контейнеров с общей меткой времени
+        
+        Args:
+            timeout: Сколько ждать замеры; не успевшие контейнеры в результат не попадут
+        
+        Returns:
+            dict: имя -> SystemMetrics (без пропущенных и не успевших мониторов)
+        """
+        timestamp = time.time()
+        futures = {}
+        skipped = []
+        for name, monitor in self.monitors.items():
+            previous = self._in_flight.get(name)
+            if previous is not None and not previous.done():
+                # Прошлый замер еще идет - такт для этого монитора пропущен
+                skipped.append(name)
+                continue
+            future = self._executor.submit(monitor.get_detailed_metrics, timestamp)
+            self._in_flight[name] = future
+            futures[future] = name
+        if skipped:
+            self.skipped_samples += len(skipped)
+            print(f"⚠️  Прошлый замер еще не завершен: {', '.join(sorted(skipped))}")
+        
+        done, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            self.late_samples += len(not_done)
+            print(f"⚠️  Не успели за такт: {', '.join(sorted(futures[f] for f in not_done))}")
+        
+        self.ticks_done += 1
+        return {futures[future]: future.result() for future in done}
+    
+    def ticks(self, duration: float, interval: float = 5.0) -> Iterator[Tuple[float, Dict[str, SystemMetrics]]]:
+        """
+        Такты замеров на фиксированной сетке в течение duration секунд
+        
+        Если такт (вместе с обработкой в теле цикла) занял больше интервала,
+        пропущенные точки сетки не догоняются, а учитываются в missed_ticks.
+        
+        Yields:
+            (секунды от старта, {имя: SystemMetrics})
+        """
+        start = time.monotonic()
+        tick = 0
+        timeout = self.sample_timeout or interval
+        
+        while True:
+            scheduled = start + tick * interval
+            now = time.monotonic()
+            if scheduled - start >= duration:
+                break
+            if scheduled > now:
+                time.sleep(scheduled - now)
+            
+            samples = self.sample(timeout)
+            yield scheduled - start, samples
+            
+            # Следующая точка сетки, еще не оставшаяся в прошлом
+            next_tick = int((time.monotonic() - start) // interval) + 1
+            self.missed_ticks += max(0, next_tick - tick - 1)
+            tick = max(tick + 1, next_tick)
+    
+    def close(self):
+        """
+        Останавливает пул и возвращает потоки статистики Docker мониторов
+        """
+        self._executor.shutdown(wait=False)
+        for monitor in self.monitors.values():
+            monitor.close_stats_stream()
+    
+    def __enter__(self) -> 'MonitorGroup':
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
@@ -0,0 +1,108 @@
+"""
+Пул заранее сериализованных тел запросов для горячего цикла генератора
+"""
+import itertools
+import json
+import random
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Endpoint'ы, принимающие POST с JSON телом
+POST_ENDPOINTS = ('/api/cache', '/api/file', '/api/redis')
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Ключи кеша и Redis: key_1..key_KEY_RANGE
+KEY_RANGE = 1000
+# Метка номера ключа в шаблоне тела PayloadPool
+_KEY_MARKER = '{key_id}'
+
+
+def generate_payload(endpoint: str, rng=random, key_id=None) -> Dict:
+    """
+    Генерирует payload для POST запросов
+    
+    Args:
+        key_id: Номер ключа (по умолчанию - случайный из 1..KEY_RANGE)
+    """
+    if key_id is None:
+        key_id = rng.randint(1, KEY_RANGE)
+    
+    if endpoint == '/api/cache':
+        return {
+            'key': f'key_{key_id}',
+            'value': 'x' * rng.randint(100, 1000)
+        }
+    
+    elif endpoint == '/api/file':
+        return {
+            'content': 'test data\n' * rng.randint(10, 100)
+        }
+    
+    elif endpoint == '/api/redis':
+        return {
+            'key': f'redis_key_{key_id}',
+            'value': 'y' * rng.randint(100, 1000)
+        }
+    
+    return {}
+
+
+class PayloadPool:
+    """
+    Готовые к отправке JSON тела (bytes) для каждого POST endpoint'а
+    
+    Тела генерируются один раз с тем же распределением размеров, что и
+    generate_payload(), и затем отдаются по кругу - в горячем цикле нет
+    ни сборки строк, ни json.dumps.
+    
+    Ключ не входит в заранее сериализованное тело: номер ключа
+    подставляется на каждый запрос по кругу 1..KEY_RANGE (свой курсор у
+    каждого endpoint'а). Поэтому при любом размере пула приложение видит
+    все KEY_RANGE ключей, и рост кеша в приложении с утечкой не меняется.
+    """
+    
+    def __init__(self, endpoints: Iterable[str], size: int = 1024, seed: Optional[int] = None):
+        """
+        Args:
+            endpoints: Endpoint'ы нагрузки (GET endpoint'ы пропускаются)
+            size: Число тел (вариантов размера значения) на endpoint
+            seed: Seed генератора для воспроизводимых тел
+        """
+        self.size = max(1, size)
+        rng = random.Random(seed)
+        # endpoint -> [(часть до номера ключа, часть после или None)]
+        self._bodies: Dict[str, List[Tuple[bytes, Optional[bytes]]]] = {}
+        self._cursors: Dict[str, Iterator[int]] = {}
+        
+        for endpoint in endpoints:
+            if endpoint in POST_ENDPOINTS and endpoint not in self._bodies:
+                self._bodies[endpoint] = [self._template(endpoint, rng) for _ in range(self.size)]
+                # next() у itertools.count атомарен под GIL - курсор без блокировки
+                self._cursors[endpoint] = itertools.count()
+    
+    @staticmethod
+    def _template(endpoint: str, rng) -> Tuple[bytes, Optional[bytes]]:
+        """Сериализованное тело, разрезанное по месту номера ключа"""
+        payload = generate_payload(endpoint, rng, key_id=_KEY_MARKER)
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        head, marker, tail = body.partition(_KEY_MARKER.encode('utf-8'))
+        return (head, tail) if marker else (body, None)
+    
+    def body(self, endpoint: str) -> Optional[bytes]:
+        """
+        Следующее тело для endpoint'а или None для GET endpoint'ов
+        """
+        bodies = self._bodies.get(endpoint)
+        if bodies is None:
+            return None
+        n = next(self._cursors[endpoint])
+        head, tail = bodies[n % self.size]
+        if tail is None:
+            return head
+        return b'%s%d%s' % (head, n % KEY_RANGE + 1, tail)
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Суммарный размер тел в пуле"""
+        return sum(len(head) + len(tail or b'') for bodies in self._bodies.values() for head, tail in bodies)
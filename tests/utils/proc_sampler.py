@@ -0,0 +1,237 @@
+"""
+Дешевый сэмплер процесса контейнера через /proc
+RSS/PSS/USS/anon/swap из smaps_rollup, потоки и переключения контекста из
+status, дескрипторы и сокеты из fd и /proc/<pid>/net/tcp* - без
+psutil.connections() и open_files()
+"""
+import os
+from typing import Dict, List, Optional, Set
+
+
+# Поля smaps_rollup (kB) -> ключи результата
+SMAPS_FIELDS = {
+    'Rss': 'rss_kb',
+    'Pss': 'pss_kb',
+    'Private_Clean': 'private_clean_kb',
+    'Private_Dirty': 'private_dirty_kb',
+    'Anonymous': 'anon_kb',
+    'Swap': 'swap_kb',
+}
+
+# Таблицы сокетов сетевого namespace процесса
+SOCKET_TABLES = ('tcp', 'tcp6', 'udp', 'udp6')
+TCP_TABLES = ('tcp', 'tcp6')
+# Состояние TCP_ESTABLISHED в колонке st таблиц /proc/net/tcp*
+TCP_ESTABLISHED = '01'
+# Цели ссылок fd, которые не являются обычными файлами
+SPECIAL_FD_PREFIXES = ('/dev/', '/proc/', '/sys/')
+
+
+class ProcSampler:
+    """
+    Снимает метрики основного процесса контейнера и его дочерних воркеров
+    
+    Дескрипторы классифицируются одним readlink на fd: socket:[inode] -
+    сокет процесса, абсолютный путь вне /dev, /proc, /sys - обычный файл
+    (так же считает psutil.open_files()). Соединения - строки
+    /proc/<pid>/net/tcp* в состоянии ESTABLISHED, inode которых принадлежит
+    дереву процессов: LISTEN, TIME_WAIT и сокеты чужих процессов namespace
+    не учитываются. В отличие от psutil, таблицы читаются один раз на замер,
+    а не на каждый процесс.
+    
+    PID задается извне и кешируется. Перезапуск процесса определяется по
+    времени старта из /proc/<pid>/stat: если оно изменилось или процесс
+    исчез, sample() возвращает None, и владелец должен заново узнать PID.
+    """
+    
+    def __init__(self, pid: int, proc_root: str = '/proc'):
+        self.pid = pid
+        self.proc_root = proc_root
+        self.start_time = self._start_time(pid)
+    
+    def _path(self, pid: int, *parts: str) -> str:
+        return os.path.join(self.proc_root, str(pid), *parts)
+    
+    def _start_time(self, pid: int) -> Optional[int]:
+        """Время старта процесса в тиках (поле 22 /proc/<pid>/stat)"""
+        try:
+            with open(self._path(pid, 'stat'), 'r') as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # Имя процесса в скобках может содержать пробелы - режем по последней ')'
+        fields = stat[stat.rfind(')') + 2:].split()
+        return int(fields[19])
+    
+    def is_alive(self) -> bool:
+        """Тот же процесс, что и при создании сэмплера"""
+        return self.start_time is not None and self._start_time(self.pid) == self.start_time
+    
+    def _read_smaps_rollup(self, pid: int) -> Dict[str, int]:
+        values = {key: 0 for key in SMAPS_FIELDS.values()}
+        try:
+            with open(self._path(pid, 'smaps_rollup'), 'r') as f:
+                for line in f:
+                    name, _, rest = line.partition(':')
+                    key = SMAPS_FIELDS.get(name)
+                    if key is not None:
+                        values[key] = int(rest.split()[0])
+        except (OSError, ValueError, IndexError):
+            # Нет прав (другой пользователь) или ядро без smaps_rollup
+            pass
+        return values
+    
+    def _read_status(self, pid: int) -> Dict:
+        status = {'name': '', 'threads': 0, 'ctx_switches': 0, 'vm_rss_kb': 0, 'vm_size_kb': 0}
+        with open(self._path(pid, 'status'), 'r') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name == 'Name':
+                    status['name'] = value.strip()
+                elif name == 'Threads':
+                    status['threads'] = int(value)
+                elif name in ('voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches'):
+                    status['ctx_switches'] += int(value)
+                elif name == 'VmRSS':
+                    status['vm_rss_kb'] = int(value.split()[0])
+                elif name == 'VmSize':
+                    status['vm_size_kb'] = int(value.split()[0])
+        return status
+    
+    def _scan_fds(self, pid: int) -> Dict:
+        """
+        Классифицирует дескрипторы процесса по целям ссылок /proc/<pid>/fd/*
+        
+        Returns:
+            dict: fds (все дескрипторы), open_files (обычные файлы),
+                  socket_inodes (inode сокетов)
+        """
+        fds = 0
+        open_files = 0
+        socket_inodes = set()
+        try:
+            entries = os.scandir(self._path(pid, 'fd'))
+        except OSError:
+            return {'fds': 0, 'open_files': 0, 'socket_inodes': socket_inodes}
+        with entries:
+            for entry in entries:
+                fds += 1
+                try:
+                    target = os.readlink(entry.path)
+                except OSError:
+                    # Дескриптор закрыт между listdir и readlink
+                    continue
+                if target.startswith('socket:['):
+                    socket_inodes.add(target[8:-1])
+                elif target.startswith('/') and not target.startswith(SPECIAL_FD_PREFIXES):
+                    open_files += 1
+        return {'fds': fds, 'open_files': open_files, 'socket_inodes': socket_inodes}
+    
+    def _children(self, pid: int) -> List[int]:
+        """
+        Прямые потомки процесса из /proc/<pid>/task/<tid>/children
+        """
+        children = []
+        try:
+            tids = os.listdir(self._path(pid, 'task'))
+        except OSError:
+            return children
+        for tid in tids:
+            try:
+                with open(self._path(pid, 'task', tid, 'children'), 'r') as f:
+                    children.extend(int(child) for child in f.read().split())
+            except OSError:
+                continue
+        return children
+    
+    def _sample_process(self, pid: int) -> Dict:
+        status = self._read_status(pid)
+        memory = self._read_smaps_rollup(pid)
+        if not memory['rss_kb']:
+            memory['rss_kb'] = status['vm_rss_kb']
+        return {
+            'pid': pid,
+            'name': status['name'],
+            'rss_mb': memory['rss_kb'] / 1024,
+            'vms_mb': status['vm_size_kb'] / 1024,
+            'pss_mb': memory['pss_kb'] / 1024,
+            'uss_mb': (memory['private_clean_kb'] + memory['private_dirty_kb']) / 1024,
+            'anon_mb': memory['anon_kb'] / 1024,
+            'swap_mb': memory['swap_kb'] / 1024,
+            'threads': status['threads'],
+            'ctx_switches': status['ctx_switches'],
+            **self._scan_fds(pid)
+        }
+    
+    def _count_sockets(self, inodes: Set[str]) -> Dict[str, int]:
+        """
+        Сокеты дерева процессов по таблицам сетевого namespace
+        
+        Args:
+            inodes: inode сокетов из fd процессов
+        
+        Returns:
+            dict: {таблица: число своих сокетов}; для tcp/tcp6 - только
+                  соединения в состоянии ESTABLISHED
+        """
+        counts = {}
+        for table in SOCKET_TABLES:
+            count = 0
+            try:
+                with open(self._path(self.pid, 'net', table), 'r') as f:
+                    next(f, None)  # Заголовок
+                    for line in f:
+                        # sl local rem st tx:rx tr:when retrnsmt uid timeout inode
+                        fields = line.split()
+                        if len(fields) < 10 or fields[9] not in inodes:
+                            continue
+                        if table in TCP_TABLES and fields[3] != TCP_ESTABLISHED:
+                            continue
+                        count += 1
+            except OSError:
+                pass
+            counts[table] = count
+        return counts
+    
+    def sample(self) -> Optional[Dict]:
+        """
+        Один замер основного процесса и всех его потомков
+        
+        Returns:
+            dict: суммы по дереву процессов (rss_mb, pss_mb, uss_mb, anon_mb,
+                  swap_mb, threads, ctx_switches, fds, open_files),
+                  tcp_connections (свои ESTABLISHED), network_connections
+                  (они же плюс свои udp сокеты) и список processes по каждому
+                  процессу.
+                  None - процесс завершился или PID переиспользован
+        """
+        if not self.is_alive():
+            return None
+        
+        processes = []
+        pending = [self.pid]
+        while pending:
+            pid = pending.pop()
+            try:
+                processes.append(self._sample_process(pid))
+            except OSError:
+                # Воркер завершился между listdir и чтением
+                if pid == self.pid:
+                    return None
+                continue
+            pending.extend(self._children(pid))
+        
+        result = {key: sum(p[key] for p in processes)
+                  for key in ('rss_mb', 'pss_mb', 'uss_mb', 'anon_mb', 'swap_mb',
+                              'threads', 'ctx_switches', 'fds', 'open_files')}
+        result['vms_mb'] = processes[0]['vms_mb']
+        
+        # Воркеры наследуют сокеты родителя - один inode считается один раз
+        inodes = set()
+        for process in processes:
+            inodes |= process.pop('socket_inodes')
+        sockets = self._count_sockets(inodes)
+        result['tcp_connections'] = sockets['tcp'] + sockets['tcp6']
+        result['network_connections'] = sum(sockets.values())
+        result['processes'] = processes
+        return result
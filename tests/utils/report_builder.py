@@ -1,12 +1,527 @@
 """
 Построение отчетов и графиков для Allure
+matplotlib импортируется лениво - только при первой отрисовке графика
 """
-import matplotlib
-matplotlib.use('Agg')  # Используем без GUI
-import matplotlib.pyplot as plt
-import numpy as np
-from typing import List, Dict
+import glob
+import json
 import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import allure
+import numpy as np
+
+from .downsample import downsample
+from .memory_floor import analyze_floor
+from .time_grid import align_series, growth_on_grid, records_to_series
+from .trend_engine import TrendEngine
+
+
+# immediate - рисовать сразу в тесте, deferred - сохранить ряды и нарисовать
+# после сессии (render_deferred_charts), none - без графиков (быстрый CI)
+RENDER_MODES = ('immediate', 'deferred', 'none')
+CHART_FORMATS = ('png', 'svg')
+CHART_RENDER = os.getenv('CHART_RENDER', 'immediate')
+CHART_DPI = int(os.getenv('CHART_DPI', '300'))
+CHART_FORMAT = os.getenv('CHART_FORMAT', 'png')
+# Длинные ряды прореживаются до CHART_MAX_POINTS точек (lttb или minmax)
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', '1000'))
+CHART_DOWNSAMPLE = os.getenv('CHART_DOWNSAMPLE', 'lttb')
+# Нормальный рост Python приложения под нагрузкой: 2-4 MB/мин (прогрев кешей, аллокатор)
+NORMAL_GROWTH_MB_PER_MIN = 4.0
+# ci - по доверительному интервалу наклона после прогрева (по умолчанию), floor - по
+# интервалу наклона пола пилы после сборок мусора, threshold - старые пороги роста
+TREND_MODES = ('ci', 'floor', 'threshold')
+TREND_MODE = os.getenv('TREND_MODE', 'ci')
+# Маркеры точек рисуются только на коротких рядах
+MARKER_MAX_POINTS = 200
+# Сравнение многих вариантов: разности линиями до этого числа рядов, дальше тепловой картой
+MULTI_LINES_MAX_SERIES = 12
+
+# Задание отложенного графика лежит рядом с будущим файлом графика
+JOB_SUFFIX = '.chart.json'
+# Метка Allure, по которой результат теста находит свои отложенные графики
+CHART_LABEL = 'deferred_chart'
+
+_plt = None
+
+
+def _pyplot():
+    """matplotlib.pyplot с бэкендом Agg (импорт при первом вызове)"""
+    global _plt
+    if _plt is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Используем без GUI
+        import matplotlib.pyplot as plt
+        # Настройка стиля графиков
+        plt.style.use('seaborn-v0_8-darkgrid')
+        _plt = plt
+    return _plt
+
+
+def render_memory_chart(data: List[Dict], title: str, filepath: str, dpi: int = 300,
+                        max_points: int = CHART_MAX_POINTS, downsample_method: str = CHART_DOWNSAMPLE,
+                        trend_mode: str = TREND_MODE) -> str:
+    """
+    Рисует график потребления памяти
+    
+    Args:
+        data: Список измерений с ключами 'time', 'rss_mb', 'vms_mb'
+        title: Заголовок графика
+        filepath: Путь к файлу графика (.png или .svg)
+        dpi: Разрешение растровых графиков
+        max_points: До скольких точек прореживать линии (0 - без прореживания)
+        downsample_method: lttb или minmax
+        trend_mode: floor - рост для вердикта считается по полу пилы GC
+    
+    Returns:
+        str: Путь к сохраненному файлу
+    """
+    plt = _pyplot()
+    
+    # Извлекаем данные
+    times = [d['time'] for d in data]  # Оставляем в секундах для лучшей читаемости
+    rss = [d['rss_mb'] for d in data]
+    vms = [d.get('vms_mb', d['rss_mb']) for d in data]
+    
+    # Рисуются прореженные линии, статистика считается по полному ряду
+    plot_times, plot_rss = downsample(times, rss, max_points, downsample_method)
+    vms_times, plot_vms = downsample(times, vms, max_points, downsample_method)
+    markers = len(plot_times) <= MARKER_MAX_POINTS
+    
+    # Создаем фигуру
+    fig, ax = plt.subplots(figsize=(14, 8))
+    
+    # Основные линии
+    ax.plot(plot_times, plot_rss, label='RSS (Resident Set Size)', 
+            linewidth=3, color='#e74c3c', marker='o' if markers else None, markersize=6)
+    ax.plot(vms_times, plot_vms, label='VMS (Virtual Memory Size)', 
+            linewidth=2, color='#3498db', marker='s' if markers else None, markersize=4, alpha=0.7)
+    
+    # Линия тренда для RSS
+    if len(times) > 2:
+        z = np.polyfit(times, rss, 1)
+        p = np.poly1d(z)
+        trend_mb_per_sec = z[0]
+        trend_mb_per_min = trend_mb_per_sec * 60
+        trend_times = [times[0], times[-1]]
+        ax.plot(trend_times, p(trend_times), "--", label=f'Тренд RSS ({trend_mb_per_min:+.2f} MB/мин)', 
+               linewidth=2, color='#c0392b', alpha=0.6)
+    
+    # Пол пилы GC (минимумы после сборок) - рисуется, только если пила найдена
+    floor = analyze_floor(times, rss, NORMAL_GROWTH_MB_PER_MIN)
+    sawtooth = floor['method'] == 'gc_cycles' and floor['trend'] != 'insufficient_data'
+    if sawtooth:
+        envelope_times = [times[i] for i in floor['indices']]
+        envelope_rss = [rss[i] for i in floor['indices']]
+        ax.plot(envelope_times, envelope_rss, ':', label=f"Пол после GC ({floor['floor_slope']:+.2f} MB/мин)",
+               linewidth=2, color='#8e44ad', marker='v' if len(envelope_times) <= MARKER_MAX_POINTS else None)
+    
+    # Заполнение области под RSS
+    ax.fill_between(plot_times, min(rss) * 0.9, plot_rss, alpha=0.15, color='#e74c3c')
+    
+    # 🎨 УЛУЧШЕННЫЕ аннотации с умным позиционированием
+    rss_range = max(rss) - min(rss)
+    time_range = max(times) - min(times)
+    
+    # Определяем рост памяти для выбора цветов
+    growth = floor['floor_growth_mb'] if sawtooth and trend_mode == 'floor' else rss[-1] - rss[0]
+    
+    # Аннотация начала - всегда зеленая (старт)
+    start_y_offset = rss_range * 0.4 if rss[0] < np.median(rss) else -rss_range * 0.2
+    ax.annotate(f'Начало: {rss[0]:.1f} MB', 
+               xy=(times[0], rss[0]), 
+               xytext=(times[0] + time_range * 0.15, rss[0] + start_y_offset),
+               arrowprops=dict(arrowstyle='->', color='green', lw=2),
+               fontsize=11, color='green', weight='bold',
+               bbox=dict(boxstyle='round,pad=0.3', facecolor='lightgreen', alpha=0.7))
+    
+    # Аннотация конца - цвет зависит от роста
+    if growth > 5.0:  # Значительный рост
+        end_color = 'red'
+        verdict = 'УТЕЧКА!'
+        bg_color = 'mistyrose'
+    elif growth > 2.0:  # Умеренный рост
+        end_color = 'orange'
+        verdict = 'Рост'
+        bg_color = 'moccasin'
+    else:  # Стабильно
+        end_color = 'darkgreen'
+        verdict = 'ЗДОРОВО!'
+        bg_color = 'lightgreen'
+    
+    end_y_offset = rss_range * 0.4 if rss[-1] < np.median(rss) else -rss_range * 0.3
+    ax.annotate(f'Конец: {rss[-1]:.1f} MB\nРост: +{growth:.1f} MB\n{verdict}', 
+               xy=(times[-1], rss[-1]), 
+               xytext=(times[-1] - time_range * 0.25, rss[-1] + end_y_offset),
+               arrowprops=dict(arrowstyle='->', color=end_color, lw=2),
+               fontsize=11, color=end_color, weight='bold',
+               bbox=dict(boxstyle='round,pad=0.4', facecolor=bg_color, alpha=0.8))
+    
+    # Настройка осей и сетки
+    ax.set_xlabel('Время (секунды)', fontsize=12, weight='bold')
+    ax.set_ylabel('Память (MB)', fontsize=12, weight='bold')
+    ax.set_title(title, fontsize=14, weight='bold', pad=20)
+    ax.legend(loc='upper left', fontsize=11)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    
+    # Улучшенные оси
+    ax.set_xlim(min(times) - time_range * 0.05, max(times) + time_range * 0.05)
+    ax.set_ylim(min(rss) - rss_range * 0.1, max(max(rss), max(vms)) + rss_range * 0.3)
+    
+    # 📊 УЛУЧШЕННАЯ информация с вердиктом (рост посчитан выше для аннотации конца)
+    duration_sec = times[-1] - times[0]
+    duration_min = duration_sec / 60
+    growth_rate_per_min = (growth / duration_min) if duration_min > 0 else 0
+    
+    # Определяем вердикт по росту
+    if growth > 8.0:
+        verdict_emoji = "🚨"
+        verdict_text = "КРИТИЧЕСКАЯ УТЕЧКА"
+        info_bg_color = 'mistyrose'
+    elif growth > 4.0:
+        verdict_emoji = "🔴" 
+        verdict_text = "УТЕЧКА ОБНАРУЖЕНА"
+        info_bg_color = 'moccasin'
+    elif growth > 1.0:
+        verdict_emoji = "⚠️"
+        verdict_text = "НЕБОЛЬШОЙ РОСТ"
+        info_bg_color = 'lightyellow'
+    else:
+        verdict_emoji = "✅"
+        verdict_text = "СТАБИЛЬНО"
+        info_bg_color = 'lightgreen'
+    
+    info_text = f'📊 Анализ памяти:\n'
+    info_text += f'{verdict_emoji} Вердикт: {verdict_text}\n'
+    info_text += f'📈 Рост: {growth:+.2f} MB\n'
+    info_text += f'⚡ Скорость: {growth_rate_per_min:+.1f} MB/мин\n'
+    info_text += f'⏱️ Время: {duration_sec:.0f}с'
+    
+    # Позиционируем информационный блок справа вверху, чтобы не перекрывал надписи
+    ax.text(0.98, 0.98, info_text, transform=ax.transAxes,
+           fontsize=10, verticalalignment='top', horizontalalignment='right',
+           bbox=dict(boxstyle='round,pad=0.5', facecolor=info_bg_color, alpha=0.9))
+    
+    # Сохранение (формат по расширению: .png или .svg)
+    plt.tight_layout()
+    plt.savefig(filepath, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    
+    print(f"📊 График сохранен: {filepath}")
+    return filepath
+
+
+def render_comparison_chart(data_leak: List[Dict], data_no_leak: List[Dict],
+                            title: str, filepath: str, dpi: int = 300,
+                            max_points: int = CHART_MAX_POINTS, downsample_method: str = CHART_DOWNSAMPLE) -> str:
+    """
+    Рисует сравнительный график для двух приложений
+    """
+    plt = _pyplot()
+    
+    # Извлекаем данные
+    times_leak = [d['time'] / 60 for d in data_leak]
+    rss_leak = [d['rss_mb'] for d in data_leak]
+    
+    times_no_leak = [d['time'] / 60 for d in data_no_leak]
+    rss_no_leak = [d['rss_mb'] for d in data_no_leak]
+    
+    plot_times_leak, plot_rss_leak = downsample(times_leak, rss_leak, max_points, downsample_method)
+    plot_times_no_leak, plot_rss_no_leak = downsample(times_no_leak, rss_no_leak, max_points, downsample_method)
+    markers = max(len(plot_times_leak), len(plot_times_no_leak)) <= MARKER_MAX_POINTS
+    
+    # Создаем фигуру с двумя подграфиками
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
+    
+    # График 1: Сравнение на одном графике
+    ax1.plot(plot_times_leak, plot_rss_leak, label='С утечкой памяти', 
+            linewidth=2.5, color='#e74c3c', marker='o' if markers else None, markersize=4)
+    ax1.plot(plot_times_no_leak, plot_rss_no_leak, label='Без утечки памяти', 
+            linewidth=2.5, color='#27ae60', marker='s' if markers else None, markersize=4)
+    
+    ax1.fill_between(plot_times_leak, 0, plot_rss_leak, alpha=0.2, color='#e74c3c')
+    ax1.fill_between(plot_times_no_leak, 0, plot_rss_no_leak, alpha=0.2, color='#27ae60')
+    
+    ax1.set_xlabel('Время (минуты)', fontsize=12, weight='bold')
+    ax1.set_ylabel('Память RSS (MB)', fontsize=12, weight='bold')
+    ax1.set_title('Сравнение потребления памяти', fontsize=14, weight='bold')
+    ax1.legend(loc='upper left', fontsize=11)
+    ax1.grid(True, alpha=0.3, linestyle='--')
+    
+    # График 2: Разница в потреблении памяти
+    # Сопоставляем замеры по времени, а не по индексу: ряды выравниваются
+    # на общую сетку (частота замеров у приложений может отличаться)
+    grid, aligned = align_series({'leak': (times_leak, rss_leak), 'no_leak': (times_no_leak, rss_no_leak)})
+    times_diff, diff = downsample(grid, aligned[0] - aligned[1], max_points, downsample_method)
+    
+    ax2.plot(times_diff, diff, label='Разница (Leak - No Leak)', 
+            linewidth=2.5, color='#9b59b6', marker='D' if markers else None, markersize=4)
+    ax2.fill_between(times_diff, 0, diff, alpha=0.3, color='#9b59b6')
+    ax2.axhline(y=0, color='black', linestyle='-', linewidth=1)
+    
+    ax2.set_xlabel('Время (минуты)', fontsize=12, weight='bold')
+    ax2.set_ylabel('Разница в памяти (MB)', fontsize=12, weight='bold')
+    ax2.set_title('Разница в потреблении памяти', fontsize=14, weight='bold')
+    ax2.legend(loc='upper left', fontsize=11)
+    ax2.grid(True, alpha=0.3, linestyle='--')
+    
+    # Статистика на общем отрезке времени
+    growth_leak, growth_no_leak = growth_on_grid(aligned)
+    
+    info_text = f'📊 Сравнительная статистика:\n'
+    info_text += f'С утечкой: +{growth_leak:.2f} MB\n'
+    info_text += f'Без утечки: +{growth_no_leak:.2f} MB\n'
+    info_text += f'Разница: {growth_leak - growth_no_leak:.2f} MB\n'
+    info_text += f'Соотношение: {growth_leak / max(growth_no_leak, 1):.2f}x'
+    
+    ax2.text(0.02, 0.98, info_text, transform=ax2.transAxes,
+            fontsize=10, verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8))
+    
+    # Сохранение (формат по расширению: .png или .svg)
+    plt.tight_layout()
+    plt.savefig(filepath, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    
+    print(f"📊 Сравнительный график сохранен: {filepath}")
+    return filepath
+
+
+def render_multi_comparison_chart(datasets: Dict[str, List[Dict]], title: str, filepath: str, dpi: int = 300,
+                                  baseline: Optional[str] = None, max_points: int = CHART_MAX_POINTS,
+                                  downsample_method: str = CHART_DOWNSAMPLE) -> str:
+    """
+    Рисует сравнительный график для любого числа приложений или прогонов
+    
+    Все ряды выравниваются на общую сетку времени, разности считаются
+    относительно базового ряда. До MULTI_LINES_MAX_SERIES рядов разности
+    рисуются линиями, больше - тепловой картой (строка на вариант).
+    
+    Args:
+        datasets: {имя варианта: список измерений с ключами 'time', 'rss_mb'}
+        baseline: Имя базового варианта (по умолчанию - первый)
+    """
+    plt = _pyplot()
+    
+    names = list(datasets)
+    base = names.index(baseline) if baseline is not None else 0
+    series = {name: (times / 60, values) for name, (times, values) in records_to_series(datasets).items()}
+    grid, aligned = align_series(series)
+    diffs = aligned - aligned[base]
+    growth = growth_on_grid(aligned)
+    
+    count = len(names)
+    lines = count <= MULTI_LINES_MAX_SERIES
+    if count <= 20:
+        cmap = plt.get_cmap('tab10' if count <= 10 else 'tab20')
+        colors = [cmap(i) for i in range(count)]
+    else:
+        colors = plt.get_cmap('viridis')(np.linspace(0, 1, count))
+    linewidth = 2.5 if lines else 1.0
+    
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
+    
+    # График 1: исходные ряды (каждый со своей частотой замеров)
+    for i, (name, (times, values)) in enumerate(series.items()):
+        plot_times, plot_values = downsample(times, values, max_points, downsample_method)
+        ax1.plot(plot_times, plot_values, label=name, color=colors[i],
+                linewidth=linewidth * (1.5 if i == base else 1.0), alpha=0.9 if lines else 0.6)
+    
+    ax1.set_xlabel('Время (минуты)', fontsize=12, weight='bold')
+    ax1.set_ylabel('Память RSS (MB)', fontsize=12, weight='bold')
+    ax1.set_title(title, fontsize=14, weight='bold')
+    if lines:
+        ax1.legend(loc='upper left', fontsize=10, ncol=2 if count > 6 else 1)
+    ax1.grid(True, alpha=0.3, linestyle='--')
+    
+    # График 2: разница с базовым вариантом на общей сетке
+    if lines:
+        for i, name in enumerate(names):
+            if i == base:
+                continue
+            plot_times, plot_diff = downsample(grid, diffs[i], max_points, downsample_method)
+            ax2.plot(plot_times, plot_diff, label=f'{name} - {names[base]}', linewidth=2, color=colors[i])
+        ax2.axhline(y=0, color='black', linestyle='-', linewidth=1)
+        ax2.set_ylabel('Разница в памяти (MB)', fontsize=12, weight='bold')
+        ax2.legend(loc='lower left', fontsize=10, ncol=2 if count > 6 else 1)
+    else:
+        # Строки по убыванию роста; столбцы прорежены до max_points
+        order = np.argsort(-growth)
+        columns = np.unique(np.linspace(0, len(grid) - 1, min(len(grid), max_points or len(grid))).astype(int))
+        limit = float(np.nanmax(np.abs(diffs))) or 1.0
+        image = ax2.imshow(diffs[order][:, columns], aspect='auto', cmap='RdBu_r', vmin=-limit, vmax=limit,
+                           extent=(grid[0], grid[-1], count, 0), interpolation='nearest')
+        fig.colorbar(image, ax=ax2, label=f'Разница с {names[base]} (MB)')
+        if count <= 40:
+            ax2.set_yticks(np.arange(count) + 0.5)
+            ax2.set_yticklabels([names[i] for i in order], fontsize=7)
+        ax2.set_ylabel('Вариант', fontsize=12, weight='bold')
+    ax2.set_xlabel('Время (минуты)', fontsize=12, weight='bold')
+    ax2.set_title(f'Разница с базовым вариантом: {names[base]}', fontsize=14, weight='bold')
+    ax2.grid(True, alpha=0.3, linestyle='--')
+    
+    # Статистика: варианты с наибольшим ростом на общем отрезке
+    base_growth = growth[base]
+    info_text = f'📊 Рост за {grid[-1] - grid[0]:.1f} мин (база: {names[base]} {base_growth:+.2f} MB):\n'
+    top = [i for i in np.argsort(-growth) if i != base][:5]
+    info_text += '\n'.join(f'{names[i]}: {growth[i]:+.2f} MB, {growth[i] / max(base_growth, 1):.2f}x'
+                           for i in top)
+    if count - 1 > len(top):
+        info_text += f'\n... еще вариантов: {count - 1 - len(top)}'
+    
+    ax1.text(0.98, 0.02, info_text, transform=ax1.transAxes,
+            fontsize=9, verticalalignment='bottom', horizontalalignment='right',
+            bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8))
+    
+    # Сохранение (формат по расширению: .png или .svg)
+    plt.tight_layout()
+    plt.savefig(filepath, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    
+    print(f"📊 Сравнительный график ({count} вариантов) сохранен: {filepath}")
+    return filepath
+
+
+CHART_RENDERERS = {
+    'memory': render_memory_chart,
+    'comparison': render_comparison_chart,
+    'multi_comparison': render_multi_comparison_chart,
+}
+
+
+def _chart_attachment_type(filepath: str):
+    return allure.attachment_type.SVG if filepath.endswith('.svg') else allure.attachment_type.PNG
+
+
+def _read_job(job_path: str) -> Dict:
+    with open(job_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data: Dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def _render_job(job_path: str) -> Dict:
+    """
+    Рисует один отложенный график (выполняется в процессе пула)
+    
+    Returns:
+        dict: filepath и attachments - имена вложений Allure для графика
+    """
+    job = _read_job(job_path)
+    filepath = CHART_RENDERERS[job['kind']](filepath=job['filepath'], dpi=job['dpi'], **job['kwargs'])
+    os.remove(job_path)
+    return {'id': job['id'], 'filepath': filepath, 'attachments': job['attachments']}
+
+
+def _attach_to_results(results_dir: str, charts: List[Dict]) -> int:
+    """
+    Дописывает нарисованные графики во вложения результатов тестов Allure
+    
+    К моменту отрисовки allure-pytest уже записал результаты тестов
+    (<uuid>-result.json), поэтому график копируется в директорию результатов
+    как обычное вложение, а ссылка на него добавляется в результат теста с
+    меткой CHART_LABEL этого графика. Сама метка после этого удаляется.
+    
+    Returns:
+        int: Сколько вложений добавлено
+    """
+    charts = {chart['id']: chart for chart in charts if chart['attachments']}
+    if not charts:
+        return 0
+    
+    attached = 0
+    for result_path in glob.glob(os.path.join(results_dir, '*-result.json')):
+        result = _read_job(result_path)
+        labels = result.get('labels', [])
+        found = [charts[label['value']] for label in labels
+                 if label.get('name') == CHART_LABEL and label.get('value') in charts]
+        if not found:
+            continue
+        for chart in found:
+            attachment_type = _chart_attachment_type(chart['filepath'])
+            source = f"{uuid.uuid4()}-attachment.{attachment_type.extension}"
+            shutil.copyfile(chart['filepath'], os.path.join(results_dir, source))
+            for name in chart['attachments']:
+                result.setdefault('attachments', []).append(
+                    {'name': name, 'source': source, 'type': attachment_type.mime_type})
+                attached += 1
+        result['labels'] = [label for label in labels if label.get('name') != CHART_LABEL]
+        _write_json(result_path, result)
+    return attached
+
+
+def render_deferred_charts(output_dir: str = "tests/allure-results", processes: Optional[int] = None,
+                           results_dir: Optional[str] = None) -> List[str]:
+    """
+    Рисует все отложенные графики сессии одним проходом в пуле процессов
+    
+    Вызывается из pytest_sessionfinish в conftest.py, вне цикла тестов.
+    С results_dir нарисованные графики прикрепляются к своим тестам в
+    результатах Allure (см. _attach_to_results).
+    
+    Args:
+        output_dir: Директория, где ReportBuilder сохранял задания
+        processes: Размер пула (по умолчанию - число CPU)
+        results_dir: Директория результатов allure-pytest (--alluredir)
+    
+    Returns:
+        list: Пути нарисованных графиков
+    """
+    jobs = sorted(glob.glob(os.path.join(output_dir, f'*{JOB_SUFFIX}')))
+    if not jobs:
+        return []
+    
+    print(f"🎨 Отрисовка отложенных графиков: {len(jobs)}")
+    results = []
+    if len(jobs) == 1:
+        results.append(_render_job(jobs[0]))
+    else:
+        workers = min(len(jobs), processes or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_render_job, job): job for job in jobs}
+            for future, job in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"❌ Не удалось нарисовать {job}: {e}")
+    
+    if results_dir is not None:
+        attached = _attach_to_results(results_dir, results)
+        print(f"📎 Графиков прикреплено к тестам Allure: {attached}")
+    return [result['filepath'] for result in results]
+
+
+def _threshold_trend(slope: float, total_growth: float, avg_growth_rate: float, duration: float) -> str:
+    """
+    Вердикт по фиксированным порогам роста (режим threshold)
+    
+    Нормальный рост Python приложения: 1-2 MB за 30 сек = 2-4 MB/мин.
+    Утечка: более 5 MB за прогон короче минуты, на длинных прогонах -
+    наклон больше 10 или средняя скорость больше 8 MB/мин.
+    
+    Args:
+        slope: Наклон МНК (MB/мин)
+        total_growth: Рост от первого до последнего замера (MB)
+        avg_growth_rate: total_growth / duration (MB/мин)
+        duration: Длительность прогона (минуты)
+    """
+    if duration < 1.0:  # Менее минуты - используем абсолютные значения
+        if total_growth > 5.0:
+            return 'increasing'
+        if total_growth < -2.0:
+            return 'decreasing'
+        return 'stable'
+    if slope > 10.0 or avg_growth_rate > 8.0:
+        return 'increasing'
+    if slope < -3.0:
+        return 'decreasing'
+    return 'stable'
 
 
 class ReportBuilder:
@@ -14,237 +529,175 @@ class ReportBuilder:
     Создание графиков и анализ данных для отчетов
     """
     
-    def __init__(self, output_dir: str = "tests/allure-results"):
+    def __init__(self, output_dir: str = "tests/allure-results", render_mode: Optional[str] = None,
+                 dpi: Optional[int] = None, fmt: Optional[str] = None):
         """
         Args:
             output_dir: Директория для сохранения графиков
+            render_mode: immediate, deferred или none (по умолчанию CHART_RENDER)
+            dpi: Разрешение графиков (по умолчанию CHART_DPI)
+            fmt: png или svg (по умолчанию CHART_FORMAT)
         """
         self.output_dir = output_dir
+        self.render_mode = render_mode or CHART_RENDER
+        self.dpi = dpi or CHART_DPI
+        self.fmt = fmt or CHART_FORMAT
+        if self.render_mode not in RENDER_MODES:
+            raise ValueError(f"render_mode должен быть одним из {RENDER_MODES}, получено: {self.render_mode}")
+        if self.fmt not in CHART_FORMATS:
+            raise ValueError(f"fmt должен быть одним из {CHART_FORMATS}, получено: {self.fmt}")
         os.makedirs(output_dir, exist_ok=True)
+    
+    def _chart(self, kind: str, filename: str, **kwargs) -> Optional[str]:
+        """
+        Рисует график сразу или сохраняет задание с сырыми рядами
         
-        # Настройка стиля графиков
-        plt.style.use('seaborn-v0_8-darkgrid')
+        Returns:
+            str: Путь к графику (в режиме deferred файл появится после сессии)
+        
+        В режиме deferred тест получает метку CHART_LABEL с id задания: по ней
+        render_deferred_charts найдет результат теста, к которому прикрепить график.
+        """
+        if self.render_mode == 'none':
+            return None
+        
+        filepath = os.path.join(self.output_dir, f"{os.path.splitext(filename)[0]}.{self.fmt}")
+        if self.render_mode == 'immediate':
+            return CHART_RENDERERS[kind](filepath=filepath, dpi=self.dpi, **kwargs)
+        
+        job_id = uuid.uuid4().hex
+        allure.dynamic.label(CHART_LABEL, job_id)
+        job = {'kind': kind, 'filepath': filepath, 'dpi': self.dpi, 'kwargs': kwargs,
+               'id': job_id, 'attachments': []}
+        with open(filepath + JOB_SUFFIX, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, default=float)
+        print(f"🕒 График будет нарисован после тестов: {filepath}")
+        return filepath
     
-    def create_memory_chart(self, data: List[Dict], title: str, filename: str) -> str:
+    def create_memory_chart(self, data: List[Dict], title: str, filename: str) -> Optional[str]:
         """
         Создает график потребления памяти
         
         Args:
             data: Список измерений с ключами 'time', 'rss_mb', 'vms_mb'
             title: Заголовок графика
-            filename: Имя файла для сохранения
+            filename: Имя файла для сохранения (расширение заменяется на формат графика)
         
         Returns:
-            str: Путь к сохраненному файлу
+            str: Путь к файлу графика или None (нет данных, режим none)
         """
         if not data:
             return None
-        
-        # Извлекаем данные
-        times = [d['time'] for d in data]  # Оставляем в секундах для лучшей читаемости
-        rss = [d['rss_mb'] for d in data]
-        vms = [d.get('vms_mb', d['rss_mb']) for d in data]
-        
-        # Создаем фигуру
-        fig, ax = plt.subplots(figsize=(14, 8))
-        
-        # Основные линии
-        ax.plot(times, rss, label='RSS (Resident Set Size)', 
-                linewidth=3, color='#e74c3c', marker='o', markersize=6)
-        ax.plot(times, vms, label='VMS (Virtual Memory Size)', 
-                linewidth=2, color='#3498db', marker='s', markersize=4, alpha=0.7)
-        
-        # Линия тренда для RSS
-        if len(times) > 2:
-            z = np.polyfit(times, rss, 1)
-            p = np.poly1d(z)
-            trend_mb_per_sec = z[0]
-            trend_mb_per_min = trend_mb_per_sec * 60
-            ax.plot(times, p(times), "--", label=f'Тренд RSS ({trend_mb_per_min:+.2f} MB/мин)', 
-                   linewidth=2, color='#c0392b', alpha=0.6)
-        
-        # Заполнение области под RSS
-        ax.fill_between(times, min(rss) * 0.9, rss, alpha=0.15, color='#e74c3c')
-        
-        # 🎨 УЛУЧШЕННЫЕ аннотации с умным позиционированием
-        rss_range = max(rss) - min(rss)
-        time_range = max(times) - min(times)
-        
-        # Определяем рост памяти для выбора цветов
-        growth = rss[-1] - rss[0]
-        
-        # Аннотация начала - всегда зеленая (старт)
-        start_y_offset = rss_range * 0.4 if rss[0] < np.median(rss) else -rss_range * 0.2
-        ax.annotate(f'Начало: {rss[0]:.1f} MB', 
-                   xy=(times[0], rss[0]), 
-                   xytext=(times[0] + time_range * 0.15, rss[0] + start_y_offset),
-                   arrowprops=dict(arrowstyle='->', color='green', lw=2),
-                   fontsize=11, color='green', weight='bold',
-                   bbox=dict(boxstyle='round,pad=0.3', facecolor='lightgreen', alpha=0.7))
-        
-        # Аннотация конца - цвет зависит от роста
-        if growth > 5.0:  # Значительный рост
-            end_color = 'red'
-            verdict = 'УТЕЧКА!'
-            bg_color = 'mistyrose'
-        elif growth > 2.0:  # Умеренный рост
-            end_color = 'orange'
-            verdict = 'Рост'
-            bg_color = 'moccasin'
-        else:  # Стабильно
-            end_color = 'darkgreen'
-            verdict = 'ЗДОРОВО!'
-            bg_color = 'lightgreen'
-        
-        end_y_offset = rss_range * 0.4 if rss[-1] < np.median(rss) else -rss_range * 0.3
-        ax.annotate(f'Конец: {rss[-1]:.1f} MB\nРост: +{growth:.1f} MB\n{verdict}', 
-                   xy=(times[-1], rss[-1]), 
-                   xytext=(times[-1] - time_range * 0.25, rss[-1] + end_y_offset),
-                   arrowprops=dict(arrowstyle='->', color=end_color, lw=2),
-                   fontsize=11, color=end_color, weight='bold',
-                   bbox=dict(boxstyle='round,pad=0.4', facecolor=bg_color, alpha=0.8))
-        
-        # Настройка осей и сетки
-        ax.set_xlabel('Время (секунды)', fontsize=12, weight='bold')
-        ax.set_ylabel('Память (MB)', fontsize=12, weight='bold')
-        ax.set_title(title, fontsize=14, weight='bold', pad=20)
-        ax.legend(loc='upper left', fontsize=11)
-        ax.grid(True, alpha=0.3, linestyle='--')
-        
-        # Улучшенные оси
-        ax.set_xlim(min(times) - time_range * 0.05, max(times) + time_range * 0.05)
-        ax.set_ylim(min(rss) - rss_range * 0.1, max(max(rss), max(vms)) + rss_range * 0.3)
-        
-        # 📊 УЛУЧШЕННАЯ информация с вердиктом
-        growth = rss[-1] - rss[0]
-        duration_sec = times[-1] - times[0]
-        duration_min = duration_sec / 60
-        growth_rate_per_min = (growth / duration_min) if duration_min > 0 else 0
-        
-        # Определяем вердикт по росту
-        if growth > 8.0:
-            verdict_emoji = "🚨"
-            verdict_text = "КРИТИЧЕСКАЯ УТЕЧКА"
-            info_bg_color = 'mistyrose'
-        elif growth > 4.0:
-            verdict_emoji = "🔴" 
-            verdict_text = "УТЕЧКА ОБНАРУЖЕНА"
-            info_bg_color = 'moccasin'
-        elif growth > 1.0:
-            verdict_emoji = "⚠️"
-            verdict_text = "НЕБОЛЬШОЙ РОСТ"
-            info_bg_color = 'lightyellow'
-        else:
-            verdict_emoji = "✅"
-            verdict_text = "СТАБИЛЬНО"
-            info_bg_color = 'lightgreen'
-        
-        info_text = f'📊 Анализ памяти:\n'
-        info_text += f'{verdict_emoji} Вердикт: {verdict_text}\n'
-        info_text += f'📈 Рост: {growth:+.2f} MB\n'
-        info_text += f'⚡ Скорость: {growth_rate_per_min:+.1f} MB/мин\n'
-        info_text += f'⏱️ Время: {duration_sec:.0f}с'
-        
-        # Позиционируем информационный блок справа вверху, чтобы не перекрывал надписи
-        ax.text(0.98, 0.98, info_text, transform=ax.transAxes,
-               fontsize=10, verticalalignment='top', horizontalalignment='right',
-               bbox=dict(boxstyle='round,pad=0.5', facecolor=info_bg_color, alpha=0.9))
-        
-        # Сохранение
-        filepath = os.path.join(self.output_dir, filename)
-        plt.tight_layout()
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        print(f"📊 График сохранен: {filepath}")
-        return filepath
+        return self._chart('memory', filename, data=data, title=title)
     
     def create_comparison_chart(self, data_leak: List[Dict], data_no_leak: List[Dict], 
-                                title: str, filename: str) -> str:
+                                title: str, filename: str) -> Optional[str]:
         """
         Создает сравнительный график для двух приложений
         """
         if not data_leak or not data_no_leak:
             return None
+        return self._chart('comparison', filename, data_leak=data_leak, data_no_leak=data_no_leak, title=title)
+    
+    def create_multi_comparison_chart(self, datasets: Dict[str, List[Dict]], title: str, filename: str,
+                                      baseline: Optional[str] = None) -> Optional[str]:
+        """
+        Создает сравнительный график для нескольких приложений или прогонов
         
-        # Извлекаем данные
-        times_leak = [d['time'] / 60 for d in data_leak]
-        rss_leak = [d['rss_mb'] for d in data_leak]
-        
-        times_no_leak = [d['time'] / 60 for d in data_no_leak]
-        rss_no_leak = [d['rss_mb'] for d in data_no_leak]
-        
-        # Создаем фигуру с двумя подграфиками
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
-        
-        # График 1: Сравнение на одном графике
-        ax1.plot(times_leak, rss_leak, label='С утечкой памяти', 
-                linewidth=2.5, color='#e74c3c', marker='o', markersize=4)
-        ax1.plot(times_no_leak, rss_no_leak, label='Без утечки памяти', 
-                linewidth=2.5, color='#27ae60', marker='s', markersize=4)
-        
-        ax1.fill_between(times_leak, 0, rss_leak, alpha=0.2, color='#e74c3c')
-        ax1.fill_between(times_no_leak, 0, rss_no_leak, alpha=0.2, color='#27ae60')
+        Args:
+            datasets: {имя варианта: список измерений с ключами 'time', 'rss_mb'}
+            title: Заголовок графика
+            filename: Имя файла для сохранения
+            baseline: Вариант, с которым сравниваются остальные (по умолчанию - первый)
         
-        ax1.set_xlabel('Время (минуты)', fontsize=12, weight='bold')
-        ax1.set_ylabel('Память RSS (MB)', fontsize=12, weight='bold')
-        ax1.set_title('Сравнение потребления памяти', fontsize=14, weight='bold')
-        ax1.legend(loc='upper left', fontsize=11)
-        ax1.grid(True, alpha=0.3, linestyle='--')
+        Returns:
+            str: Путь к файлу графика или None (нет данных, режим none)
+        """
+        datasets = {name: data for name, data in datasets.items() if data}
+        if len(datasets) < 2:
+            return None
+        if baseline is not None and baseline not in datasets:
+            raise ValueError(f"Базовый вариант {baseline} не найден среди: {list(datasets)}")
+        return self._chart('multi_comparison', filename, datasets=datasets, title=title, baseline=baseline)
+    
+    def attach_chart(self, chart_path: Optional[str], name: str):
+        """
+        Прикрепляет график к текущему тесту Allure
         
-        # График 2: Разница в потреблении памяти
-        # Интерполируем данные для одинаковой длины
-        min_len = min(len(rss_leak), len(rss_no_leak))
-        diff = [rss_leak[i] - rss_no_leak[i] for i in range(min_len)]
-        times_diff = times_leak[:min_len]
+        Отложенный график только запоминает имя вложения в своем задании:
+        render_deferred_charts нарисует его после сессии и прикрепит файл.
+        """
+        if chart_path is None:
+            return
         
-        ax2.plot(times_diff, diff, label='Разница (Leak - No Leak)', 
-                linewidth=2.5, color='#9b59b6', marker='D', markersize=4)
-        ax2.fill_between(times_diff, 0, diff, alpha=0.3, color='#9b59b6')
-        ax2.axhline(y=0, color='black', linestyle='-', linewidth=1)
+        job_path = chart_path + JOB_SUFFIX
+        if not os.path.exists(job_path):
+            allure.attach.file(chart_path, name=name, attachment_type=_chart_attachment_type(chart_path))
+            return
         
-        ax2.set_xlabel('Время (минуты)', fontsize=12, weight='bold')
-        ax2.set_ylabel('Разница в памяти (MB)', fontsize=12, weight='bold')
-        ax2.set_title('Разница в потреблении памяти', fontsize=14, weight='bold')
-        ax2.legend(loc='upper left', fontsize=11)
-        ax2.grid(True, alpha=0.3, linestyle='--')
+        job = _read_job(job_path)
+        job['attachments'].append(name)
+        _write_json(job_path, job)
+    
+    def analyze_trend(self, data: List[Dict], threshold: float = NORMAL_GROWTH_MB_PER_MIN,
+                      mode: Optional[str] = None) -> Dict:
+        """
+        Анализирует тренд изменения памяти
         
-        # Статистика
-        growth_leak = rss_leak[-1] - rss_leak[0]
-        growth_no_leak = rss_no_leak[-1] - rss_no_leak[0]
+        Режим ci (по умолчанию) - вердикт TrendEngine по доверительному
+        интервалу наклона стационарной части ряда (после прогрева):
+        'increasing', только если рост уверенно быстрее threshold. На
+        коротком ряду (меньше TrendEngine.MIN_AR_SAMPLES замеров) интервал -
+        обычный МНК с точным квантилем Стьюдента, поэтому явный рост
+        короткого демо-прогона тоже дает 'increasing'.
         
-        info_text = f'📊 Сравнительная статистика:\n'
-        info_text += f'С утечкой: +{growth_leak:.2f} MB\n'
-        info_text += f'Без утечки: +{growth_no_leak:.2f} MB\n'
-        info_text += f'Разница: {growth_leak - growth_no_leak:.2f} MB\n'
-        info_text += f'Соотношение: {growth_leak / max(growth_no_leak, 1):.2f}x'
+        В режиме floor вердикт (по интервалу, как в ci) и скорость роста
+        берутся по полу пилы (минимумам после сборок мусора): зубцы пилы -
+        оборот объектов, а не утечка, и конец прогона на вершине зубца не
+        завышает рост.
         
-        ax2.text(0.02, 0.98, info_text, transform=ax2.transAxes,
-                fontsize=10, verticalalignment='top',
-                bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8))
+        Режим threshold - прежние фиксированные пороги роста (_threshold_trend),
+        только по явному выбору.
         
-        # Сохранение
-        filepath = os.path.join(self.output_dir, filename)
-        plt.tight_layout()
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close()
+        Весь ряд загружается в TrendEngine одним векторным extend. Оценки
+        интервалов, прогрева и робастные наклоны возвращаются во всех режимах.
         
-        print(f"📊 Сравнительный график сохранен: {filepath}")
-        return filepath
-    
-    def analyze_trend(self, data: List[Dict]) -> Dict:
-        """
-        Анализирует тренд изменения памяти
+        Args:
+            data: Список измерений с ключами 'time' (секунды) и 'rss_mb'
+            threshold: Нормальная скорость роста (MB/мин) для режимов ci и floor;
+                       'increasing' - если нижняя граница интервала выше нее
+            mode: ci, floor или threshold (по умолчанию TREND_MODE)
         
         Returns:
             dict: {
                 'trend': str,              # 'increasing', 'decreasing', 'stable'
-                'growth_rate': float,      # MB/мин
+                'growth_rate': float,      # MB/мин (в режиме floor - наклон пола)
                 'growth_coefficient': float,  # Коэффициент линейной регрессии
-                'r_squared': float         # Качество аппроксимации
+                'r_squared': float,        # Качество аппроксимации
+                'slope_ci': tuple,         # 95% интервал наклона (MB/мин)
+                'steady_slope': float,     # Наклон после прогрева (MB/мин)
+                'steady_slope_ci': tuple,
+                'warmup_minutes': float,   # Где закончился прогрев (0 - не найден)
+                'theil_sen_slope': float,  # Робастные наклоны стационарной части
+                'huber_slope': float,
+                'floor_slope': float,      # Скорость удержания памяти (MB/мин)
+                'floor_slope_ci': tuple,
+                'retained_growth_mb': float,  # Рост пола за прогон
+                'churn_mb': float,         # Высота зубца пилы (0 - пила не найдена)
+                'gc_cycles': int,
+                'mode': str
             }
         """
-        if len(data) < 3:
+        mode = mode or TREND_MODE
+        if mode not in TREND_MODES:
+            raise ValueError(f"mode должен быть одним из {TREND_MODES}, получено: {mode}")
+        times = [d['time'] for d in data]
+        rss = [d['rss_mb'] for d in data]
+        engine = TrendEngine()
+        engine.extend(times, rss)
+        summary = engine.summary(threshold)
+        # Меньше 3 замеров или все в один момент времени
+        if summary['trend'] == 'insufficient_data':
             return {
                 'trend': 'insufficient_data',
                 'growth_rate': 0.0,
@@ -252,48 +705,34 @@ class ReportBuilder:
                 'r_squared': 0.0
             }
         
-        # Извлекаем данные
-        times = np.array([d['time'] / 60 for d in data])  # минуты
-        memory = np.array([d['rss_mb'] for d in data])
-        
-        # Линейная регрессия
-        coefficients = np.polyfit(times, memory, 1)
-        slope = coefficients[0]  # Наклон (MB/мин)
-        
-        # R-squared
-        p = np.poly1d(coefficients)
-        y_pred = p(times)
-        ss_res = np.sum((memory - y_pred) ** 2)
-        ss_tot = np.sum((memory - np.mean(memory)) ** 2)
-        r_squared = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0
-        
-        # 🔥 УЛУЧШЕННЫЕ КРИТЕРИИ для определения утечки:
-        total_growth = memory[-1] - memory[0]
-        duration = times[-1] - times[0]
+        total_growth = data[-1]['rss_mb'] - data[0]['rss_mb']
+        duration = (data[-1]['time'] - data[0]['time']) / 60
         avg_growth_rate = total_growth / duration if duration > 0 else 0
         
-        # Для демо: более строгие критерии
-        # Нормальный рост Python приложения: 1-2 MB за 30 сек = 2-4 MB/мин
-        # Утечка: более 10 MB/мин или более 5 MB за 30 сек
-        if duration < 1.0:  # Менее минуты - используем абсолютные значения
-            if total_growth > 5.0:  # Более 5 MB за короткое время
-                trend = 'increasing'
-            elif total_growth < -2.0:
-                trend = 'decreasing'
-            else:
-                trend = 'stable'
-        else:  # Более минуты - используем скорость
-            if slope > 10.0 or avg_growth_rate > 8.0:  # Более 8-10 MB/мин = утечка
-                trend = 'increasing'
-            elif slope < -3.0:
-                trend = 'decreasing'
-            else:
-                trend = 'stable'
+        floor = analyze_floor(times, rss, threshold)
+        trend, growth_rate = summary['trend'], avg_growth_rate
+        if mode == 'threshold':
+            trend = _threshold_trend(summary['slope'], total_growth, avg_growth_rate, duration)
+        # На коротком ряду точек пола может не хватить - остается вердикт по интервалу
+        elif mode == 'floor' and floor['trend'] != 'insufficient_data':
+            trend, growth_rate = floor['trend'], floor['floor_slope']
         
         return {
             'trend': trend,
-            'growth_rate': avg_growth_rate,
-            'growth_coefficient': slope,
-            'r_squared': r_squared,
-            'total_growth_mb': total_growth
+            'growth_rate': growth_rate,
+            'growth_coefficient': summary['slope'],
+            'r_squared': summary['r_squared'],
+            'total_growth_mb': total_growth,
+            'slope_ci': summary['slope_ci'],
+            'steady_slope': summary['steady_slope'],
+            'steady_slope_ci': summary['steady_slope_ci'],
+            'warmup_minutes': summary['steady_start_minutes'],
+            'theil_sen_slope': summary['theil_sen_slope'],
+            'huber_slope': summary['huber_slope'],
+            'floor_slope': floor['floor_slope'],
+            'floor_slope_ci': floor['floor_slope_ci'],
+            'retained_growth_mb': floor['floor_growth_mb'],
+            'churn_mb': floor['churn_mb'],
+            'gc_cycles': floor['cycles'],
+            'mode': mode
         }
@@ -0,0 +1,150 @@
+"""
+Потоковый журнал запросов генератора нагрузки
+Ограниченная очередь + фоновый писатель в append-only файл
+"""
+import os
+import threading
+import time
+from queue import Queue, Empty, Full
+from typing import Dict, Iterator, Optional
+
+
+class RequestLogSink:
+    """
+    Пишет компактные записи о каждом запросе в TSV файл
+    
+    Формат строки: timestamp, endpoint, status, latency_ms, bytes.
+    status = 0 означает ошибку клиента (таймаут, обрыв соединения).
+    
+    Очередь ограничена: если писатель не успевает, запись отбрасывается
+    и учитывается в dropped - генератор нагрузки никогда не блокируется,
+    а память процесса не растет.
+    """
+    
+    HEADER = 'timestamp\tendpoint\tstatus\tlatency_ms\tbytes\n'
+    
+    def __init__(self, path: str, maxsize: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0):
+        """
+        Args:
+            path: Путь к файлу журнала (дописывается, если уже существует)
+            maxsize: Максимальный размер очереди записей
+            batch_size: Сколько записей писать за один вызов write
+            flush_interval: Как часто сбрасывать буфер на диск (секунды)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Queue = Queue(maxsize=maxsize)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._drop_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+    
+    def start(self):
+        """
+        Запускает фоновый поток записи
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+    
+    def put(self, timestamp: float, endpoint: str, status: int, latency: float, size: int) -> bool:
+        """
+        Ставит запись в очередь без блокировки
+        
+        Args:
+            timestamp: Время завершения запроса (time.time())
+            endpoint: Endpoint запроса
+            status: HTTP статус или 0 при ошибке клиента
+            latency: Задержка в секундах
+            size: Размер ответа в байтах
+        
+        Returns:
+            bool: False, если очередь переполнена и запись отброшена
+        """
+        try:
+            self._queue.put_nowait((timestamp, endpoint, status, latency, size))
+            return True
+        except Full:
+            with self._drop_lock:
+                self.dropped += 1
+            return False
+    
+    def _writer(self):
+        """
+        Фоновый поток: забирает записи пачками и дописывает их в файл
+        """
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if f.tell() == 0:
+                f.write(self.HEADER)
+            
+            last_flush = time.monotonic()
+            while True:
+                batch = []
+                try:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+                    while len(batch) < self.batch_size:
+                        batch.append(self._queue.get_nowait())
+                except Empty:
+                    pass
+                
+                if batch:
+                    f.write(''.join(
+                        f"{timestamp:.6f}\t{endpoint}\t{status}\t{latency * 1000:.3f}\t{size}\n"
+                        for timestamp, endpoint, status, latency, size in batch
+                    ))
+                    self.written += len(batch)
+                
+                now = time.monotonic()
+                if now - last_flush >= self.flush_interval:
+                    f.flush()
+                    last_flush = now
+                
+                if self._stop_event.is_set() and self._queue.empty():
+                    break
+            
+            f.flush()
+    
+    def close(self):
+        """
+        Дописывает оставшиеся записи и останавливает поток
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+    
+    def get_statistics(self) -> Dict:
+        return {
+            'path': self.path,
+            'written': self.written,
+            'dropped': self.dropped,
+            'pending': self._queue.qsize()
+        }
+
+
+def read_request_log(path: str) -> Iterator[Dict]:
+    """
+    Читает журнал запросов построчно (без загрузки файла в память)
+    
+    Yields:
+        dict: {'timestamp', 'endpoint', 'status', 'latency_ms', 'bytes'}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line == RequestLogSink.HEADER:
+                continue
+            timestamp, endpoint, status, latency_ms, size = line.rstrip('\n').split('\t')
+            yield {
+                'timestamp': float(timestamp),
+                'endpoint': endpoint,
+                'status': int(status),
+                'latency_ms': float(latency_ms),
+                'bytes': int(size)
+            }
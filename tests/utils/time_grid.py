@@ -0,0 +1,123 @@
+"""
+Выравнивание рядов на общую временную сетку
+Замеры разных приложений и прогонов идут с разной частотой и сдвигом, поэтому
+разности и отношения считаются только после интерполяции на одну сетку
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+GRID_MODES = ('intersection', 'union')
+
+
+def records_to_series(datasets: Dict[str, List[Dict]], key: str = 'rss_mb') -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Переводит списки замеров {'time', key} в пары массивов (times, values)
+    """
+    return {
+        name: (np.array([d['time'] for d in data], dtype=np.float64),
+               np.array([d[key] for d in data], dtype=np.float64))
+        for name, data in datasets.items()
+    }
+
+
+def _sorted(times, values) -> Tuple[np.ndarray, np.ndarray]:
+    """Ряд по возрастанию времени (np.interp требует монотонные узлы)"""
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) > 1 and np.any(np.diff(times) < 0):
+        order = np.argsort(times, kind='stable')
+        times, values = times[order], values[order]
+    return times, values
+
+
+def common_grid(series_times: Sequence[np.ndarray], step: float = 0.0, mode: str = 'intersection') -> np.ndarray:
+    """
+    Общая равномерная сетка времени для нескольких рядов
+    
+    Args:
+        series_times: Времена замеров каждого ряда (по возрастанию)
+        step: Шаг сетки; по умолчанию - медианный интервал самого редкого ряда,
+              чтобы не придумывать точки между настоящими замерами
+        mode: intersection - только общий для всех рядов отрезок,
+              union - весь отрезок (вне ряда значения будут NaN).
+              Если общего отрезка нет (например, прогоны сняты в разное
+              время), intersection переходит на union с предупреждением
+    
+    Returns:
+        np.ndarray: Узлы сетки
+    """
+    if mode not in GRID_MODES:
+        raise ValueError(f"mode должен быть одним из {GRID_MODES}, получено: {mode}")
+    starts = [t[0] for t in series_times]
+    ends = [t[-1] for t in series_times]
+    start, end = (max(starts), min(ends)) if mode == 'intersection' else (min(starts), max(ends))
+    if end < start:
+        print("⚠️  Ряды не пересекаются по времени - сетка строится по объединению отрезков")
+        start, end = min(starts), max(ends)
+    
+    if step <= 0:
+        intervals = [np.median(np.diff(t)) for t in series_times if len(t) > 1]
+        step = max(intervals) if intervals else 0.0
+    if step <= 0 or end == start:
+        return np.array([start], dtype=np.float64)
+    # Последний узел - ровно конец отрезка, чтобы не терять финальный замер
+    count = int(np.floor((end - start) / step + 1e-9)) + 1
+    grid = start + np.arange(count) * step
+    return grid if grid[-1] == end else np.append(grid, end)
+
+
+def align_series(series: Dict[str, Tuple[Sequence[float], Sequence[float]]], step: float = 0.0,
+                 mode: str = 'intersection') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Линейная интерполяция любого числа рядов на общую сетку
+    
+    Полностью векторная: ряды склеиваются в один монотонный массив со сдвигом
+    времени каждого следующего ряда, и все N x M точек интерполируются одним
+    вызовом np.interp (один searchsorted на все ряды вместо цикла).
+    
+    Args:
+        series: {имя: (times, values)}
+        step, mode: Параметры сетки (см. common_grid)
+    
+    Returns:
+        (grid, values): Сетка длины M и матрица N x M в порядке series;
+                        вне собственного отрезка ряда - NaN
+    """
+    if not series:
+        raise ValueError("Нет рядов для выравнивания")
+    pairs = [_sorted(times, values) for times, values in series.values()]
+    if any(len(times) == 0 for times, _ in pairs):
+        raise ValueError("Пустой ряд нельзя выровнять")
+    grid = common_grid([times for times, _ in pairs], step=step, mode=mode)
+    
+    origin = min(times[0] for times, _ in pairs)
+    # Сдвиг больше всего диапазона времени: отрезки рядов не перекрываются
+    width = max(times[-1] for times, _ in pairs) - origin + 1.0
+    shifts = np.arange(len(pairs)) * width
+    xp = np.concatenate([times - origin + shift for (times, _), shift in zip(pairs, shifts)])
+    fp = np.concatenate([values for _, values in pairs])
+    x = (grid - origin)[None, :] + shifts[:, None]
+    values = np.interp(x.ravel(), xp, fp).reshape(len(pairs), len(grid))
+    
+    # Точки вне отрезка ряда интерполировались бы через соседний ряд
+    first = np.array([times[0] for times, _ in pairs])[:, None]
+    last = np.array([times[-1] for times, _ in pairs])[:, None]
+    values[(grid[None, :] < first) | (grid[None, :] > last)] = np.nan
+    return grid, values
+
+
+def growth_on_grid(values: np.ndarray) -> np.ndarray:
+    """
+    Рост каждого ряда (последнее минус первое значение) на общей сетке
+    
+    В режиме union берутся первое и последнее не-NaN значение строки.
+    """
+    valid = ~np.isnan(values)
+    has_data = valid.any(axis=1)
+    first = np.argmax(valid, axis=1)
+    last = values.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    rows = np.arange(values.shape[0])
+    growth = values[rows, last] - values[rows, first]
+    return np.where(has_data, growth, np.nan)
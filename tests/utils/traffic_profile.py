@@ -0,0 +1,199 @@
+"""
+Декларативные профили нагрузки: веса endpoint'ов и стадии
+(warm-up, ramp, steady, spike, cool-down) со своим RPS и длительностью
+"""
+import json
+import random
+from dataclasses import dataclass, field, asdict
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class LoadStage:
+    """Стадия нагрузки"""
+    name: str
+    duration: float
+    rps: float
+    # Для ramp-стадии: RPS линейно меняется от start_rps до rps
+    start_rps: Optional[float] = None
+    # Переопределение весов endpoint'ов для этой стадии
+    weights: Optional[Dict[str, float]] = None
+    
+    def rate_at(self, elapsed: float) -> float:
+        """
+        Целевой RPS через elapsed секунд после начала стадии
+        """
+        if self.start_rps is None or self.duration <= 0:
+            return self.rps
+        progress = min(max(elapsed / self.duration, 0.0), 1.0)
+        return self.start_rps + (self.rps - self.start_rps) * progress
+
+
+@dataclass
+class TrafficProfile:
+    """
+    Профиль нагрузки
+    
+    Пример JSON:
+        {
+            "name": "soak",
+            "endpoints": {"/api/cache": 3, "/api/database": 1, "/api/stress": 1},
+            "stages": [
+                {"name": "warm-up", "duration": 60, "rps": 5},
+                {"name": "ramp", "duration": 60, "start_rps": 5, "rps": 50},
+                {"name": "steady", "duration": 600, "rps": 50},
+                {"name": "spike", "duration": 30, "rps": 200},
+                {"name": "cool-down", "duration": 60, "rps": 5}
+            ]
+        }
+    """
+    endpoints: Dict[str, float]
+    stages: List[LoadStage]
+    name: str = 'custom'
+    _cum_weights: Dict[str, Tuple[List[str], List[float]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    
+    def __post_init__(self):
+        if not self.endpoints:
+            raise ValueError("Профиль должен содержать хотя бы один endpoint")
+        if not self.stages:
+            raise ValueError("Профиль должен содержать хотя бы одну стадию")
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Имена стадий должны быть уникальными: {names}")
+        for stage in self.stages:
+            weights = stage.weights or self.endpoints
+            if sum(weights.values()) <= 0:
+                raise ValueError(f"Сумма весов стадии {stage.name} должна быть > 0")
+            # Кумулятивные веса считаем один раз, а не на каждый запрос
+            endpoints = list(weights)
+            self._cum_weights[stage.name] = (endpoints, list(accumulate(weights.values())))
+    
+    @property
+    def duration(self) -> float:
+        """Общая длительность профиля в секундах"""
+        return sum(stage.duration for stage in self.stages)
+    
+    @property
+    def all_endpoints(self) -> List[str]:
+        """Все endpoint'ы, встречающиеся в профиле"""
+        endpoints = list(self.endpoints)
+        for stage in self.stages:
+            for endpoint in stage.weights or {}:
+                if endpoint not in endpoints:
+                    endpoints.append(endpoint)
+        return endpoints
+    
+    @property
+    def peak_rps(self) -> float:
+        """Максимальный целевой RPS среди стадий"""
+        return max(max(stage.rps, stage.start_rps or 0) for stage in self.stages)
+    
+    def choose_endpoint(self, stage: LoadStage, rng=random) -> str:
+        """
+        Выбирает endpoint с учетом весов стадии
+        """
+        endpoints, cum_weights = self._cum_weights[stage.name]
+        return rng.choices(endpoints, cum_weights=cum_weights)[0]
+    
+    def schedule(self, arrival: str = 'constant', rng=random) -> Iterator[Tuple[float, str, str]]:
+        """
+        Плановые отправки по всем стадиям
+        
+        Yields:
+            (смещение от старта в секундах, endpoint, имя стадии)
+        """
+        stage_start = 0.0
+        for stage in self.stages:
+            stage_end = stage_start + stage.duration
+            offset = stage_start
+            # Сумма шагов 1/rate копит ошибку округления: без допуска на границе
+            # стадии появлялась лишняя отправка (0.05 * 10 < 0.5)
+            limit = stage_end - 1e-9
+            
+            while offset < limit:
+                rate = stage.rate_at(offset - stage_start)
+                if rate <= 0:
+                    if stage.start_rps is None:
+                        break
+                    # Ramp от нуля: ждем, пока RPS станет положительным
+                    offset += 0.1
+                    continue
+                if arrival == 'poisson':
+                    offset += rng.expovariate(rate)
+                    if offset >= limit:
+                        break
+                yield offset, self.choose_endpoint(stage, rng), stage.name
+                if arrival != 'poisson':
+                    offset += 1.0 / rate
+            
+            stage_start = stage_end
+    
+    def scaled(self, factor: float) -> 'TrafficProfile':
+        """
+        Копия профиля с RPS, умноженным на factor (для деления между процессами)
+        """
+        stages = [
+            LoadStage(
+                name=stage.name,
+                duration=stage.duration,
+                rps=stage.rps * factor,
+                start_rps=stage.start_rps * factor if stage.start_rps is not None else None,
+                weights=dict(stage.weights) if stage.weights else None
+            )
+            for stage in self.stages
+        ]
+        return TrafficProfile(dict(self.endpoints), stages, self.name)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'endpoints': dict(self.endpoints),
+            'stages': [asdict(stage) for stage in self.stages]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TrafficProfile':
+        """
+        Создает профиль из словаря (формат см. в docstring класса)
+        """
+        endpoints = data['endpoints']
+        # Допускаем список endpoint'ов - тогда веса равные
+        if isinstance(endpoints, list):
+            endpoints = {endpoint: 1.0 for endpoint in endpoints}
+        stages = [LoadStage(**stage) for stage in data['stages']]
+        return cls(endpoints=endpoints, stages=stages, name=data.get('name', 'custom'))
+    
+    @classmethod
+    def from_json(cls, path: str) -> 'TrafficProfile':
+        """
+        Загружает профиль из JSON файла
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+    
+    @classmethod
+    def standard(cls, endpoints: Dict[str, float], rps: float, steady: float = 600,
+                 warmup: float = 60, ramp: float = 60, spike: float = 30,
+                 spike_factor: float = 3.0, cooldown: float = 60) -> 'TrafficProfile':
+        """
+        Типовой профиль: warm-up -> ramp -> steady -> spike -> cool-down
+        
+        Args:
+            endpoints: endpoint -> вес
+            rps: RPS стабильной стадии
+            steady: Длительность стабильной стадии
+            warmup, ramp, spike, cooldown: Длительности остальных стадий (0 - пропустить)
+            spike_factor: Во сколько раз spike выше стабильного RPS
+        """
+        base_rps = max(1.0, rps * 0.1)
+        stages = [
+            LoadStage('warm-up', warmup, base_rps),
+            LoadStage('ramp', ramp, rps, start_rps=base_rps),
+            LoadStage('steady', steady, rps),
+            LoadStage('spike', spike, rps * spike_factor),
+            LoadStage('cool-down', cooldown, base_rps),
+        ]
+        return cls(dict(endpoints), [stage for stage in stages if stage.duration > 0], 'standard')
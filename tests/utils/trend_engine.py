@@ -0,0 +1,386 @@
+"""
+Инкрементальный анализ тренда памяти
+МНК на префиксных суммах (O(1) на замер), доверительный интервал наклона,
+робастные оценки (Тейла-Сена, Хубера) и точка смены режима (прогрев -> стационар)
+"""
+import math
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# Функции распределения Стьюдента в замкнутом виде для df = 1, 2, 3 (t >= 0)
+_SMALL_DF_CDF = {
+    1: lambda t: 0.5 + math.atan(t) / math.pi,
+    2: lambda t: 0.5 + t / (2 * math.sqrt(2 + t * t)),
+    3: lambda t: 0.5 + (t / (math.sqrt(3) * (1 + t * t / 3)) + math.atan(t / math.sqrt(3))) / math.pi,
+}
+
+
+def _small_df_quantile(df: int, probability: float) -> float:
+    """Точный квантиль для df = 1, 2, 3: бисекция по функции распределения"""
+    cdf = _SMALL_DF_CDF[df]
+    low, high = 0.0, 1.0
+    while cdf(high) < probability:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if cdf(middle) < probability:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def t_quantile(df: float, confidence: float = 0.95) -> float:
+    """
+    Двусторонний квантиль распределения Стьюдента, scipy не нужен
+    
+    При df > 3 - разложение Корниша-Фишера (точность лучше 1%). При
+    малых df разложение сильно занижает квантиль (df = 1: 6.0 вместо 12.7),
+    поэтому до df = 3 берутся точные значения для df = 1, 2, 3, а дробные df
+    (эффективное число замеров) интерполируются по 1/df. df < 1 - интервал
+    не определен (бесконечность).
+    """
+    if df < 1:
+        return float('inf')
+    probability = 0.5 + confidence / 2
+    if df <= 3:
+        lower = int(df)
+        low_value = _small_df_quantile(lower, probability)
+        if df == lower:
+            return low_value
+        high_value = _small_df_quantile(lower + 1, probability)
+        weight = (1 / lower - 1 / df) / (1 / lower - 1 / (lower + 1))
+        return low_value + weight * (high_value - low_value)
+    z = NormalDist().inv_cdf(probability)
+    return (z + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+class TrendEngine:
+    """
+    Тренд ряда замеров с обновлением O(1)
+    
+    Для каждого замера хранятся префиксные суммы t, y, t^2, t*y, y^2 и
+    произведений соседних замеров. Поэтому МНК по любому отрезку ряда
+    (весь прогон, стационарная часть после прогрева) считается за O(1),
+    а поиск точки смены режима - одним векторным проходом по всем
+    точкам разбиения.
+    
+    Время задается в секундах, наклоны возвращаются в единицах в минуту.
+    Доверительный интервал учитывает автокорреляцию остатков (AR(1)):
+    соседние замеры памяти не независимы, и без поправки интервал
+    получается слишком узким. На отрезках короче MIN_AR_SAMPLES
+    автокорреляцию не оценить, там интервал - обычный МНК с df = n - 2.
+    
+    Пример:
+        engine = TrendEngine()
+        for metrics in samples:
+            engine.add(metrics.timestamp, metrics.rss_mb)
+            low, high = engine.fit()['slope_ci']
+    """
+    
+    INITIAL_ROWS = 1024
+    MAX_RHO = 0.9
+    # Меньше замеров - без поправки AR(1): rho по нескольким остаткам - шум
+    MIN_AR_SAMPLES = 10
+    # Меньше замеров - точка смены режима не ищется: на десятке точек BIC
+    # находит "излом" в любом шуме
+    CHANGE_POINT_MIN_SAMPLES = 30
+    # Прямые суммы: t, y, t^2, t*y, y^2; суммы пар соседей: y_i*y_(i-1),
+    # t_i*y_(i-1) + t_(i-1)*y_i, t_i*t_(i-1)
+    SUMS = ('t', 'y', 'tt', 'ty', 'yy', 'lag_yy', 'lag_ty', 'lag_tt')
+    
+    def __init__(self, confidence: float = 0.95):
+        self.confidence = confidence
+        self.n = 0
+        self.t0 = None
+        self.y0 = None
+        rows = self.INITIAL_ROWS
+        self.t = np.empty(rows)
+        self.y = np.empty(rows)
+        # prefix[name][i] - сумма по первым i замерам
+        self.prefix = {name: np.zeros(rows + 1) for name in self.SUMS}
+    
+    def _reserve(self, extra: int):
+        needed = self.n + extra
+        if needed <= len(self.t):
+            return
+        rows = max(needed, 2 * len(self.t))
+        for name in ('t', 'y'):
+            grown = np.empty(rows)
+            grown[:self.n] = getattr(self, name)[:self.n]
+            setattr(self, name, grown)
+        for name, values in self.prefix.items():
+            grown = np.zeros(rows + 1)
+            grown[:self.n + 1] = values[:self.n + 1]
+            self.prefix[name] = grown
+    
+    def add(self, timestamp: float, value: float):
+        """
+        Добавляет замер за O(1) (амортизированно)
+        
+        Args:
+            timestamp: Время замера (секунды, по возрастанию)
+            value: Значение метрики
+        """
+        if self.t0 is None:
+            self.extend([timestamp], [value])
+            return
+        self._reserve(1)
+        
+        # Скалярный путь без временных массивов NumPy
+        i = self.n
+        t = (timestamp - self.t0) / 60
+        y = value - self.y0
+        prev_t = float(self.t[i - 1])
+        prev_y = float(self.y[i - 1])
+        self.t[i] = t
+        self.y[i] = y
+        terms = (t, y, t * t, t * y, y * y, y * prev_y, t * prev_y + prev_t * y, t * prev_t)
+        for name, term in zip(self.SUMS, terms):
+            prefix = self.prefix[name]
+            prefix[i + 1] = prefix[i] + term
+        self.n = i + 1
+    
+    def extend(self, timestamps, values):
+        """
+        Добавляет пачку замеров векторно
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        count = len(timestamps)
+        if count == 0:
+            return
+        if self.t0 is None:
+            # Отсчет от первого замера - для численной устойчивости сумм
+            self.t0, self.y0 = timestamps[0], values[0]
+        self._reserve(count)
+        
+        start, end = self.n, self.n + count
+        t = (timestamps - self.t0) / 60
+        y = values - self.y0
+        self.t[start:end] = t
+        self.y[start:end] = y
+        
+        # Соседи с учетом последнего уже сохраненного замера
+        prev_t = np.concatenate((self.t[start - 1:start], t[:-1])) if start else t[:-1]
+        prev_y = np.concatenate((self.y[start - 1:start], y[:-1])) if start else y[:-1]
+        lag_start = 0 if start else 1
+        lag_t, lag_y = t[lag_start:], y[lag_start:]
+        terms = {
+            't': t, 'y': y, 'tt': t * t, 'ty': t * y, 'yy': y * y,
+            'lag_yy': np.concatenate((np.zeros(lag_start), lag_y * prev_y)),
+            'lag_ty': np.concatenate((np.zeros(lag_start), lag_t * prev_y + prev_t * lag_y)),
+            'lag_tt': np.concatenate((np.zeros(lag_start), lag_t * prev_t)),
+        }
+        for name, term in terms.items():
+            prefix = self.prefix[name]
+            prefix[start + 1:end + 1] = prefix[start] + np.cumsum(term)
+        self.n = end
+    
+    def _sums(self, start: int, end: int) -> Dict[str, float]:
+        return {name: float(values[end] - values[start]) for name, values in self.prefix.items()}
+    
+    def fit(self, start: int = 0, end: Optional[int] = None, min_variance: float = 0.0) -> Optional[Dict]:
+        """
+        МНК по отрезку замеров [start, end) за O(1)
+        
+        Args:
+            min_variance: Нижняя граница дисперсии остатков (разрешение метрики):
+                          у ступенчатых счетчиков без шума остатки бывают нулевыми
+        
+        Returns:
+            dict: slope (ед/мин), intercept, stderr, slope_ci (ед/мин), r_squared,
+                  residual_std, autocorrelation, effective_samples, samples;
+                  None - меньше 3 замеров
+        """
+        end = self.n if end is None else end
+        n = end - start
+        if n < 3:
+            return None
+        s = self._sums(start, end)
+        sxx = s['tt'] - s['t'] ** 2 / n
+        if sxx <= 0:
+            return None
+        sxy = s['ty'] - s['t'] * s['y'] / n
+        syy = s['yy'] - s['y'] ** 2 / n
+        slope = sxy / sxx
+        intercept = (s['y'] - slope * s['t']) / n
+        residual_ss = max(syy - slope * sxy, 0.0)
+        
+        # Сумма r_i * r_(i-1) по соседям внутри отрезка (первая пара начинается со start + 1)
+        a, b = intercept, slope
+        pairs = n - 1
+        lag = {name: float(self.prefix[name][end] - self.prefix[name][start + 1])
+               for name in ('lag_yy', 'lag_ty', 'lag_tt')}
+        pair_y = 2 * s['y'] - float(self.y[start] + self.y[end - 1])
+        pair_t = 2 * s['t'] - float(self.t[start] + self.t[end - 1])
+        lag_rr = (lag['lag_yy'] - a * pair_y - b * lag['lag_ty']
+                  + a * a * pairs + a * b * pair_t + b * b * lag['lag_tt'])
+        if n < self.MIN_AR_SAMPLES:
+            rho = 0.0
+        else:
+            rho = lag_rr / residual_ss if residual_ss > 0 else 0.0
+            rho = min(max(rho + (1 + 3 * rho) / n, 0.0), self.MAX_RHO)
+        inflation = (1 + rho) / (1 - rho)
+        
+        variance = max(residual_ss / (n - 2), min_variance)
+        stderr = math.sqrt(variance * inflation / sxx)
+        margin = t_quantile(n / inflation - 2, self.confidence) * stderr
+        return {
+            'slope': slope,
+            # Значение тренда в момент первого замера отрезка
+            'intercept': float(self.y0 + intercept + slope * self.t[start]),
+            'stderr': stderr,
+            'slope_ci': (slope - margin, slope + margin),
+            'r_squared': 1 - residual_ss / syy if syy > 0 else 0.0,
+            'residual_std': math.sqrt(variance),
+            'autocorrelation': rho,
+            'effective_samples': n / inflation,
+            'samples': n
+        }
+    
+    def _segment(self, start: int, end: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        end = self.n if end is None else end
+        return self.t[start:end], self.y[start:end]
+    
+    def theil_sen(self, start: int = 0, end: Optional[int] = None, max_points: int = 500) -> Optional[float]:
+        """
+        Медиана наклонов всех пар точек (ед/мин)
+        
+        Устойчива к выбросам и ступенькам до ~29% точек. Длинные отрезки
+        равномерно прореживаются до max_points, чтобы число пар было
+        ограничено.
+        """
+        t, y = self._segment(start, end)
+        if len(t) < 2:
+            return None
+        if len(t) > max_points:
+            keep = np.linspace(0, len(t) - 1, max_points).astype(np.int64)
+            t, y = t[keep], y[keep]
+        i, j = np.triu_indices(len(t), k=1)
+        dt = t[j] - t[i]
+        valid = dt > 0
+        if not valid.any():
+            return None
+        return float(np.median((y[j] - y[i])[valid] / dt[valid]))
+    
+    def huber(self, start: int = 0, end: Optional[int] = None,
+              delta: float = 1.345, iterations: int = 20) -> Optional[float]:
+        """
+        Наклон M-оценкой Хубера (итеративно перевзвешенный МНК, ед/мин)
+        
+        Остатки больше delta * масштаб (MAD) получают вес delta * масштаб / |r|,
+        поэтому отдельные всплески почти не влияют на наклон.
+        """
+        t, y = self._segment(start, end)
+        if len(t) < 3:
+            return None
+        design = np.column_stack((np.ones_like(t), t))
+        weights = np.ones_like(t)
+        coefficients = np.zeros(2)
+        for _ in range(iterations):
+            root = np.sqrt(weights)
+            new, *_ = np.linalg.lstsq(design * root[:, None], y * root, rcond=None)
+            residuals = y - design @ new
+            scale = 1.4826 * np.median(np.abs(residuals - np.median(residuals)))
+            if scale <= 0:
+                return float(new[1])
+            limit = delta * scale
+            weights = np.minimum(1.0, limit / np.maximum(np.abs(residuals), 1e-12))
+            if np.allclose(new, coefficients, rtol=1e-6, atol=1e-9):
+                break
+            coefficients = new
+        return float(new[1])
+    
+    def change_point(self, min_segment: int = 6) -> Optional[Dict]:
+        """
+        Точка смены режима: разбиение на два линейных отрезка с минимальной
+        суммой квадратов остатков (все разбиения проверяются векторно)
+        
+        Разбиение принимается, только если оно лучше одной прямой по BIC.
+        Ряды короче CHANGE_POINT_MIN_SAMPLES не разбиваются.
+        
+        Returns:
+            dict: index, time_minutes, slope_before, slope_after; None - режим один
+        """
+        n = self.n
+        if n < max(2 * min_segment, self.CHANGE_POINT_MIN_SAMPLES):
+            return None
+        split = np.arange(min_segment, n - min_segment + 1)
+        
+        def sse(start, end):
+            count = end - start
+            sums = {name: self.prefix[name][end] - self.prefix[name][start] for name in ('t', 'y', 'tt', 'ty', 'yy')}
+            sxx = sums['tt'] - sums['t'] ** 2 / count
+            sxy = sums['ty'] - sums['t'] * sums['y'] / count
+            syy = sums['yy'] - sums['y'] ** 2 / count
+            safe = np.where(sxx > 0, sxx, 1.0)
+            return np.maximum(np.where(sxx > 0, syy - sxy ** 2 / safe, syy), 0.0), np.where(sxx > 0, sxy / safe, 0.0)
+        
+        left, slope_before = sse(np.zeros_like(split), split)
+        right, slope_after = sse(split, np.full_like(split, n))
+        total = left + right
+        best = int(np.argmin(total))
+        
+        single, _ = sse(np.array([0]), np.array([n]))
+        floor = 1e-12
+        # BIC: две прямые - 4 параметра + точка разбиения, одна прямая - 2
+        bic_two = n * math.log(max(total[best] / n, floor)) + 5 * math.log(n)
+        bic_one = n * math.log(max(single[0] / n, floor)) + 2 * math.log(n)
+        if bic_two >= bic_one:
+            return None
+        
+        index = int(split[best])
+        return {
+            'index': index,
+            'time_minutes': float(self.t[index]),
+            'slope_before': float(slope_before[best]),
+            'slope_after': float(slope_after[best])
+        }
+    
+    def summary(self, threshold: float) -> Dict:
+        """
+        Полная сводка для отчета: МНК по всему ряду и по стационарной части,
+        робастные наклоны и вердикт по доверительному интервалу
+        
+        Args:
+            threshold: Скорость роста (ед/мин), которую еще считаем нормальной
+        
+        Returns:
+            dict: trend ('increasing' / 'decreasing' / 'stable' / 'insufficient_data') и оценки
+        """
+        overall = self.fit()
+        if overall is None:
+            return {'trend': 'insufficient_data', 'samples': self.n}
+        
+        change = self.change_point()
+        steady_start = change['index'] if change else 0
+        steady = self.fit(steady_start) or overall
+        low, high = steady['slope_ci']
+        # Вердикт по интервалу: рост уверенно быстрее нормального или уверенное снижение
+        if low > threshold:
+            trend = 'increasing'
+        elif high < -threshold:
+            trend = 'decreasing'
+        else:
+            trend = 'stable'
+        
+        return {
+            'trend': trend,
+            'slope': overall['slope'],
+            'slope_ci': overall['slope_ci'],
+            'r_squared': overall['r_squared'],
+            'steady_slope': steady['slope'],
+            'steady_slope_ci': steady['slope_ci'],
+            'steady_start_minutes': float(self.t[steady_start]),
+            'change_point': change,
+            'theil_sen_slope': self.theil_sen(steady_start),
+            'huber_slope': self.huber(steady_start),
+            'autocorrelation': steady['autocorrelation'],
+            'samples': self.n
+        }